@@ -0,0 +1,418 @@
+# python .\archive_firestore.py archive --retention-days 60 --dry-run     # mostra o que seria arquivado
+# python .\archive_firestore.py archive --retention-days 60               # arquiva em Parquet e apaga do Firestore
+# python .\archive_firestore.py archive --retention-days 30 --mode ttl    # arquiva e só marca f_archived_at (TTL apaga)
+# python .\archive_firestore.py archive --format jsonl --no-delete        # só gera os arquivos (jsonl.gz)
+# python .\archive_firestore.py verify                                   # confere contagens e sha256 do manifesto
+# (ou: python .\hidro.py archive …)
+#
+# Camada fria das leituras: buckets mensais fechados (mês inteiro antes de hoje − --retention-days)
+# saem de t_medidor/{id}/t_leituras/{AAAA_MM}/items para arquivos locais comprimidos:
+#   archive/f_ano_mes_ref=2025-07/part-<execução>-<n>.parquet   (zstd; ou .jsonl.gz com --format jsonl)
+# Cada arquivo junta os buckets de até --meters-per-file medidores do mesmo mês; os arquivos são
+# gerados em paralelo (--workers). Depois de fechado, o arquivo é relido e conferido (linhas e ids
+# iguais aos docs lidos) e entra no archive/manifest.jsonl com linhas, bytes, sha256 e período.
+# Só então os docs arquivados são apagados (BulkWriter, como no purge_firestore) — ou, com --mode ttl,
+# recebem f_archived_at e uma política TTL do Firestore apaga depois:
+#   gcloud firestore fields ttls update f_archived_at --collection-group=items --enable-ttl
+#   gcloud firestore fields ttls update f_archived_at --collection-group=t_leituras --enable-ttl
+# O doc do bucket só é apagado (ou marcado, com --mode ttl) se não houve falha e não sobrou item sem
+# remover/marcar (leitura atrasada que chegou durante o arquivamento fica para a próxima execução).
+# Buckets com docs-dia (t_leituras/AAAA_MM/dias, layout do packed_days) não são arquivados: ficam no
+# Firestore, com aviso, e o doc do bucket nunca é apagado enquanto houver docs-dia nele.
+# Interrompido no meio, basta rodar de novo: o que já foi apagado não é relido; docs que já estão num
+# arquivo conferido do manifesto (queda entre a conferência e a remoção, ou items já marcados para o
+# TTL) não são regravados, só removidos/marcados; o resto vai para um arquivo novo.
+# Os arquivos têm as colunas do export (BASE_FIELDS) e podem voltar ao Firestore com
+#   python .\seed_firestore.py --mode load --no-aggregates --input archive\f_ano_mes_ref=2025-07\part-….parquet
+# (--no-aggregates: f_monthly_total_m3/f_last_* do medidor já contam essas leituras e não são somados de
+# novo). Os items voltam com id e f_ingested_at novos, então o próximo rollup_firestore os soma outra vez
+# nos t_agg_*; o rollup --rebuild recalcula tudo, mas só enxerga o que está no Firestore.
+
+from __future__ import annotations
+
+import gzip
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from hidro_core import BASE_DIR, get_db
+from export_readings import BASE_FIELDS, PARQUET_BATCH_ROWS, parquet_schema
+from packed_days import DAYS_COL
+from purge_firestore import make_bulk_writer
+from readings_io import require_pyarrow
+
+ARCHIVE_DIR = BASE_DIR / "archive"
+MANIFEST = "manifest.jsonl"
+PAGE_SIZE = 1000
+METERS_PER_FILE = 100
+
+# ---------- Seleção ----------
+def month_start(bucket: str) -> datetime:
+    return datetime(int(bucket[:4]), int(bucket[5:7]), 1, tzinfo=timezone.utc)
+
+def month_end(bucket: str) -> datetime:
+    """Início do mês seguinte ao bucket AAAA_MM (UTC)."""
+    y, m = int(bucket[:4]), int(bucket[5:7])
+    return datetime(y + (m == 12), 1 if m == 12 else m + 1, 1, tzinfo=timezone.utc)
+
+def _is_bucket(b: str) -> bool:
+    return len(b) == 7 and b[4] == "_" and b[:4].isdigit() and b[5:].isdigit()
+
+def eligible_buckets(db, retention_days: int, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+    """AAAA_MM -> medidores com bucket inteiro antes de (now − retention_days) e ainda não marcado."""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=retention_days)
+    out: Dict[str, List[str]] = {}
+    for snap in db.collection_group("t_leituras").select(["f_archived_at"]).stream():
+        b = snap.id
+        if not _is_bucket(b) or month_end(b) > cutoff or (snap.to_dict() or {}).get("f_archived_at"):
+            continue
+        out.setdefault(b, []).append(snap.reference.parent.parent.id)
+    return {b: sorted(mids) for b, mids in sorted(out.items())}
+
+def _bucket_ref(db, mid: str, bucket: str):
+    return db.collection("t_medidor").document(mid).collection("t_leituras").document(bucket)
+
+def _items_ref(db, mid: str, bucket: str):
+    return _bucket_ref(db, mid, bucket).collection("items")
+
+def has_days(db, mid: str, bucket: str) -> bool:
+    """O bucket tem docs-dia (layout dias do packed_days)? Esses buckets não são arquivados."""
+    return bool(list(_bucket_ref(db, mid, bucket).collection(DAYS_COL).select([]).limit(1).stream()))
+
+def _count(q) -> int:
+    return int(next(r.value for row in q.count(alias="n").get() for r in row))
+
+def iter_bucket_items(db, mid: str, bucket: str, page_size: int = PAGE_SIZE) -> Iterator[Any]:
+    """Todos os items do bucket (sem filtro de f_ts_utc: o que está no bucket é o que será apagado)."""
+    q = _items_ref(db, mid, bucket).order_by("__name__")
+    last = None
+    while True:
+        page = q.limit(page_size) if last is None else q.start_after(last).limit(page_size)
+        n = 0
+        for snap in page.stream():
+            n += 1
+            last = snap
+            yield snap
+        if n < page_size:
+            return
+
+# ---------- Arquivos ----------
+def _json_default(v: Any) -> Any:
+    return v.isoformat() if isinstance(v, datetime) else str(v)
+
+class PartWriter:
+    """Um arquivo de arquivo morto (Parquet zstd ou JSONL gzip), gravado em .tmp e renomeado ao fechar."""
+
+    def __init__(self, path: Path, fmt: str = "parquet", batch_rows: int = PARQUET_BATCH_ROWS):
+        self.path = path
+        self.format = fmt
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._tmp = path.with_name(path.name + ".tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == "parquet":
+            self.pa, pq = require_pyarrow()
+            self.schema = parquet_schema(BASE_FIELDS)
+            self._w = pq.ParquetWriter(str(self._tmp), self.schema, compression="zstd")
+            self._buf: Dict[str, list] = {f: [] for f in BASE_FIELDS}
+        else:
+            self._f = gzip.open(self._tmp, "wt", encoding="utf-8")
+
+    def write(self, r: Dict[str, Any]) -> None:
+        self.rows += 1
+        if self.format == "parquet":
+            for f in BASE_FIELDS:
+                self._buf[f].append(r.get(f))
+            if len(self._buf["_doc_id"]) >= self.batch_rows:
+                self._write_batch()
+        else:
+            self._f.write(json.dumps(r, ensure_ascii=False, default=_json_default) + "\n")
+
+    def _write_batch(self) -> None:
+        if not self._buf["_doc_id"]:
+            return
+        arrays = [self.pa.array(self._buf[f], type=self.schema.field(f).type) for f in BASE_FIELDS]
+        self._w.write_batch(self.pa.record_batch(arrays, schema=self.schema))
+        self._buf = {f: [] for f in BASE_FIELDS}
+
+    def close(self) -> None:
+        if self.format == "parquet":
+            self._write_batch()
+            self._w.close()
+        else:
+            self._f.close()
+        self._tmp.replace(self.path)
+
+    def abort(self) -> None:
+        try:
+            if self.format == "parquet":
+                self._w.close()
+            else:
+                self._f.close()
+        finally:
+            self._tmp.unlink(missing_ok=True)
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def read_keys(path: Path) -> List[Tuple[str, str]]:
+    """(f_medidor_id, _doc_id) de cada linha do arquivo, relidos do disco."""
+    if path.name.endswith(".parquet"):
+        _, pq = require_pyarrow()
+        t = pq.read_table(str(path), columns=["f_medidor_id", "_doc_id"])
+        return list(zip(t.column("f_medidor_id").to_pylist(), t.column("_doc_id").to_pylist()))
+    out = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                d = json.loads(line)
+                out.append((d.get("f_medidor_id"), d.get("_doc_id")))
+    return out
+
+class Manifest:
+    """archive/manifest.jsonl: 1 linha por arquivo (append, thread-safe)."""
+
+    def __init__(self, root: Path):
+        self.path = root / MANIFEST
+        self._lock = threading.Lock()
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=_json_default) + "\n")
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Última linha de cada arquivo."""
+        if not self.path.exists():
+            return []
+        out: Dict[str, Dict[str, Any]] = {}
+        for line in self.path.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                e = json.loads(line)
+                out[e["arquivo"]] = e
+        return list(out.values())
+
+    def archived_keys(self, bucket: str) -> set:
+        """(f_medidor_id, _doc_id) já gravados e conferidos em arquivos do mês `bucket` (relidos do disco)."""
+        out: set = set()
+        for e in self.entries():
+            path = self.path.parent / e["arquivo"]
+            if e.get("ano_mes") == bucket and path.exists():
+                out.update(read_keys(path))
+        return out
+
+# ---------- Arquivamento ----------
+def remove_archived(db, bucket: str, mids: List[str], keys: List[Tuple[str, str]], mode: str, ops_per_second: int) -> int:
+    """Apaga (ou marca f_archived_at) os items arquivados e os docs de bucket que ficaram vazios. Retorna falhas."""
+    failures: List[Any] = []
+
+    def on_error(err, bw) -> bool:
+        if err.attempts < 5:
+            return True
+        failures.append(err)
+        return False
+
+    per_mid: Dict[str, int] = {}
+    for mid, _ in keys:
+        per_mid[mid] = per_mid.get(mid, 0) + 1
+    now = datetime.now(timezone.utc)
+    bw = make_bulk_writer(db, ops_per_second)
+    bw.on_write_error(on_error)
+    try:
+        for mid, doc_id in keys:
+            ref = _items_ref(db, mid, bucket).document(doc_id)
+            if mode == "ttl":
+                bw.update(ref, {"f_archived_at": now})
+            else:
+                bw.delete(ref)
+        bw.flush()
+        for mid in mids:
+            bref = _bucket_ref(db, mid, bucket)
+            if failures:
+                break
+            if has_days(db, mid, bucket):  # docs-dia ficariam órfãos sem o doc do bucket
+                continue
+            if mode == "ttl":
+                # todos os items do bucket foram marcados agora (nenhum atrasado chegou depois da leitura)
+                if _count(bref.collection("items")) == per_mid.get(mid, 0):
+                    bw.update(bref, {"f_archived_at": now})
+            elif not list(bref.collection("items").select([]).limit(1).stream()):
+                bw.delete(bref)
+    finally:
+        bw.close()
+    return len(failures)
+
+def archive_part(db, root: Path, bucket: str, mids: List[str], name: str, fmt: str, mode: str,
+                 delete: bool, ops_per_second: int, manifest: Manifest, page_size: int = PAGE_SIZE,
+                 archived: Optional[set] = None) -> Dict[str, Any]:
+    """
+    Gera, confere e registra um arquivo com os buckets `bucket` de `mids`; depois apaga/marca os docs.
+    Docs em `archived` (já num arquivo conferido de outra execução) não são regravados, só removidos.
+    """
+    t0 = time.perf_counter()
+    skipped = [mid for mid in mids if has_days(db, mid, bucket)]
+    if skipped:
+        print(f"   ⚠️  {bucket}: {len(skipped)} medidor(es) com docs-dia (layout dias) fora do arquivamento: "
+              f"{', '.join(skipped[:10])}")
+        mids = [mid for mid in mids if mid not in set(skipped)]
+        if not mids:
+            return {"arquivo": None, "linhas": 0}
+    ext = "parquet" if fmt == "parquet" else "jsonl.gz"
+    path = root / f"f_ano_mes_ref={bucket.replace('_', '-')}" / f"{name}.{ext}"
+    writer = PartWriter(path, fmt)
+    keys: List[Tuple[str, str]] = []
+    prev: List[Tuple[str, str]] = []
+    ts_min = ts_max = None
+    try:
+        for mid in mids:
+            for snap in iter_bucket_items(db, mid, bucket, page_size):
+                if archived and (mid, snap.id) in archived:
+                    prev.append((mid, snap.id))
+                    continue
+                d = snap.to_dict() or {}
+                d["_doc_id"] = snap.id
+                d.setdefault("f_medidor_id", mid)
+                ts = d.get("f_ts_utc")
+                if isinstance(ts, datetime):
+                    ts_min = ts if ts_min is None or ts < ts_min else ts_min
+                    ts_max = ts if ts_max is None or ts > ts_max else ts_max
+                writer.write(d)
+                keys.append((mid, snap.id))
+    except BaseException:
+        writer.abort()
+        raise
+    if not keys:
+        writer.abort()
+        if delete:  # buckets sem items novos: só os já arquivados e o doc do bucket saem (senão voltam sempre)
+            remove_archived(db, bucket, mids, prev, mode, ops_per_second)
+        return {"arquivo": None, "linhas": 0, "ja_arquivadas": len(prev)}
+    writer.close()
+
+    # conferência: o arquivo relido tem exatamente os docs lidos
+    back = read_keys(path)
+    if len(back) != len(keys) or set(back) != set(keys):
+        raise RuntimeError(f"{path.name}: conferência falhou ({len(back)} linhas no arquivo, {len(keys)} docs lidos)")
+    entry = {
+        "arquivo": path.relative_to(root).as_posix(), "ano_mes": bucket, "formato": fmt, "linhas": len(keys),
+        "bytes": path.stat().st_size, "sha256": sha256_file(path), "medidores": len(mids),
+        "ts_min": ts_min, "ts_max": ts_max, "criado_em": datetime.now(timezone.utc), "acao": "conferido",
+    }
+    manifest.append(entry)
+    if delete:
+        failed = remove_archived(db, bucket, mids, keys + prev, mode, ops_per_second)
+        entry = {**entry, "acao": ("marcado_ttl" if mode == "ttl" else "apagado") if not failed else f"falhas:{failed}",
+                 "removido_em": datetime.now(timezone.utc)}
+        manifest.append(entry)
+    entry["segundos"] = round(time.perf_counter() - t0, 1)
+    return entry
+
+def cmd_archive(db, root: Path, retention_days: int, fmt: str = "parquet", mode: str = "delete", delete: bool = True,
+                workers: int = 8, meters_per_file: int = METERS_PER_FILE, ops_per_second: int = 1000, dry_run: bool = False) -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    print(f"→ Arquivamento: buckets mensais encerrados antes de {cutoff:%Y-%m-%d} (retenção {retention_days} dias)")
+    buckets = eligible_buckets(db, retention_days)
+    if not buckets:
+        print("✅ Nada para arquivar.")
+        return
+    for b, mids in buckets.items():
+        print(f"   {b}: {len(mids)} medidores")
+    if dry_run:
+        print("[dry-run] nada foi lido dos items nem gravado")
+        return
+
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")  # único mesmo com execuções no mesmo segundo
+    manifest = Manifest(root)
+    parts = [(b, mids[i:i + meters_per_file], f"part-{run_id}-{k:04d}")
+             for b, mids in buckets.items() for k, i in enumerate(range(0, len(mids), meters_per_file))]
+    print(f"   {len(parts)} arquivos ({fmt}), {workers} workers, ação: {mode if delete else 'manter no Firestore'}")
+    t0 = time.perf_counter()
+    linhas = arquivos = erros = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        archived = {b: manifest.archived_keys(b) for b in buckets}
+        futs = {ex.submit(archive_part, db, root, b, mids, name, fmt, mode, delete, ops_per_second, manifest,
+                          archived=archived[b]): name
+                for b, mids, name in parts}
+        for fut in as_completed(futs):
+            try:
+                e = fut.result()
+            except Exception as exc:
+                erros += 1
+                print(f"   ⚠️  {futs[fut]}: {exc}")
+                continue
+            if not e["arquivo"]:
+                if e.get("ja_arquivadas"):
+                    print(f"   {futs[fut]}: {e['ja_arquivadas']} leituras já estavam no arquivo morto (só removidas)")
+                continue
+            arquivos += 1
+            linhas += e["linhas"]
+            el = time.perf_counter() - t0
+            print(f"   {e['arquivo']}: {e['linhas']} linhas, {e['bytes'] / 1e6:.1f} MB, {e['acao']} "
+                  f"({e['segundos']}s; total {linhas} linhas, {linhas / el:.0f}/s)")
+    el = time.perf_counter() - t0
+    print(f"{'✅' if not erros else '⚠️ '} {linhas} leituras em {arquivos} arquivos em {el:.1f}s ({linhas / el if el else 0:.0f} leituras/s)"
+          + (f"; {erros} arquivos com erro (rode de novo)" if erros else ""))
+
+def cmd_verify(root: Path) -> bool:
+    entries = Manifest(root).entries()
+    if not entries:
+        print("(manifesto vazio)")
+        return True
+    ok = True
+    for e in entries:
+        path = root / e["arquivo"]
+        if not path.exists():
+            print(f"   ✗ {e['arquivo']}: arquivo ausente")
+            ok = False
+            continue
+        problems = []
+        if sha256_file(path) != e["sha256"]:
+            problems.append("sha256 diferente")
+        try:
+            n = len(read_keys(path))
+        except Exception as exc:
+            n = None
+            problems.append(f"ilegível ({exc})")
+        if n is not None and n != e["linhas"]:
+            problems.append(f"{n} linhas (manifesto: {e['linhas']})")
+        print(f"   {'✗' if problems else '✔'} {e['arquivo']}: {', '.join(problems) if problems else str(n) + ' linhas ok'} [{e['acao']}]")
+        ok = ok and not problems
+    print("✅ arquivo morto íntegro" if ok else "⚠️  há arquivos com problema")
+    return ok
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Arquiva buckets mensais antigos de leituras em Parquet/JSONL e remove do Firestore")
+    ap.add_argument("--dir", default=str(ARCHIVE_DIR), help=f"Pasta do arquivo morto (default {ARCHIVE_DIR.name}/)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    a = sub.add_parser("archive", help="Arquiva e remove os buckets fora da retenção")
+    a.add_argument("--retention-days", type=int, default=60, help="Dias mantidos no Firestore (default 60)")
+    a.add_argument("--format", choices=["parquet", "jsonl"], default="parquet", help="parquet (zstd, default) ou jsonl (gzip)")
+    a.add_argument("--mode", choices=["delete", "ttl"], default="delete", help="delete: apaga já; ttl: marca f_archived_at para a política TTL")
+    a.add_argument("--no-delete", action="store_true", help="Só gera e confere os arquivos (não mexe no Firestore)")
+    a.add_argument("--workers", type=int, default=8, help="Arquivos gerados em paralelo (default 8)")
+    a.add_argument("--meters-per-file", type=int, default=METERS_PER_FILE, help=f"Medidores por arquivo (default {METERS_PER_FILE})")
+    a.add_argument("--ops-per-second", type=int, default=1000, help="Limite do BulkWriter por worker (default 1000)")
+    a.add_argument("--dry-run", action="store_true", help="Só lista os buckets elegíveis")
+    sub.add_parser("verify", help="Confere sha256 e linhas de cada arquivo do manifesto")
+    args = ap.parse_args(argv)
+
+    root = Path(args.dir).resolve()
+    if args.cmd == "verify":
+        if not cmd_verify(root):
+            raise SystemExit(1)
+        return
+    cmd_archive(get_db(), root, args.retention_days, args.format, args.mode, not args.no_delete,
+                args.workers, max(1, args.meters_per_file), args.ops_per_second, args.dry_run)
+
+if __name__ == "__main__":
+    main()
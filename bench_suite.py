@@ -0,0 +1,483 @@
+# python .\bench_suite.py                                        # cliente em memória (fake_firestore), escala padrão
+# python .\bench_suite.py --meters 200 --days 7 --freq 5m        # escala: medidores × dias × frequência
+# python .\bench_suite.py --fake-latency-ms 5                    # fake com 5 ms por RPC (aproxima a rede)
+# python .\bench_suite.py --backend emulator                     # Firestore emulator (FIRESTORE_EMULATOR_HOST)
+# python .\bench_suite.py --cases simulate,export_csv            # só alguns casos
+# python .\bench_suite.py --cost                                 # + leituras/gravações/deletes e USD por caso
+# python .\bench_suite.py --save-baseline                        # grava o resultado como baseline
+# (ou: python .\hidro.py bench …)
+#
+# Mede os caminhos quentes nos mesmos dados, em sequência:
+#   bootstrap     seed_firestore.cmd_bootstrap de uma planilha gerada (medidores + clientes)   latência: commit do lote
+#   write_reading seed_firestore.write_reading, 1 leitura por chamada (3 RPCs)                latência: chamada
+#   simulate      seed_firestore.cmd_simulate (lotes de 500, --workers)                       latência: commit do lote
+#   export_csv    export_readings.iter_items_all_sorted + export_csv                          latência: página de leitura
+#   export_jsonl  export_readings.iter_items_all_sorted + export_jsonl                        latência: página de leitura
+#   purge         purge_firestore.purge_readings (items + buckets)                            latência: BulkWriter de 1 partição
+# Para cada caso: ops, ops/s, p50/p95/p99 (ms), pico de RSS do processo e quanto ele subiu no caso;
+# com --cost também leituras/gravações/deletes e USD estimado (firestore_meter.py).
+# Resultado em bench/results-<backend>-<data>.json; se existir bench/baseline-<backend>.json (ou --baseline),
+# compara: ops/s abaixo ou p95 acima da baseline além de --tolerance % é regressão (código de saída 1).
+# Com --backend emulator os dados do emulador são apagados antes e depois (nunca roda sem o emulador).
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import platform
+import statistics
+import threading
+import contextlib
+import subprocess
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from hidro_core import BASE_DIR, EMULATOR_PROJECT, emulator_host, get_db
+
+BENCH_DIR = BASE_DIR / "bench"
+CASES = ["bootstrap", "write_reading", "simulate", "export_csv", "export_jsonl", "purge"]
+# caso -> caso que prepara os dados dele (roda sem medir se não foi pedido)
+NEEDS = {"write_reading": "bootstrap", "simulate": "bootstrap", "export_csv": "simulate", "export_jsonl": "simulate", "purge": "simulate"}
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# ---------- memória ----------
+def rss_bytes() -> int:
+    """RSS atual do processo (psutil, /proc, API do Windows ou, por último, o pico do getrusage)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    statm = Path("/proc/self/statm")
+    if statm.exists():
+        return int(statm.read_text().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PMC(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (n, ctypes.c_size_t) for n in ("PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                                               "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                                               "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+        pmc = PMC()
+        pmc.cb = ctypes.sizeof(PMC)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(pmc), pmc.cb)
+        return pmc.WorkingSetSize
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class PeakRss:
+    """Amostra o RSS numa thread enquanto o caso roda; guarda o início e o pico."""
+
+    def __init__(self, every_s: float = 0.02):
+        self.every_s = every_s
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.every_s):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __enter__(self) -> "PeakRss":
+        self.start = self.peak = rss_bytes()
+        self._thread = threading.Thread(target=self._run, name="peak-rss", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+# ---------- cronometragem ----------
+def percentile(sorted_vals: List[float], p: float) -> Optional[float]:
+    if not sorted_vals:
+        return None
+    k = min(len(sorted_vals) - 1, max(0, round(p / 100 * len(sorted_vals) + 0.5) - 1))
+    return sorted_vals[k]
+
+class Probe:
+    """
+    Repassa tudo ao cliente Firestore e cronometra os commits de WriteBatch e o close() dos BulkWriters,
+    contando items gravados e deletes enfileirados. Os scripts recebem o Probe no lugar do db.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._lock = threading.Lock()
+        self.samples: List[float] = []
+        self.items = 0
+        self.deletes = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._db, name)
+
+    def record(self, seconds: float, items: int = 0, deletes: int = 0) -> None:
+        with self._lock:
+            self.samples.append(seconds)
+            self.items += items
+            self.deletes += deletes
+
+    def reset(self) -> None:
+        with self._lock:
+            self.samples, self.items, self.deletes = [], 0, 0
+
+    def batch(self):
+        return _TimedBatch(self, self._db.batch())
+
+    def bulk_writer(self, *args, **kwargs):
+        return _TimedBulkWriter(self, self._db.bulk_writer(*args, **kwargs))
+
+class _TimedBatch:
+    def __init__(self, probe: Probe, batch):
+        self._probe, self._batch, self._items = probe, batch, 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._batch, name)
+
+    def set(self, reference, document_data, merge=False):
+        if "/items/" in reference.path:
+            self._items += 1
+        return self._batch.set(reference, document_data, merge=merge)
+
+    def commit(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = self._batch.commit(*args, **kwargs)
+        self._probe.record(time.perf_counter() - t0, items=self._items)
+        self._items = 0
+        return out
+
+class _TimedBulkWriter:
+    """Mede do create ao close() (o BulkWriter envia em segundo plano: é o tempo da partição inteira)."""
+
+    def __init__(self, probe: Probe, bw):
+        self._probe, self._bw, self._deletes = probe, bw, 0
+        self._t0 = time.perf_counter()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._bw, name)
+
+    def delete(self, *args, **kwargs):
+        self._deletes += 1
+        return self._bw.delete(*args, **kwargs)
+
+    def close(self):
+        out = self._bw.close()
+        self._probe.record(time.perf_counter() - self._t0, deletes=self._deletes)
+        return out
+
+def timed_pages(rows: Iterable[Dict[str, Any]], probe: Probe, page_size: int) -> Iterator[Dict[str, Any]]:
+    """Repassa as linhas e registra o tempo de cada página de `page_size` linhas."""
+    t0 = time.perf_counter()
+    n = 0
+    for r in rows:
+        yield r
+        n += 1
+        if n % page_size == 0:
+            t1 = time.perf_counter()
+            probe.record(t1 - t0)
+            t0 = t1
+    if n % page_size:
+        probe.record(time.perf_counter() - t0)
+
+# ---------- dados ----------
+def build_cadastro_xlsx(path: Path, meters: int) -> None:
+    """Planilha de cadastro mínima e válida: 1 localização, 1 condomínio, N clientes e N medidores."""
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("t_localizacao")
+    ws.append(["_id", "f_logradouro", "f_cidade", "f_uf", "f_geo_lat", "f_geo_lon"])
+    ws.append(["LOC-BENCH", "Rua do Benchmark", "São Paulo", "SP", -23.55, -46.63])
+    ws = wb.create_sheet("t_condominio")
+    ws.append(["_id", "f_nome_condominio", "f_localizacao"])
+    ws.append(["CON-BENCH", "Condomínio Benchmark", "LOC-BENCH"])
+    ws = wb.create_sheet("t_cliente")
+    ws.append(["_id", "f_nome_cliente", "f_condominio_id", "f_apto"])
+    for i in range(1, meters + 1):
+        ws.append([f"CLI-B{i:06d}", f"Cliente {i}", "CON-BENCH", str(i)])
+    ws = wb.create_sheet("t_medidor")
+    ws.append(["_id", "f_cliente_id", "f_condominio_id", "f_tem_valvula", "f_modelo_hw"])
+    for i in range(1, meters + 1):
+        ws.append([f"MTR-B{i:06d}", f"CLI-B{i:06d}", "CON-BENCH", "false", "ESP32"])
+    wb.save(path)
+
+def reset_emulator(project: str) -> None:
+    """Apaga todos os docs do emulador (endpoint de teste do emulador; não existe em produção)."""
+    import urllib.request
+    url = f"http://{emulator_host()}/emulator/v1/projects/{project}/databases/(default)/documents"
+    urllib.request.urlopen(urllib.request.Request(url, method="DELETE"), timeout=30).read()
+
+# ---------- casos ----------
+class Bench:
+    """Roda os casos em sequência sobre o mesmo banco (cada caso usa os dados dos anteriores)."""
+
+    def __init__(self, db, args, workdir: Path):
+        self.raw_db = db
+        self.probe = Probe(db)
+        self.args = args
+        self.workdir = workdir
+        self.meter_ids = [f"MTR-B{i:06d}" for i in range(1, args.meters + 1)]
+        self.xlsx = workdir / "cadastro_bench.xlsx"
+        if not self.xlsx.exists():  # gerada fora da medição
+            build_cadastro_xlsx(self.xlsx, args.meters)
+        import numpy, pandas  # import pesado (cadastro_io/reading_generator) também fica fora da medição
+
+    def bootstrap(self) -> tuple:
+        import seed_firestore
+        seed_firestore.cmd_bootstrap(self.probe, self.xlsx)
+        return 2 * self.args.meters + 2, "docs", "commit"
+
+    def write_reading(self) -> tuple:
+        import seed_firestore
+        n = self.args.single
+        t = START - timedelta(days=1)
+        for i in range(n):
+            mid = self.meter_ids[i % len(self.meter_ids)]
+            t0 = time.perf_counter()
+            seed_firestore.write_reading(self.probe, mid, None, t + timedelta(minutes=i), 0.001, 1)
+            self.probe.record(time.perf_counter() - t0, items=1)
+        return n, "leituras", "chamada"
+
+    def simulate(self) -> tuple:
+        import seed_firestore
+        end = START + timedelta(days=self.args.days)
+        seed_firestore.cmd_simulate(self.probe, START.strftime("%Y-%m-%dT%H:%M:%S"), end.strftime("%Y-%m-%dT%H:%M:%S"),
+                                    self.args.freq, None, self.meter_ids, workers=self.args.workers, gen_opts={"seed": 1})
+        return self.probe.items, "leituras", "commit"
+
+    def _export(self, kind: str) -> tuple:
+        import export_readings as er
+        rows = timed_pages(er.iter_items_all_sorted(self.probe, None, None), self.probe, er.PAGE_SIZE)
+        out = self.workdir / f"bench_export.{kind}"
+        n = er.export_csv(rows, out) if kind == "csv" else er.export_jsonl(rows, out)
+        out.unlink(missing_ok=True)
+        return n, "linhas", "página"
+
+    def export_csv(self) -> tuple:
+        return self._export("csv")
+
+    def export_jsonl(self) -> tuple:
+        return self._export("jsonl")
+
+    def purge(self) -> tuple:
+        import purge_firestore
+        purge_firestore.purge_readings(self.probe, partitions=self.args.partitions, workers=self.args.workers,
+                                       ops_per_second=self.args.ops_per_second)
+        return self.probe.deletes, "deletes", "partição"
+
+    def _quiet(self):
+        return contextlib.nullcontext() if self.args.verbose else contextlib.redirect_stdout(open(os.devnull, "w", encoding="utf-8"))
+
+    def setup(self, case: str) -> None:
+        """Roda um caso só para preparar os dados de outro (sem medir)."""
+        with self._quiet() as sink:
+            getattr(self, case)()
+        if sink is not None:
+            sink.close()
+
+    def run(self, case: str) -> Dict[str, Any]:
+        self.probe.reset()
+        meter = None
+        if self.args.cost:  # leituras/gravações/deletes do caso (firestore_meter); a medição tem custo de CPU
+            from firestore_meter import Meter, MeteredClient, load_prices
+            meter = Meter(load_prices(self.args.prices))
+            self.probe._db = MeteredClient(self.raw_db, meter)
+        with PeakRss() as mem, self._quiet() as sink:
+            t0 = time.perf_counter()
+            ops, unit, lat_unit = getattr(self, case)()
+            seconds = time.perf_counter() - t0
+        if sink is not None:
+            sink.close()
+        self.probe._db = self.raw_db
+        lat = sorted(self.probe.samples)
+        ms = lambda v: round(v * 1000, 3) if v is not None else None
+        cost = {}
+        if meter is not None:
+            t = meter.totals()
+            cost = {"leituras": t["reads"], "gravacoes": t["writes"], "deletes": t["deletes"], "usd": round(meter.cost_usd(t), 6)}
+        return {**cost,
+            "ops": ops, "unidade": unit, "segundos": round(seconds, 3),
+            "ops_s": round(ops / seconds, 1) if seconds > 0 else None,
+            "latencia": lat_unit, "amostras": len(lat),
+            "p50_ms": ms(percentile(lat, 50)), "p95_ms": ms(percentile(lat, 95)), "p99_ms": ms(percentile(lat, 99)),
+            "pico_rss_mb": round(mem.peak / 2**20, 1), "rss_delta_mb": round((mem.peak - mem.start) / 2**20, 1),
+        }
+
+# ---------- resultados / baseline ----------
+def combine_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Mediana de tempo, vazão e percentis entre as repetições; pico de memória = o maior."""
+    out = dict(runs[0])
+    if len(runs) > 1:
+        for k in ("segundos", "ops_s", "p50_ms", "p95_ms", "p99_ms"):
+            vals = [r[k] for r in runs if r[k] is not None]
+            out[k] = round(statistics.median(vals), 3) if vals else None
+        for k in ("pico_rss_mb", "rss_delta_mb"):
+            out[k] = max(r[k] for r in runs)
+    out["repeticoes"] = len(runs)
+    return out
+
+def git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(f"{'caso':14s} {'ops':>9s} {'ops/s':>11s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'pico RSS':>9s} {'Δ RSS':>7s}  latência")
+    for name, r in results["casos"].items():
+        f = lambda v: "-" if v is None else f"{v:.2f}"
+        print(f"{name:14s} {r['ops']:>9d} {r['ops_s'] or 0:>11.1f} {f(r['p50_ms']):>9s} {f(r['p95_ms']):>9s} "
+              f"{f(r['p99_ms']):>9s} {r['pico_rss_mb']:>7.1f}MB {r['rss_delta_mb']:>5.1f}MB  {r['latencia']}")
+    if any("usd" in r for r in results["casos"].values()):
+        print(f"\n{'caso':14s} {'leituras':>10s} {'gravações':>10s} {'deletes':>9s} {'USD':>10s} {'USD/1M ops':>11s}")
+        for name, r in results["casos"].items():
+            if "usd" in r:
+                per_m = r["usd"] / r["ops"] * 1e6 if r["ops"] else 0.0
+                print(f"{name:14s} {r['leituras']:>10d} {r['gravacoes']:>10d} {r['deletes']:>9d} {r['usd']:>10.4f} {per_m:>11.2f}")
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance_pct: float) -> List[str]:
+    """Imprime a comparação com a baseline e devolve as regressões encontradas."""
+    keys = ("backend", "meters", "days", "freq", "workers", "fake_latency_ms")
+    diff = [k for k in keys if results["meta"].get(k) != baseline.get("meta", {}).get(k)]
+    if diff:
+        print(f"⚠️  baseline com outra configuração ({', '.join(diff)}): comparação só indicativa")
+    tol = tolerance_pct / 100
+    regressions = []
+    print(f"\ncomparação com a baseline ({baseline.get('meta', {}).get('criado_em', '?')}, git {baseline.get('meta', {}).get('git') or '?'}):")
+    for name, r in results["casos"].items():
+        b = baseline.get("casos", {}).get(name)
+        if not b:
+            print(f"   {name:14s} (sem baseline)")
+            continue
+        notes = [] if r["ops"] == b.get("ops") else [f"ops {r['ops']} (baseline {b.get('ops')})"]
+        if b.get("ops_s") and r.get("ops_s") is not None:
+            d = r["ops_s"] / b["ops_s"] - 1
+            notes.append(f"ops/s {d:+.1%}")
+            if d < -tol:
+                regressions.append(f"{name}: ops/s {b['ops_s']:.1f} → {r['ops_s']:.1f} ({d:+.1%})")
+        if b.get("p95_ms") and r.get("p95_ms") is not None:
+            d = r["p95_ms"] / b["p95_ms"] - 1
+            notes.append(f"p95 {d:+.1%}")
+            if d > tol:
+                regressions.append(f"{name}: p95 {b['p95_ms']:.2f} → {r['p95_ms']:.2f} ms ({d:+.1%})")
+        for k in ("leituras", "gravacoes", "deletes"):  # contagens são determinísticas: subir é custo a mais
+            if k in r and k in b and r[k] != b[k]:
+                notes.append(f"{k} {b[k]} → {r[k]}")
+                if r[k] > b[k] * (1 + tol):
+                    regressions.append(f"{name}: {k} {b[k]} → {r[k]}")
+        if b.get("pico_rss_mb"):
+            notes.append(f"pico RSS {r['pico_rss_mb'] - b['pico_rss_mb']:+.1f}MB")
+        bad = any(x.startswith(name + ":") for x in regressions)
+        print(f"   {'✗' if bad else '✔'} {name:14s} {', '.join(notes)}")
+    return regressions
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Benchmark de gravação, export e purge (fake em memória ou Firestore emulator)")
+    ap.add_argument("--backend", choices=["fake", "emulator"], default="fake", help="fake (em memória, default) ou emulator")
+    ap.add_argument("--fake-latency-ms", type=float, default=0.0, help="Latência simulada por RPC no fake (default 0)")
+    ap.add_argument("--meters", type=int, default=20, help="Medidores (default 20)")
+    ap.add_argument("--days", type=int, default=7, help="Dias simulados (default 7)")
+    ap.add_argument("--freq", default="15m", help="Frequência das leituras: 5m | 15m | 1h | 6h | 1d (default 15m)")
+    ap.add_argument("--single", type=int, default=200, help="Leituras do caso write_reading (default 200)")
+    ap.add_argument("--workers", type=int, default=4, help="Workers do simulate e do purge (default 4)")
+    ap.add_argument("--partitions", type=int, default=8, help="Partições do purge (default 8)")
+    ap.add_argument("--ops-per-second", type=int, default=5000, help="Limite do BulkWriter no purge (default 5000)")
+    ap.add_argument("--repeat", type=int, default=1, help="Repetições (banco vazio a cada uma); usa a mediana (default 1)")
+    ap.add_argument("--cases", default=",".join(CASES), help=f"Casos, separados por vírgula (default: {','.join(CASES)})")
+    ap.add_argument("--out", help="Arquivo JSON do resultado (default bench/results-<backend>-<data>.json)")
+    ap.add_argument("--baseline", help="Baseline para comparar (default bench/baseline-<backend>.json, se existir)")
+    ap.add_argument("--save-baseline", action="store_true", help="Grava este resultado como a baseline")
+    ap.add_argument("--tolerance", type=float, default=15.0, help="Variação tolerada em %% antes de acusar regressão (default 15)")
+    ap.add_argument("--cost", action="store_true", help="Mede leituras/gravações/deletes e custo USD de cada caso (firestore_meter)")
+    ap.add_argument("--prices", help="JSON com a tabela de preços para --cost (ver firestore_meter.py)")
+    ap.add_argument("--verbose", action="store_true", help="Mostra a saída dos scripts medidos")
+    args = ap.parse_args(argv)
+
+    wanted = {c.strip() for c in args.cases.split(",") if c.strip()}
+    unknown = wanted - set(CASES)
+    if unknown:
+        ap.error(f"casos desconhecidos: {', '.join(sorted(unknown))} (use: {', '.join(CASES)})")
+    cases = [c for c in CASES if c in wanted]  # ordem fixa: purge por último
+    setup = set()
+    for c in cases:
+        dep = NEEDS.get(c)
+        while dep and dep not in wanted:
+            setup.add(dep)
+            dep = NEEDS.get(dep)
+    if args.meters < 1 or args.days < 1 or args.repeat < 1:
+        ap.error("--meters, --days e --repeat precisam ser ≥ 1")
+
+    from fake_firestore import FakeClient
+    if args.backend == "emulator":
+        if not emulator_host():
+            raise SystemExit("--backend emulator requer FIRESTORE_EMULATOR_HOST (o benchmark apaga dados; nunca roda em produção)")
+        db = get_db()
+        reset_emulator(db.project or EMULATOR_PROJECT)
+    else:
+        db = FakeClient(latency_ms=args.fake_latency_ms)
+
+    meta = {
+        "backend": args.backend, "meters": args.meters, "days": args.days, "freq": args.freq, "workers": args.workers,
+        "fake_latency_ms": args.fake_latency_ms if args.backend == "fake" else None, "single": args.single,
+        "python": platform.python_version(), "plataforma": platform.platform(), "git": git_rev(),
+        "criado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    print(f"→ Benchmark {args.backend}: {args.meters} medidores × {args.days} dias × {args.freq} ({', '.join(cases)})"
+          + (f", {args.repeat} repetições" if args.repeat > 1 else ""))
+    runs: Dict[str, List[Dict[str, Any]]] = {c: [] for c in cases}
+    with tempfile.TemporaryDirectory(prefix="hidro_bench_") as tmp:
+        for rep in range(args.repeat):
+            if rep:  # cada repetição parte de um banco vazio
+                if args.backend == "emulator":
+                    reset_emulator(db.project or EMULATOR_PROJECT)
+                else:
+                    db = FakeClient(latency_ms=args.fake_latency_ms)
+            bench = Bench(db, args, Path(tmp))
+            try:
+                for case in CASES:
+                    if case in setup:
+                        print(f"   ({case}: preparando dados, sem medir)")
+                        bench.setup(case)
+                    if case not in wanted:
+                        continue
+                    r = bench.run(case)
+                    runs[case].append(r)
+                    print(f"   {case}: {r['ops']} {r['unidade']} em {r['segundos']:.2f}s ({r['ops_s'] or 0:.0f}/s)")
+            finally:
+                if args.backend == "emulator":
+                    reset_emulator(db.project or EMULATOR_PROJECT)
+    results: Dict[str, Any] = {"meta": meta, "casos": {c: combine_runs(rs) for c, rs in runs.items()}}
+    print()
+    print_results(results)
+
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    out = Path(args.out) if args.out else BENCH_DIR / f"results-{args.backend}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nresultado → {out}")
+
+    base_path = Path(args.baseline) if args.baseline else BENCH_DIR / f"baseline-{args.backend}.json"
+    regressions: List[str] = []
+    if base_path.exists() and not args.save_baseline:
+        regressions = compare(results, json.loads(base_path.read_text(encoding="utf-8")), args.tolerance)
+    elif args.baseline:
+        print(f"⚠️  baseline não encontrada: {base_path}")
+    if args.save_baseline:
+        base_path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"baseline → {base_path}")
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressão(ões) acima de {args.tolerance:g}%:")
+        for r in regressions:
+            print(f"   {r}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# Leitura em streaming das planilhas de cadastro (t_localizacao, t_condominio, t_cliente, t_medidor),
+# com validação/normalização vetorizada (pandas) por bloco antes de qualquer gravação.
+# Usado pelo seed_firestore.py (--mode bootstrap) e pelo load_from_excel.py.
+#   - openpyxl read-only: a planilha não é carregada inteira; linhas saem em blocos de CHUNK_ROWS
+#   - _id obrigatório e único por aba (opcional no load_from_excel, que usa id automático);
+#     CPF só dígitos (11, com dígitos verificadores); f_tem_valvula em booleano;
+#     f_geo_lat/f_geo_lon numéricos e dentro da faixa
+#   - chaves estrangeiras (ex.: t_cliente.f_condominio_id → t_condominio) conferidas contra os _id
+#     já lidos das abas anteriores do mesmo arquivo (a ordem das abas é CADASTRO_SHEETS)
+# Linhas inválidas ficam fora dos blocos e vão para um único relatório (ValidationReport).
+
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from hidro_core import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+CADASTRO_SHEETS = ["t_localizacao", "t_condominio", "t_cliente", "t_medidor"]
+CHUNK_ROWS = 5000
+
+TRUE_VALUES = ("true", "1", "sim", "yes", "y", "t")
+FALSE_VALUES = ("", "false", "0", "nao", "não", "no", "n", "f")
+
+# aba -> [(coluna, aba referenciada)]; vazio = sem referência
+FOREIGN_KEYS: Dict[str, List[Tuple[str, str]]] = {
+    "t_condominio": [("f_localizacao", "t_localizacao")],
+    "t_cliente": [("f_condominio_id", "t_condominio"), ("f_localizacao", "t_localizacao")],
+    "t_medidor": [("f_cliente_id", "t_cliente"), ("f_condominio_id", "t_condominio")],
+}
+
+# ---------- relatório de erros ----------
+@dataclass
+class ValidationError:
+    aba: str
+    linha: int      # linha no Excel (cabeçalho = 1)
+    _id: str
+    coluna: str
+    erro: str
+
+class ValidationReport:
+    """Erros de todas as abas num relatório só, + contagem de linhas válidas por aba."""
+
+    def __init__(self):
+        self.errors: List[ValidationError] = []
+        self.valid: Dict[str, int] = {}
+
+    def add(self, aba: str, df: pd.DataFrame, mask: pd.Series, coluna: str, erro: str) -> None:
+        for linha, _id in zip(df.loc[mask, "__linha"].tolist(), df.loc[mask, "_id"].tolist()):
+            self.errors.append(ValidationError(aba, int(linha), _id, coluna, erro))
+
+    def __len__(self) -> int:
+        return len(self.errors)
+
+    def summary(self) -> str:
+        por_aba: Dict[str, int] = {}
+        for e in self.errors:
+            por_aba[e.aba] = por_aba.get(e.aba, 0) + 1
+        partes = [f"{aba}: {n} válidas, {por_aba.get(aba, 0)} com erro" for aba, n in self.valid.items()]
+        return "; ".join(partes) if partes else "nenhuma linha lida"
+
+    def write_csv(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(["aba", "linha", "_id", "coluna", "erro"])
+            for e in sorted(self.errors, key=lambda e: (CADASTRO_SHEETS.index(e.aba) if e.aba in CADASTRO_SHEETS else 99, e.linha)):
+                w.writerow([e.aba, e.linha, e._id, e.coluna, e.erro])
+
+def default_report_path(xlsx: Path) -> Path:
+    return xlsx.with_name(f"{xlsx.stem}_erros.csv")
+
+# ---------- leitura em streaming ----------
+def open_workbook(path: Path):
+    """Workbook openpyxl read-only: abra uma vez e reaproveite entre abas/passadas (iter_cadastro_batches)."""
+    try:
+        import openpyxl
+    except ImportError as e:
+        raise RuntimeError("Leitura do Excel requer openpyxl: pip install openpyxl") from e
+    if not path.exists():
+        raise FileNotFoundError(f"Arquivo Excel não encontrado: {path}")
+    return openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+def _frame(header: List[str], rows: List[Tuple[Any, ...]], linhas: List[int]) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=header, dtype=object)
+    df = df.where(df.notna(), "").astype(str)
+    df["__linha"] = linhas
+    return df
+
+def _iter_ws_frames(ws, sheet: str, chunk_rows: int, require_id: bool = True) -> Iterator[pd.DataFrame]:
+    it = ws.iter_rows(values_only=True)
+    first = next(it, None)
+    header = [str(h).strip() if h is not None else "" for h in (first or ())]
+    if "_id" not in header and require_id:
+        raise ValueError(f"Planilha '{sheet}' precisa da coluna '_id'.")
+    keep = [i for i, h in enumerate(header) if h]
+    cols = [header[i] for i in keep]
+    width = len(header)
+    rows: List[Tuple[Any, ...]] = []
+    linhas: List[int] = []
+    for n, raw in enumerate(it, start=2):
+        if raw is None or all(v is None or (isinstance(v, str) and not v.strip()) for v in raw):
+            continue
+        raw = tuple(raw) + (None,) * (width - len(raw))
+        rows.append(tuple(raw[i] for i in keep))
+        linhas.append(n)
+        if len(rows) >= chunk_rows:
+            yield _frame(cols, rows, linhas)
+            rows, linhas = [], []
+    if rows:
+        yield _frame(cols, rows, linhas)
+
+def _iter_wb_frames(wb, sheet: str, chunk_rows: int, required: bool, require_id: bool) -> Iterator[pd.DataFrame]:
+    if sheet not in wb.sheetnames:
+        if required:
+            raise ValueError(f"Planilha '{sheet}' ausente no Excel.")
+        return
+    for df in _iter_ws_frames(wb[sheet], sheet, chunk_rows, require_id):
+        if "_id" not in df.columns:
+            df["_id"] = ""  # aba sem _id (id automático): o relatório de erros usa a coluna
+        yield df
+
+def iter_sheet_frames(path: Path, sheet: str, chunk_rows: int = CHUNK_ROWS, required: bool = True, require_id: bool = True) -> Iterator[pd.DataFrame]:
+    """Blocos crus (tudo str, vazio = "") de uma aba, com a coluna __linha (linha no Excel)."""
+    wb = open_workbook(path)
+    try:
+        yield from _iter_wb_frames(wb, sheet, chunk_rows, required, require_id)
+    finally:
+        wb.close()
+
+# ---------- normalização / validação vetorizada ----------
+def _cpf_valid(cpf: pd.Series) -> pd.Series:
+    """True para CPFs de 11 dígitos com dígitos verificadores corretos (e não todos iguais)."""
+    ok = cpf.str.len() == 11
+    out = pd.Series(False, index=cpf.index)
+    if not ok.any():
+        return out
+    d = (np.frombuffer("".join(cpf[ok].tolist()).encode("ascii"), dtype=np.uint8).reshape(-1, 11) - 48).astype(np.int64)
+    dv1 = (d[:, :9] @ np.arange(10, 1, -1)) * 10 % 11 % 10
+    dv2 = (d[:, :10] @ np.arange(11, 1, -1)) * 10 % 11 % 10
+    good = (dv1 == d[:, 9]) & (dv2 == d[:, 10]) & (d != d[:, :1]).any(axis=1)
+    out[ok] = good
+    return out
+
+def _in_set(s: pd.Series, ids: Set[str]) -> pd.Series:
+    # Series.isin(set) converte o set inteiro a cada chamada; com sets de centenas de milhares de _id
+    # (crescendo bloco a bloco) isso vira quadrático. Consulta direta ao set é O(linhas do bloco).
+    return pd.Series(np.fromiter((x in ids for x in s.tolist()), dtype=bool, count=len(s)), index=s.index)
+
+def normalize_frame(
+    sheet: str,
+    df: pd.DataFrame,
+    report: ValidationReport,
+    seen_ids: Set[str],
+    known_ids: Optional[Dict[str, Set[str]]] = None,
+    require_id: bool = True,
+) -> pd.DataFrame:
+    """
+    Normaliza um bloco de uma aba e devolve só as linhas válidas (erros vão para o report).
+    seen_ids: _id já vistos nesta aba (duplicados entre blocos); known_ids: _id válidos das abas já lidas (FKs).
+    require_id=False: _id vazio é aceito (id automático); os preenchidos continuam únicos.
+    """
+    obj = [c for c in df.columns if c != "__linha"]
+    df[obj] = df[obj].apply(lambda s: s.str.strip())
+    bad = pd.Series(False, index=df.index)
+
+    def flag(mask: pd.Series, coluna: str, erro: str) -> None:
+        nonlocal bad
+        mask = mask & ~bad  # um erro por linha basta
+        if mask.any():
+            report.add(sheet, df, mask, coluna, erro)
+            bad = bad | mask
+
+    if require_id:
+        flag(df["_id"] == "", "_id", "_id obrigatório")
+    dup = df["_id"].duplicated() | _in_set(df["_id"], seen_ids)
+    flag(dup & (df["_id"] != ""), "_id", "_id duplicado")
+
+    if sheet == "t_localizacao":
+        for col, lim in (("f_geo_lat", 90.0), ("f_geo_lon", 180.0)):
+            if col not in df.columns:
+                df[col] = ""
+            raw = df[col]
+            num = pd.to_numeric(raw.where(raw != ""), errors="coerce")
+            flag((raw != "") & num.isna(), col, "não numérico")
+            flag(num.abs() > lim, col, f"fora da faixa (±{lim:g})")
+            df[col] = num.astype(object).where(num.notna(), "")
+        flag((df["f_geo_lat"] == "") != (df["f_geo_lon"] == ""), "f_geo_lat", "informe f_geo_lat e f_geo_lon juntos")
+
+    if sheet == "t_cliente" and "f_cpf" in df.columns:
+        cpf = df["f_cpf"].str.replace(r"\.0$", "", regex=True).str.replace(r"\D", "", regex=True)
+        cpf = cpf.where(cpf == "", cpf.str.zfill(11))  # célula numérica perde zeros à esquerda
+        flag((cpf != "") & ~_cpf_valid(cpf), "f_cpf", "CPF inválido")
+        df["f_cpf"] = cpf
+
+    if sheet == "t_medidor" and "f_tem_valvula" in df.columns:
+        low = df["f_tem_valvula"].str.lower()
+        flag(~low.isin(TRUE_VALUES) & ~low.isin(FALSE_VALUES), "f_tem_valvula", "booleano não reconhecido")
+        df["f_tem_valvula"] = low.isin(TRUE_VALUES)
+
+    if known_ids:
+        for col, ref in FOREIGN_KEYS.get(sheet, []):
+            if col in df.columns and ref in known_ids:
+                flag((df[col] != "") & ~_in_set(df[col], known_ids[ref]), col, f"referência inexistente em {ref}")
+
+    seen_ids.update(df.loc[df["_id"] != "", "_id"].tolist())
+    ok = df.loc[~bad]
+    report.valid[sheet] = report.valid.get(sheet, 0) + len(ok)
+    return ok
+
+def iter_cadastro_batches(
+    path: Path,
+    report: ValidationReport,
+    sheets: Iterable[str] = CADASTRO_SHEETS,
+    chunk_rows: int = CHUNK_ROWS,
+    required: bool = True,
+    check_fk: bool = True,
+    require_id: bool = True,
+    workbook: Any = None,
+) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    (aba, linhas normalizadas prontas para gravar), bloco a bloco, na ordem das abas.
+    Guarda em memória só os _id de cada aba (para duplicados e FKs), não as linhas.
+    O arquivo é aberto uma vez para todas as abas; `workbook` (open_workbook) reaproveita
+    um já aberto entre passadas (ex.: validação --strict + carga) e fica aberto no fim.
+    Aba com linhas sem _id (require_id=False) não entra na conferência de FKs.
+    """
+    wb = workbook if workbook is not None else open_workbook(path)
+    try:
+        known: Dict[str, Set[str]] = {}
+        for sheet in sheets:
+            seen: Set[str] = set()
+            valid: Set[str] = set()
+            sem_id = False
+            for df in _iter_wb_frames(wb, sheet, chunk_rows, required, require_id):
+                ok = normalize_frame(sheet, df, report, seen, known if check_fk else None, require_id)
+                ids = ok["_id"].tolist()
+                sem_id = sem_id or "" in ids
+                valid.update(ids)
+                if len(ok):
+                    yield sheet, ok.drop(columns="__linha").to_dict("records")
+            if not sem_id:
+                known[sheet] = valid
+    finally:
+        if workbook is None:
+            wb.close()
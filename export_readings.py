@@ -5,38 +5,36 @@
 # --start e --end (opcional) para filtrar por período (UTC)
 # --medidor (opcional, pode repetir) para filtrar um ou mais medidores
 # Escreve em streaming (sem carregar tudo em memória)
+# Lê em páginas (--page-size) com cursor start_after e grava checkpoint (<saída>.ckpt.json) a cada página;
+# --resume continua um export interrompido exatamente de onde parou
 # Cabeçalho CSV consistente e gerado na primeira linha válida
 
+# com --medidor, lê direto os buckets t_medidor/{id}/t_leituras/{AAAA_MM}/items do período
+# (sem índice composto, buckets em paralelo com --workers); --collection-group força o caminho abaixo.
+# Só com --start/--end (sem --medidor) fica no collection group: listar t_medidor inteiro e consultar
+# medidores × meses custaria mais, e leituras de medidor ausente de t_medidor sumiriam do export.
 # order_by("f_medidor_id").order_by("f_ts_utc") quando você não filtra por medidor;
 # quando filtra um ou vários medidores, ele faz 1 query por medidor, cada uma com order_by("f_ts_utc"), e emite já na ordem correta;
 # parâmetro opcional --delimiter (padrão ,; para Excel PT-BR use --delimiter ";").
+# Leituras no layout compacto (t_leituras/{AAAA_MM}/dias/{DD}, ver packed_days.py) saem junto, desempacotadas
+# com os mesmos campos dos items e intercaladas na mesma ordem; o --summary soma os totais de cada dia.
 # Observação: ao usar order_by em collection group é comum o Firestore pedir um índice composto. Se aparecer o aviso no terminal/console com um link “Create index…”, clique e crie (demora só 1–2 min). Depois a consulta roda ordenada.
 
 from __future__ import annotations
 
-import os, json, csv, argparse
+import sys, json, csv, time, heapq, queue, bisect, argparse, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Iterable, Optional, Dict, Any
-
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-# ---------- Credenciais ----------
-def init_db() -> firestore.Client:
-    load_dotenv()
-    cred_env = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "").strip()
-    if not cred_env:
-        raise RuntimeError("Defina GOOGLE_APPLICATION_CREDENTIALS no .env")
-    cred_path = Path(cred_env)
-    if not cred_path.is_absolute():
-        cred_path = (Path(__file__).resolve().parent / cred_env).resolve()
-    if not cred_path.exists():
-        raise FileNotFoundError(f"Credencial não encontrada: {cred_path}")
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(credentials.Certificate(str(cred_path)))
-    return firestore.client()
+from typing import Iterable, Iterator, Optional, Dict, Any
+
+from hidro_core import get_db, lazy_import
+from packed_days import DAYS_COL, bucket_day_totals, day_fields, day_start, unpack_day
+
+firestore = lazy_import("google.cloud.firestore")
+gexc = lazy_import("google.api_core.exceptions")
 
 # ---------- Util ----------
 def parse_dt(s: Optional[str]) -> Optional[datetime]:
@@ -50,18 +48,118 @@ def parse_dt(s: Optional[str]) -> Optional[datetime]:
 def ensure_dir(p: Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
 
+# ---------- Paginação / retomada ----------
+PAGE_SIZE = 1000          # docs por página (cada página é uma RPC curta, com cursor start_after)
+PAGE_RETRIES = 3          # tentativas por página em erro transitório (deadline/rede)
+
+# ponto de retomada: (f_medidor_id, f_ts_utc, _doc_id) da última linha gravada
+ResumeKey = tuple
+
+def _stream_paged(q, page_size: int = PAGE_SIZE) -> Iterator[Any]:
+    """
+    Substitui um q.stream() longo por páginas de `page_size` com start_after(último snapshot).
+    Erro transitório no meio de uma página é repetido a partir do último doc já entregue.
+    """
+    last = None
+    while True:
+        page_q = q.limit(page_size)
+        if last is not None:
+            page_q = page_q.start_after(last)
+        n = 0
+        for attempt in range(1, PAGE_RETRIES + 1):
+            try:
+                for snap in page_q.stream():
+                    n += 1
+                    last = snap
+                    yield snap
+                break
+            except (gexc.DeadlineExceeded, gexc.ServiceUnavailable, gexc.InternalServerError) as e:
+                if attempt == PAGE_RETRIES:
+                    raise
+                print(f"  aviso: {type(e).__name__} na paginação, tentando de novo ({attempt}/{PAGE_RETRIES - 1})…")
+                time.sleep(2 ** attempt)
+                if last is not None:
+                    page_q = q.limit(page_size - n).start_after(last)
+        if n < page_size:
+            return
+
+# campos sempre lidos numa projeção: ordenação, merge e checkpoint dependem deles
+KEY_FIELDS = ["f_medidor_id", "f_ts_utc"]
+
+def _project(q, fields: Optional[list[str]]):
+    """Aplica select() (projeção no servidor) com os campos pedidos + KEY_FIELDS."""
+    if not fields:
+        return q
+    proj = KEY_FIELDS + [f for f in fields if f not in KEY_FIELDS and f != "_doc_id"]
+    return q.select(proj)
+
+def _snap_row(snap) -> Dict[str, Any]:
+    d = snap.to_dict() or {}
+    d["_doc_id"] = snap.id
+    return d
+
+def _row_key(d: Dict[str, Any]) -> tuple:
+    ts = d.get("f_ts_utc")
+    return (d.get("f_medidor_id") or "", ts.timestamp() if isinstance(ts, datetime) else 0.0, d.get("_doc_id") or "")
+
+def _skip_resumed(rows: Iterable[Dict[str, Any]], resume: Optional[ResumeKey]) -> Iterator[Dict[str, Any]]:
+    """
+    Descarta linhas até passar do ponto de retomada. O cursor start_at do servidor já pula quase
+    tudo; aqui só caem os empates no mesmo (medidor, timestamp) — que o Firestore ordena por nome do doc.
+    """
+    if resume is None:
+        yield from rows
+        return
+    rkey = (resume[0], resume[1].timestamp(), resume[2])
+    it = iter(rows)
+    for r in it:
+        if _row_key(r) > rkey:
+            yield r
+            break
+    yield from it
+
+# ---------- Layout dias (1 doc por medidor-dia, ver packed_days.py) ----------
+def _days_page_size(page_size: int) -> int:
+    """Docs-dia por página: cada um traz um dia inteiro de leituras."""
+    return max(10, page_size // 50)
+
+def _project_days(q, fields: Optional[list[str]]):
+    proj = day_fields(fields)
+    return q.select(proj) if proj else q
+
+def _day_range(q, start_dt: Optional[datetime], end_dt: Optional[datetime]):
+    if start_dt:
+        q = q.where("f_dia", ">=", day_start(start_dt))
+    if end_dt:
+        q = q.where("f_dia", "<=", end_dt)
+    return q
+
+def _day_rows(snaps: Iterable[Any], start_dt: Optional[datetime], end_dt: Optional[datetime], fields: Optional[list[str]]) -> Iterator[Dict[str, Any]]:
+    for snap in snaps:
+        yield from unpack_day(snap.to_dict() or {}, start_dt, end_dt, fields)
+
+def _merge_layouts(items: Iterable[Dict[str, Any]], days: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Intercala as linhas de items e de docs-dia, ambas já em ordem de (f_medidor_id, f_ts_utc)."""
+    return heapq.merge(items, days, key=_row_key)
+
 # ---------- Iteradores ordenados ----------
 def iter_items_all_sorted(
     db: firestore.Client,
     start_dt: Optional[datetime],
     end_dt: Optional[datetime],
+    resume: Optional[ResumeKey] = None,
+    page_size: int = PAGE_SIZE,
+    fields: Optional[list[str]] = None,
 ) -> Iterable[Dict[str, Any]]:
     """
     Sem filtro de medidor:
     Ordena por f_medidor_id (1ª chave) e f_ts_utc (2ª).
     Pode exigir índice composto no Firestore.
+    `resume` continua logo após a linha (f_medidor_id, f_ts_utc, _doc_id) informada.
+    `fields` restringe os campos lidos (select no servidor).
+    Os docs-dia (collection group "dias") vêm numa 2ª query na mesma ordem, intercalada.
     """
-    q = db.collection_group("items")
+    q = _project(db.collection_group("items"), fields)
     if start_dt:
         q = q.where("f_ts_utc", ">=", start_dt)
     if end_dt:
@@ -69,33 +167,334 @@ def iter_items_all_sorted(
 
     # Ordenação principal e secundária
     q = q.order_by("f_medidor_id").order_by("f_ts_utc")
+    dq = _day_range(_project_days(db.collection_group(DAYS_COL), fields), start_dt, end_dt).order_by("f_medidor_id").order_by("f_dia")
+    if resume:
+        q = q.start_at({"f_medidor_id": resume[0], "f_ts_utc": resume[1]})
+        dq = dq.start_at({"f_medidor_id": resume[0], "f_dia": day_start(resume[1])})
+
+    items = (_snap_row(s) for s in _stream_paged(q, page_size))
+    days = _day_rows(_stream_paged(dq, _days_page_size(page_size)), start_dt, end_dt, fields)
+    yield from _skip_resumed(_merge_layouts(items, days), resume)
+
+class ResumeError(ValueError):
+    """Checkpoint que não tem como ser posicionado na lista de medidores do export."""
 
-    for snap in q.stream():
-        d = snap.to_dict() or {}
-        d["_doc_id"] = snap.id
-        yield d
+def _resume_position(medidores: list[str], resume: ResumeKey, by_id: bool) -> int:
+    """
+    Posição, na lista de emissão, do medidor do checkpoint. Sumiu da lista (ex.: removido de
+    t_medidor)? Em ordem de id retoma no próximo id; na ordem de --medidor não há como saber
+    o que já saiu, então falha em vez de reexportar tudo por cima do arquivo.
+    """
+    if resume[0] in medidores:
+        return medidores.index(resume[0])
+    if by_id:
+        return bisect.bisect_left(medidores, resume[0])
+    raise ResumeError(f"checkpoint aponta para o medidor {resume[0]}, que não está na lista de medidores do export; rode sem --resume")
 
 def iter_items_by_medidor_sorted(
     db: firestore.Client,
     start_dt: Optional[datetime],
     end_dt: Optional[datetime],
     medidores: list[str],
+    resume: Optional[ResumeKey] = None,
+    page_size: int = PAGE_SIZE,
+    fields: Optional[list[str]] = None,
 ) -> Iterable[Dict[str, Any]]:
     """
     Com filtro de medidores: emite blocos já ordenados por f_ts_utc dentro de cada medidor.
     Mantém a ordem dos medidores conforme a lista recebida.
+    Com `resume`, pula os medidores anteriores ao da retomada (na ordem da lista).
     """
+    if resume:
+        medidores = medidores[_resume_position(medidores, resume, False):]
     for mid in medidores:
-        q = db.collection_group("items").where("f_medidor_id", "==", mid)
+        q = _project(db.collection_group("items"), fields).where("f_medidor_id", "==", mid)
         if start_dt:
             q = q.where("f_ts_utc", ">=", start_dt)
         if end_dt:
             q = q.where("f_ts_utc", "<=", end_dt)
         q = q.order_by("f_ts_utc")
-        for snap in q.stream():
-            d = snap.to_dict() or {}
-            d["_doc_id"] = snap.id
-            yield d
+        dq = _day_range(_project_days(db.collection_group(DAYS_COL), fields).where("f_medidor_id", "==", mid), start_dt, end_dt).order_by("f_dia")
+        resumed = bool(resume) and resume[0] == mid
+        if resumed:
+            q = q.start_at({"f_ts_utc": resume[1]})
+            dq = dq.start_at({"f_dia": day_start(resume[1])})
+        rows = _merge_layouts((_snap_row(s) for s in _stream_paged(q, page_size)),
+                              _day_rows(_stream_paged(dq, _days_page_size(page_size)), start_dt, end_dt, fields))
+        yield from (_skip_resumed(rows, resume) if resumed else rows)
+
+# ---------- Export paralelo (partições por faixa de f_medidor_id + k-way merge) ----------
+_PREFETCH_END = object()
+
+def _prefetch(rows: Iterable[Dict[str, Any]], maxsize: int = 5000) -> Iterator[Dict[str, Any]]:
+    """Consome `rows` numa thread de fundo (fila limitada) para buscar partições em paralelo."""
+    q: "queue.Queue" = queue.Queue(maxsize=maxsize)
+
+    def pump():
+        try:
+            for r in rows:
+                q.put(r)
+        except BaseException as e:  # repassa o erro para quem consome
+            q.put(e)
+        finally:
+            q.put(_PREFETCH_END)
+
+    threading.Thread(target=pump, daemon=True).start()
+    while True:
+        item = q.get()
+        if item is _PREFETCH_END:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+def medidor_partition_bounds(db: firestore.Client, partitions: int) -> list[str]:
+    """
+    Fronteiras (f_medidor_id) que dividem os medidores de t_medidor em `partitions` faixas
+    contíguas de tamanho parecido. Lê só as chaves dos docs (select vazio).
+    """
+    ids = sorted(s.id for s in db.collection("t_medidor").select([]).stream())
+    if partitions <= 1 or len(ids) < 2:
+        return []
+    partitions = min(partitions, len(ids))
+    step = len(ids) / partitions
+    return sorted({ids[int(round(i * step))] for i in range(1, partitions)})
+
+def iter_items_all_sorted_parallel(
+    db: firestore.Client,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    partitions: int = 8,
+    resume: Optional[ResumeKey] = None,
+    page_size: int = PAGE_SIZE,
+    fields: Optional[list[str]] = None,
+) -> Iterable[Dict[str, Any]]:
+    """
+    Igual ao iter_items_all_sorted, mas divide o scan em N faixas de f_medidor_id
+    buscadas em paralelo; o k-way merge (heapq.merge) mantém a ordem global
+    (f_medidor_id, f_ts_utc). A 1ª e a última faixa são abertas, então leituras
+    de medidores fora de t_medidor também saem.
+    """
+    bounds = medidor_partition_bounds(db, partitions)
+    edges = [None] + bounds + [None]
+
+    def part(lo: Optional[str], hi: Optional[str]) -> Iterable[Dict[str, Any]]:
+        q = _project(db.collection_group("items"), fields)
+        dq = _day_range(_project_days(db.collection_group(DAYS_COL), fields), start_dt, end_dt)
+        if lo is not None:
+            q = q.where("f_medidor_id", ">=", lo)
+            dq = dq.where("f_medidor_id", ">=", lo)
+        if hi is not None:
+            q = q.where("f_medidor_id", "<", hi)
+            dq = dq.where("f_medidor_id", "<", hi)
+        if start_dt:
+            q = q.where("f_ts_utc", ">=", start_dt)
+        if end_dt:
+            q = q.where("f_ts_utc", "<=", end_dt)
+        q = q.order_by("f_medidor_id").order_by("f_ts_utc")
+        dq = dq.order_by("f_medidor_id").order_by("f_dia")
+        if resume and (lo is None or lo <= resume[0]):
+            q = q.start_at({"f_medidor_id": resume[0], "f_ts_utc": resume[1]})
+            dq = dq.start_at({"f_medidor_id": resume[0], "f_dia": day_start(resume[1])})
+        yield from _merge_layouts((_snap_row(s) for s in _stream_paged(q, page_size)),
+                                  _day_rows(_stream_paged(dq, _days_page_size(page_size)), start_dt, end_dt, fields))
+
+    ranges = list(zip(edges[:-1], edges[1:]))
+    if resume:  # faixas inteiras antes do ponto de retomada já foram exportadas
+        ranges = [(lo, hi) for lo, hi in ranges if hi is None or hi > resume[0]]
+    streams = [_prefetch(part(lo, hi)) for lo, hi in ranges]
+    yield from _skip_resumed(heapq.merge(*streams, key=_row_key), resume)
+
+# ---------- Export podado por bucket mensal (sem collection group) ----------
+def month_bucket(ts: datetime) -> str:
+    return f"{ts.year:04d}_{ts.month:02d}"
+
+def month_buckets(start_dt: datetime, end_dt: datetime) -> list[str]:
+    """Buckets AAAA_MM que cobrem [start_dt, end_dt] (mesma regra do seed_firestore.month_bucket)."""
+    y, m = start_dt.year, start_dt.month
+    out = []
+    while (y, m) <= (end_dt.year, end_dt.month):
+        out.append(f"{y:04d}_{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+def list_buckets(db: firestore.Client, mid: str) -> list[str]:
+    """Buckets existentes de um medidor (só chaves de t_medidor/{id}/t_leituras)."""
+    coll = db.collection("t_medidor").document(mid).collection("t_leituras")
+    return sorted(s.id for s in coll.select([]).stream())
+
+def _ordered_prefetch(tasks: list, fetch, workers: int) -> Iterator[Dict[str, Any]]:
+    """Executa fetch(task) em paralelo (no máx. 2×workers adiantados) e emite na ordem das tasks."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        it = iter(tasks)
+        pending = deque(ex.submit(fetch, t) for t in islice(it, max(1, workers) * 2))
+        while pending:
+            rows = pending.popleft().result()
+            nxt = next(it, None)
+            if nxt is not None:
+                pending.append(ex.submit(fetch, nxt))
+            yield from rows
+
+def _start_for(start_dt: Optional[datetime], starts: Optional[Dict[str, datetime]], mid: str) -> Optional[datetime]:
+    """Início do período de um medidor: o mais tarde entre start_dt e starts[mid]."""
+    s = (starts or {}).get(mid)
+    if s is None or (start_dt and start_dt > s):
+        return start_dt
+    return s
+
+def bucket_tasks(
+    db: firestore.Client,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    medidores: Optional[list[str]] = None,
+    workers: int = 8,
+    starts: Optional[Dict[str, datetime]] = None,
+) -> tuple[list[str], list[tuple[int, str, str]]]:
+    """
+    Lista (posição, f_medidor_id, bucket) de cada bucket mensal do período, na ordem de emissão.
+    Sem `medidores`, usa todos os de t_medidor em ordem de id. `starts` adia o início por medidor.
+    Com start e end os buckets são calculados; senão, listados (em paralelo) por medidor.
+    """
+    if medidores is None:
+        medidores = sorted(s.id for s in db.collection("t_medidor").select([]).stream())
+
+    def buckets_of(mid: str) -> list[str]:
+        start = _start_for(start_dt, starts, mid)
+        if start and end_dt:
+            return month_buckets(start, end_dt)
+        lo = month_bucket(start) if start else ""
+        hi = month_bucket(end_dt) if end_dt else "9999_99"
+        return [b for b in list_buckets(db, mid) if lo <= b <= hi]
+
+    listed = not end_dt or any(_start_for(start_dt, starts, mid) is None for mid in medidores)
+    if listed and len(medidores) > 1:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+            per_med = list(ex.map(buckets_of, medidores))
+    else:
+        per_med = [buckets_of(mid) for mid in medidores]
+    return medidores, [(i, mid, b) for i, (mid, bs) in enumerate(zip(medidores, per_med)) for b in bs]
+
+def _bucket_items(db: firestore.Client, mid: str, bucket: str, start_dt: Optional[datetime], end_dt: Optional[datetime]):
+    q = db.collection("t_medidor").document(mid).collection("t_leituras").document(bucket).collection("items")
+    if start_dt:
+        q = q.where("f_ts_utc", ">=", start_dt)
+    if end_dt:
+        q = q.where("f_ts_utc", "<=", end_dt)
+    return q
+
+def _bucket_days(db: firestore.Client, mid: str, bucket: str, start_dt: Optional[datetime], end_dt: Optional[datetime]):
+    q = db.collection("t_medidor").document(mid).collection("t_leituras").document(bucket).collection(DAYS_COL)
+    return _day_range(q, start_dt, end_dt)
+
+def iter_items_bucketed(
+    db: firestore.Client,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    medidores: Optional[list[str]] = None,
+    resume: Optional[ResumeKey] = None,
+    page_size: int = PAGE_SIZE,
+    fields: Optional[list[str]] = None,
+    workers: int = 8,
+    starts: Optional[Dict[str, datetime]] = None,
+) -> Iterable[Dict[str, Any]]:
+    """
+    Lê direto de t_medidor/{id}/t_leituras/{AAAA_MM}/items (e /dias) só nos buckets do período
+    (sem collection group => sem índice composto e sem varrer os outros meses).
+    Buckets e medidores como em bucket_tasks (leituras de medidores ausentes de
+    t_medidor não saem neste modo); `starts` dá um início próprio (≥ start_dt) a cada medidor.
+    Buckets são buscados em paralelo e emitidos em ordem (medidor, f_ts_utc).
+    """
+    by_id = medidores is None  # lista de t_medidor em ordem de id
+    medidores, tasks = bucket_tasks(db, start_dt, end_dt, medidores, workers, starts)
+    rpos = None  # (posição do medidor, bucket) do ponto de retomada
+    if resume:
+        i = _resume_position(medidores, resume, by_id)
+        rpos = (i, month_bucket(resume[1]) if i < len(medidores) and medidores[i] == resume[0] else "")
+    if rpos:
+        tasks = [t for t in tasks if (t[0], t[2]) >= rpos]
+
+    def fetch(task) -> list[Dict[str, Any]]:
+        i, mid, b = task
+        start = _start_for(start_dt, starts, mid)
+        q = _project(_bucket_items(db, mid, b, start, end_dt), fields).order_by("f_ts_utc")
+        dq = _project_days(_bucket_days(db, mid, b, start, end_dt), fields).order_by("f_dia")
+        resumed = rpos == (i, b)
+        if resumed:
+            q = q.start_at({"f_ts_utc": resume[1]})
+            dq = dq.start_at({"f_dia": day_start(resume[1])})
+        rows = _merge_layouts((_snap_row(s) for s in _stream_paged(q, page_size)),
+                              _day_rows(_stream_paged(dq, _days_page_size(page_size)), start, end_dt, fields))
+        return list(_skip_resumed(rows, resume) if resumed else rows)
+
+    yield from _ordered_prefetch(tasks, fetch, workers)
+
+# ---------- Resumo por agregação no servidor ----------
+SUMMARY_FIELDS = ["f_medidor_id", "f_ano_mes_ref", "f_qtd_leituras", "f_total_m3", "f_media_m3", "f_total_pulsos", "f_media_pulsos"]
+
+def bucket_summary(db: firestore.Client, mid: str, bucket: str, start_dt: Optional[datetime], end_dt: Optional[datetime]) -> Dict[str, Any]:
+    """
+    count/sum de f_valor_m3 e f_pulsos de um bucket: items numa única aggregation query
+    (cobrada ~1 leitura por 1000 entradas de índice, sem trafegar os documentos) + os totais
+    dos docs-dia (packed_days.bucket_day_totals). Médias = total / qtd.
+    """
+    aq = (_bucket_items(db, mid, bucket, start_dt, end_dt)
+          .count(alias="n")
+          .sum("f_valor_m3", alias="m3")
+          .sum("f_pulsos", alias="pulsos"))
+    v = {r.alias: r.value for row in aq.get() for r in row}
+    dn, dm3, dpul = bucket_day_totals(db, mid, bucket, start_dt, end_dt)
+    n = int(v.get("n") or 0) + dn
+    m3 = float(v.get("m3") or 0.0) + dm3
+    pulsos = int(v.get("pulsos") or 0) + dpul
+    return {
+        "f_medidor_id": mid,
+        "f_ano_mes_ref": bucket.replace("_", "-"),
+        "f_qtd_leituras": n,
+        "f_total_m3": m3,
+        "f_media_m3": m3 / n if n else None,
+        "f_total_pulsos": pulsos,
+        "f_media_pulsos": pulsos / n if n else None,
+    }
+
+def iter_summary(
+    db: firestore.Client,
+    start_dt: Optional[datetime],
+    end_dt: Optional[datetime],
+    medidores: Optional[list[str]] = None,
+    workers: int = 8,
+) -> Iterable[Dict[str, Any]]:
+    """
+    Uma linha por (medidor, mês) com os agregados do servidor, em paralelo entre buckets,
+    seguida de uma linha de total do medidor (f_ano_mes_ref = "total") somando os meses.
+    """
+    _, tasks = bucket_tasks(db, start_dt, end_dt, medidores, workers)
+
+    def fetch(task):
+        _, mid, b = task
+        return [bucket_summary(db, mid, b, start_dt, end_dt)]
+
+    cur = None
+    tot: Dict[str, Any] = {}
+
+    def total_row():
+        n = tot["f_qtd_leituras"]
+        return {**tot, "f_ano_mes_ref": "total",
+                "f_media_m3": tot["f_total_m3"] / n if n else None,
+                "f_media_pulsos": tot["f_total_pulsos"] / n if n else None}
+
+    for r in _ordered_prefetch(tasks, fetch, workers):
+        if r["f_qtd_leituras"] == 0:
+            continue
+        if r["f_medidor_id"] != cur:
+            if cur is not None:
+                yield total_row()
+            cur = r["f_medidor_id"]
+            tot = {"f_medidor_id": cur, "f_qtd_leituras": 0, "f_total_m3": 0.0, "f_total_pulsos": 0}
+        for k in ("f_qtd_leituras", "f_total_m3", "f_total_pulsos"):
+            tot[k] += r[k]
+        yield r
+    if cur is not None:
+        yield total_row()
 
 # ---------- Exporters ----------
 BASE_FIELDS = [
@@ -103,97 +502,358 @@ BASE_FIELDS = [
     "f_pulsos","f_status_sensor","f_flag_vazamento","f_ingested_at","f_archived_at","_doc_id"
 ]
 
+class JsonlSink:
+    def __init__(self, path: Path, offset: Optional[int] = None, columns: Optional[list[str]] = None):
+        self.path = path
+        self.columns = columns
+        self.f = _open_at(path, offset)
+
+    def write(self, r: Dict[str, Any]) -> None:
+        if self.columns:
+            r = {k: r.get(k) for k in self.columns}
+        self.f.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
+
+    def flush(self) -> int:
+        self.f.flush()
+        return self.f.tell()
+
+    def close(self) -> None:
+        self.f.close()
+
+class CsvSink:
+    """
+    CSV com cabeçalho: colunas fixas (--fields / checkpoint ao retomar) ou geradas na primeira linha.
+    O cabeçalho só é escrito em arquivo novo (offset None).
+    """
+
+    def __init__(self, path: Path, delimiter: str = ",", offset: Optional[int] = None, fieldnames: Optional[list[str]] = None):
+        self.path = path
+        self.delimiter = delimiter
+        self.f = _open_at(path, offset)
+        self.fieldnames = fieldnames
+        self.writer = None
+        self._header_pending = offset is None
+
+    def write(self, r: Dict[str, Any]) -> None:
+        if self.writer is None:
+            if self.fieldnames is None:
+                self.fieldnames = BASE_FIELDS + [k for k in r.keys() if k not in BASE_FIELDS]
+            self.writer = csv.DictWriter(self.f, fieldnames=self.fieldnames, delimiter=self.delimiter, extrasaction="ignore")
+            if self._header_pending:
+                self.writer.writeheader()
+                self._header_pending = False
+        self.writer.writerow({k: (r.get(k) if not isinstance(r.get(k), datetime) else r.get(k).isoformat()) for k in self.fieldnames})
+
+    def flush(self) -> int:
+        self.f.flush()
+        return self.f.tell()
+
+    def close(self) -> None:
+        self.f.close()
+
+PARQUET_BATCH_ROWS = 50_000
+
+def parquet_schema(fields: list[str]):
+    """Schema Arrow tipado para as colunas de BASE_FIELDS (timestamps em UTC, µs); as demais são texto."""
+    from readings_io import require_pyarrow
+    pa, _ = require_pyarrow()
+    ts = pa.timestamp("us", tz="UTC")
+    types = {
+        "f_medidor_id": pa.string(), "f_cliente_id": pa.string(), "f_ts_utc": ts,
+        "f_ano_mes_ref": pa.string(), "f_valor_m3": pa.float64(), "f_pulsos": pa.int32(),
+        "f_status_sensor": pa.int32(), "f_flag_vazamento": pa.bool_(),
+        "f_ingested_at": ts, "f_archived_at": ts, "_doc_id": pa.string(),
+    }
+    return pa.schema([(f, types.get(f, pa.string())) for f in fields])
+
+class ParquetSink:
+    """
+    Parquet particionado (estilo Hive) por f_ano_mes_ref e, opcionalmente, por f_medidor_id:
+      <dir>/f_ano_mes_ref=2025-09/[f_medidor_id=MTR-0001/]part-00000.parquet
+    As linhas entram num buffer colunar por partição e viram record batches de até
+    PARQUET_BATCH_ROWS linhas. Como a fonte vem ordenada por medidor, com partição por
+    medidor os arquivos do medidor anterior são fechados assim que ele muda.
+    Campos fora de BASE_FIELDS (ou de --fields) não entram (schema fixo); colunas de --fields fora de
+    BASE_FIELDS são gravadas como texto (str(), datas em ISO 8601).
+    """
+
+    def __init__(self, root: Path, by_medidor: bool = False, compression: str = "zstd", batch_rows: int = PARQUET_BATCH_ROWS, columns: Optional[list[str]] = None):
+        from readings_io import require_pyarrow
+        self.pa, self.pq = require_pyarrow()
+        self.path = root
+        self.by_medidor = by_medidor
+        self.compression = compression
+        self.batch_rows = batch_rows
+        self.fieldnames = columns or BASE_FIELDS
+        self.schema = parquet_schema(self.fieldnames)
+        self._as_text = [f for f in self.fieldnames if f not in BASE_FIELDS]
+        self.files = 0
+        self._buf: Dict[tuple, Dict[str, list]] = {}
+        self._writers: Dict[tuple, Any] = {}
+        self._cur_medidor = None
+        ensure_dir(root)
+        for old in root.glob("f_ano_mes_ref=*/**/part-*.parquet"):
+            old.unlink()  # export anterior no mesmo diretório
+
+    def _part_key(self, r: Dict[str, Any]) -> tuple:
+        mes = r.get("f_ano_mes_ref")
+        if not mes and isinstance(r.get("f_ts_utc"), datetime):
+            mes = r["f_ts_utc"].strftime("%Y-%m")
+        return (mes or "sem_mes", r.get("f_medidor_id") or "sem_medidor") if self.by_medidor else (mes or "sem_mes",)
+
+    def write(self, r: Dict[str, Any]) -> None:
+        if self.by_medidor and r.get("f_medidor_id") != self._cur_medidor:
+            self._close_all()
+            self._cur_medidor = r.get("f_medidor_id")
+        key = self._part_key(r)
+        buf = self._buf.get(key)
+        if buf is None:
+            buf = self._buf[key] = {f: [] for f in self.fieldnames}
+        for f in self.fieldnames:
+            buf[f].append(r.get(f))
+        for f in self._as_text:
+            v = buf[f][-1]
+            if v is not None and not isinstance(v, str):
+                buf[f][-1] = v.isoformat() if isinstance(v, datetime) else str(v)
+        if len(buf[self.fieldnames[0]]) >= self.batch_rows:
+            self._write_batch(key)
+
+    def _write_batch(self, key: tuple) -> None:
+        buf = self._buf.pop(key, None)
+        if not buf or not buf[self.fieldnames[0]]:
+            return
+        batch = self.pa.record_batch([self.pa.array(buf[f], type=self.schema.field(f).type) for f in self.fieldnames], schema=self.schema)
+        w = self._writers.get(key)
+        if w is None:
+            d = self.path / f"f_ano_mes_ref={key[0]}"
+            if self.by_medidor:
+                d = d / f"f_medidor_id={key[1]}"
+            ensure_dir(d)
+            w = self._writers[key] = self.pq.ParquetWriter(str(d / f"part-{self.files:05d}.parquet"), self.schema, compression=self.compression)
+            self.files += 1
+        w.write_batch(batch)
+
+    def _close_all(self) -> None:
+        for key in list(self._buf):
+            self._write_batch(key)
+        for w in self._writers.values():
+            w.close()
+        self._writers = {}
+
+    def flush(self) -> Optional[int]:
+        return None  # Parquet não é retomável por offset
+
+    def close(self) -> None:
+        self._close_all()
+
+def _open_at(path: Path, offset: Optional[int]):
+    """Abre para escrita; ao retomar, corta o arquivo no offset do checkpoint (descarta linha parcial) e continua."""
+    if offset is None:
+        return path.open("w", newline="", encoding="utf-8")
+    with path.open("r+b") as fb:
+        fb.truncate(offset)
+    return path.open("a", newline="", encoding="utf-8")
+
 def export_jsonl(rows: Iterable[Dict[str, Any]], out_path: Path) -> int:
-    n = 0
-    with out_path.open("w", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
-            n += 1
-    return n
+    return export_rows(rows, {"jsonl": JsonlSink(out_path)})
 
 def export_csv(rows: Iterable[Dict[str, Any]], out_path: Path, delimiter: str = ",") -> int:
+    return export_rows(rows, {"csv": CsvSink(out_path, delimiter)})
+
+# ---------- Checkpoint ----------
+def load_checkpoint(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def save_checkpoint(path: Path, state: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)  # troca atômica: nunca fica um checkpoint pela metade
+
+def checkpoint_resume_key(state: Dict[str, Any]) -> Optional[ResumeKey]:
+    last = state.get("last")
+    if not last:
+        return None
+    return (last["f_medidor_id"], datetime.fromisoformat(last["f_ts_utc"]), last["_doc_id"])
+
+def export_rows(
+    rows: Iterable[Dict[str, Any]],
+    sinks: Dict[str, Any],
+    ckpt_path: Optional[Path] = None,
+    ckpt_state: Optional[Dict[str, Any]] = None,
+    ckpt_every: int = PAGE_SIZE,
+) -> int:
+    """
+    Grava as linhas em todos os sinks (mesma ordem). Com ckpt_path, a cada `ckpt_every` linhas
+    faz flush e grava o checkpoint: última linha (medidor, timestamp, doc), nº de linhas e offset
+    em bytes de cada arquivo. Ao terminar sem erro o checkpoint é removido.
+    Retorna o nº de linhas gravadas nesta execução.
+    """
+    state = ckpt_state if ckpt_state is not None else {}
+    state.setdefault("rows", 0)
     n = 0
-    fieldnames = None
-    with out_path.open("w", newline="", encoding="utf-8") as f:
-        writer = None
+    last = None
+    writing = False  # interrupção no meio de uma linha: offsets não batem com `last`, vale o checkpoint anterior
+
+    def checkpoint():
+        if ckpt_path is None or last is None:
+            return
+        state["last"] = {
+            "f_medidor_id": last.get("f_medidor_id"),
+            "f_ts_utc": last["f_ts_utc"].isoformat() if isinstance(last.get("f_ts_utc"), datetime) else last.get("f_ts_utc"),
+            "_doc_id": last.get("_doc_id"),
+        }
+        state["files"] = {fmt: {"path": str(sk.path), "offset": sk.flush()} for fmt, sk in sinks.items() if fmt != "parquet"}
+        if "csv" in sinks and sinks["csv"].fieldnames:
+            state["csv_fields"] = sinks["csv"].fieldnames
+        save_checkpoint(ckpt_path, state)
+
+    try:
         for r in rows:
-            if fieldnames is None:
-                fieldnames = BASE_FIELDS + [k for k in r.keys() if k not in BASE_FIELDS]
-                writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=delimiter)
-                writer.writeheader()
-            writer.writerow({k: (r.get(k) if not isinstance(r.get(k), datetime) else r.get(k).isoformat()) for k in fieldnames})
+            writing = True
+            for sk in sinks.values():
+                sk.write(r)
+            writing = False
             n += 1
+            state["rows"] += 1
+            last = r
+            if n % ckpt_every == 0:
+                checkpoint()
+    except BaseException:
+        if not writing:
+            checkpoint()
+        raise
+    finally:
+        for sk in sinks.values():
+            sk.close()
+    if ckpt_path is not None:
+        ckpt_path.unlink(missing_ok=True)
     return n
 
 # ---------- CLI ----------
-def build_name(ext: str, meds: Optional[list[str]], start_dt: Optional[datetime], end_dt: Optional[datetime]) -> str:
-    parts = ["leituras_all_sorted"]
+def build_name(ext: str, meds: Optional[list[str]], start_dt: Optional[datetime], end_dt: Optional[datetime], prefix: str = "leituras_all_sorted") -> str:
+    parts = [prefix]
     if start_dt: parts.append(start_dt.date().isoformat())
     if end_dt:   parts.append(end_dt.date().isoformat())
     if meds:
         parts += meds
     return "_".join(parts) + f".{ext}"
 
-def main():
-    ap = argparse.ArgumentParser(description="Exporta leituras (ordenadas por medidor e timestamp) em CSV/JSONL")
+def run_summary(args) -> None:
+    start_dt = parse_dt(args.start)
+    end_dt   = parse_dt(args.end)
+    outdir = Path(args.outdir).resolve()
+    ensure_dir(outdir)
+    db = get_db()
+    rows = iter_summary(db, start_dt, end_dt, args.medidor, args.workers)
+    sinks: Dict[str, Any] = {}
+    if args.json:
+        sinks["jsonl"] = JsonlSink(outdir / build_name("jsonl", args.medidor, start_dt, end_dt, "resumo"))
+    if args.csv or not args.json:
+        sinks["csv"] = CsvSink(outdir / build_name("csv", args.medidor, start_dt, end_dt, "resumo"), args.delimiter, fieldnames=SUMMARY_FIELDS)
+    n = export_rows(rows, sinks)
+    for fmt, sk in sinks.items():
+        print(f"✅ RESUMO {fmt.upper()}: {n} linhas → {sk.path}")
+
+def main(argv: Optional[list[str]] = None):
+    ap = argparse.ArgumentParser(description="Exporta leituras (ordenadas por medidor e timestamp) em CSV/JSONL/Parquet")
     ap.add_argument("--outdir", default="./exports", help="Diretório de saída (padrão ./exports)")
     ap.add_argument("--csv", action="store_true", help="Exportar CSV")
     ap.add_argument("--json", action="store_true", help="Exportar JSONL")
+    ap.add_argument("--parquet", action="store_true", help="Exportar Parquet (pyarrow) particionado por f_ano_mes_ref")
+    ap.add_argument("--parquet-by-medidor", action="store_true", help="Parquet: particiona também por f_medidor_id")
+    ap.add_argument("--compression", default="zstd", choices=["zstd", "snappy", "gzip", "none"], help="Compressão do Parquet (default zstd)")
     ap.add_argument("--delimiter", default=",", help="Delimitador do CSV (use ';' para Excel PT-BR)")
     ap.add_argument("--start", help="UTC início (YYYY-MM-DD ou YYYY-MM-DDTHH:MM:SS)")
     ap.add_argument("--end",   help="UTC fim (YYYY-MM-DD ou YYYY-MM-DDTHH:MM:SS)")
     ap.add_argument("--medidor", action="append", help="Filtrar por f_medidor_id (pode repetir)")
-    args = ap.parse_args()
+    ap.add_argument("--partitions", type=int, default=1, help="Collection group sem --medidor: divide o scan em N faixas de medidores buscadas em paralelo (default 1)")
+    ap.add_argument("--workers", type=int, default=8, help="Buckets mensais buscados em paralelo no modo podado (default 8)")
+    ap.add_argument("--collection-group", action="store_true", help="Força a consulta por collection group mesmo com --medidor")
+    ap.add_argument("--summary", action="store_true", help="Só o resumo por medidor/mês (count/sum no servidor; docs-dia pelos totais do dia), sem baixar as leituras")
+    ap.add_argument("--fields", help="Só estas colunas, separadas por vírgula (projeção no Firestore), ex.: f_medidor_id,f_ts_utc,f_valor_m3")
+    ap.add_argument("--page-size", type=int, default=PAGE_SIZE, help=f"Docs por página/checkpoint (default {PAGE_SIZE})")
+    ap.add_argument("--resume", action="store_true", help="Continua um export interrompido a partir do checkpoint (.ckpt.json)")
+    args = ap.parse_args(argv)
 
-    if not args.csv and not args.json:
-        print("Nada para fazer: use --csv e/ou --json.")
+    if args.summary:
+        run_summary(args)
+        return
+    if not args.csv and not args.json and not args.parquet:
+        print("Nada para fazer: use --csv, --json e/ou --parquet.")
+        return
+    if args.resume and args.parquet:
+        print("--resume não é suportado com --parquet (arquivos Parquet não aceitam append); rode o export Parquet do zero.")
         return
 
     start_dt = parse_dt(args.start)
     end_dt   = parse_dt(args.end)
+    fields = [f.strip() for f in args.fields.split(",") if f.strip()] if args.fields else None
     outdir = Path(args.outdir).resolve()
     ensure_dir(outdir)
 
-    db = init_db()
+    paths = {}
+    if args.json:
+        paths["jsonl"] = outdir / build_name("jsonl", args.medidor, start_dt, end_dt)
+    if args.csv:
+        paths["csv"] = outdir / build_name("csv", args.medidor, start_dt, end_dt)
+    if args.parquet:
+        paths["parquet"] = outdir / build_name("parquet", args.medidor, start_dt, end_dt)
+    ckpt_path = outdir / build_name("ckpt.json", args.medidor, start_dt, end_dt)
 
-    # Fonte de dados já ORDENADA:
-    if args.medidor:
-        rows = iter_items_by_medidor_sorted(db, start_dt, end_dt, args.medidor)
-    else:
-        rows = iter_items_all_sorted(db, start_dt, end_dt)
+    # checkpoint: retoma exatamente de onde parou (mesmos filtros/formatos)
+    run_args = {"start": args.start, "end": args.end, "medidor": args.medidor, "collection_group": args.collection_group, "formats": sorted(paths), "delimiter": args.delimiter, "fields": fields}
+    state: Dict[str, Any] = {"args": run_args, "rows": 0}
+    resume = None
+    if args.resume:
+        prev = load_checkpoint(ckpt_path)
+        if prev is None:
+            print(f"Nenhum checkpoint em {ckpt_path}; iniciando do zero.")
+        elif prev.get("args") != run_args:
+            print(f"Checkpoint {ckpt_path.name} é de outro export (filtros/formatos diferentes): {prev.get('args')}")
+            return
+        else:
+            state = prev
+            resume = checkpoint_resume_key(prev)
+            print(f"→ retomando após {state['rows']} linhas (último: {prev.get('last')})")
+    elif ckpt_path.exists():
+        print(f"Aviso: existe checkpoint de um export interrompido ({ckpt_path.name}); use --resume para continuar. Recomeçando do zero.")
 
-    # JSON e CSV simultâneos (stream em dois arquivos mantendo a ordem)
-    if args.json and args.csv:
-        json_path = outdir / build_name("jsonl", args.medidor, start_dt, end_dt)
-        csv_path  = outdir / build_name("csv",   args.medidor, start_dt, end_dt)
+    offsets = {fmt: f["offset"] for fmt, f in state.get("files", {}).items()} if resume else {}
+    sinks: Dict[str, Any] = {}
+    if "jsonl" in paths:
+        sinks["jsonl"] = JsonlSink(paths["jsonl"], offsets.get("jsonl"), fields)
+    if "csv" in paths:
+        sinks["csv"] = CsvSink(paths["csv"], args.delimiter, offsets.get("csv"), state.get("csv_fields") if resume else fields)
+    if "parquet" in paths:
+        sinks["parquet"] = ParquetSink(paths["parquet"], args.parquet_by_medidor, args.compression, columns=fields)
 
-        n = 0
-        fieldnames = None
-        with json_path.open("w", encoding="utf-8") as fj, csv_path.open("w", newline="", encoding="utf-8") as fc:
-            writer = None
-            for r in rows:
-                # JSONL
-                fj.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
-                # CSV
-                if fieldnames is None:
-                    fieldnames = BASE_FIELDS + [k for k in r.keys() if k not in BASE_FIELDS]
-                    writer = csv.DictWriter(fc, fieldnames=fieldnames, delimiter=args.delimiter)
-                    writer.writeheader()
-                writer.writerow({k: (r.get(k) if not isinstance(r.get(k), datetime) else r.get(k).isoformat()) for k in fieldnames})
-                n += 1
-        print(f"✅ JSONL: {n} linhas → {json_path}")
-        print(f"✅ CSV  : {n} linhas → {csv_path}")
-        return
+    db = get_db()
 
-    # Formato único
-    if args.json:
-        out = outdir / build_name("jsonl", args.medidor, start_dt, end_dt)
-        n = export_jsonl(rows, out)
-        print(f"✅ JSONL: {n} linhas → {out}")
-    if args.csv:
-        out = outdir / build_name("csv", args.medidor, start_dt, end_dt)
-        n = export_csv(rows, out, delimiter=args.delimiter)
-        print(f"✅ CSV  : {n} linhas → {out}")
+    # Fonte de dados já ORDENADA:
+    # com --medidor, lê só os buckets t_leituras/{AAAA_MM} envolvidos (só período: collection group)
+    if args.medidor and not args.collection_group:
+        rows = iter_items_bucketed(db, start_dt, end_dt, args.medidor, resume, args.page_size, fields, args.workers)
+    elif args.medidor:
+        rows = iter_items_by_medidor_sorted(db, start_dt, end_dt, args.medidor, resume, args.page_size, fields)
+    elif args.partitions > 1:
+        rows = iter_items_all_sorted_parallel(db, start_dt, end_dt, args.partitions, resume, args.page_size, fields)
+    else:
+        rows = iter_items_all_sorted(db, start_dt, end_dt, resume, args.page_size, fields)
+
+    # JSON e/ou CSV (stream nos arquivos mantendo a ordem)
+    try:
+        n = export_rows(rows, sinks, ckpt_path, state, args.page_size)
+    except ResumeError as e:
+        print(f"→ {e}")
+        sys.exit(2)
+    total = state["rows"]
+    for fmt, label in (("jsonl", "JSONL"), ("csv", "CSV  ")):
+        if fmt in paths:
+            print(f"✅ {label}: {total} linhas → {paths[fmt]}" + (f" ({n} nesta execução)" if resume else ""))
+    if "parquet" in sinks:
+        print(f"✅ PARQUET: {total} linhas em {sinks['parquet'].files} arquivo(s) → {paths['parquet']}")
 
 if __name__ == "__main__":
     main()
@@ -207,7 +867,22 @@ if __name__ == "__main__":
 # Exportar CSV + JSONL, filtrando período:
 # python .\export_readings.py --csv --json --delimiter ";" --start 2024-03-11 --end 2025-09-18
 
+# Exportar tudo com o scan dividido em 8 faixas de medidores buscadas em paralelo (mesma ordem de saída):
+# python .\export_readings.py --csv --delimiter ";" --partitions 8
+
 # Exportar apenas de certos medidores (mantém ordem por f_ts_utc dentro de cada um):
 # python .\export_readings.py --csv --delimiter ";" --medidor MTR-000001 --medidor MTR-000002
 
+# Exportar Parquet (zstd) particionado por mês e medidor, para pandas/duckdb:
+# python .\export_readings.py --parquet --parquet-by-medidor --start 2025-01-01
+
+# Só as colunas necessárias (projeção no servidor: menos bytes trafegados e menos serialização):
+# python .\export_readings.py --csv --fields f_medidor_id,f_ts_utc,f_valor_m3
+
+# Totais por medidor e mês (count/sum de f_valor_m3 e f_pulsos calculados no Firestore; médias = total/qtd):
+# python .\export_readings.py --summary --delimiter ";" --start 2025-09-01 --end 2025-09-30
+
+# Export longo interrompido (deadline/rede/Ctrl+C)? Rode o MESMO comando com --resume:
+# python .\export_readings.py --csv --delimiter ";" --resume
+
 # Se o Firestore pedir índice composto, aceite criar no link sugerido (uma vez) e rode de novo.
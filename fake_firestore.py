@@ -0,0 +1,720 @@
+# Cliente Firestore em memória (sem rede, sem emulador), para benchmarks e testes rápidos dos scripts:
+#   from fake_firestore import FakeClient
+#   db = FakeClient(latency_ms=2)            # latency_ms: espera simulada por RPC (commit, get, página…)
+#   seed_firestore.cmd_simulate(db, …); export_readings.iter_items_all_sorted(db, …)
+#
+# Cobre o subconjunto da API usado pelos scripts deste projeto:
+#   - collection/document/collection_group, set (merge), update (campos com ponto), create, delete, add
+#   - where (operadores e FieldFilter), order_by, limit, offset, select, start_at/start_after/end_at/end_before
+#     (dict, snapshot ou lista de valores), stream/get, count/sum/avg, get_partitions
+#   - batch (até 500 ops, atômico), bulk_writer (síncrono, com on_write_error/on_write_result),
+#     get_all, recursive_delete
+#   - transaction (com firestore.transactional): otimista, o commit dá Aborted se um doc lido mudou
+#   - SERVER_TIMESTAMP, DELETE_FIELD, Increment, Maximum, Minimum, ArrayUnion, ArrayRemove
+# Semântica simplificada: docs sem o campo filtrado/ordenado ficam fora da query (como no Firestore),
+# __name__ ordena pelo caminho em texto, sem limites de índice/tamanho e sem locks de transação.
+# Contadores reads/writes/deletes/commits/rpcs ajudam a comparar o custo de cada caminho.
+
+from __future__ import annotations
+
+import time
+import bisect
+import random
+import string
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from hidro_core import lazy_import
+
+transforms = lazy_import("google.cloud.firestore_v1.transforms")
+
+MAX_BATCH_OPS = 500
+
+def _auto_id() -> str:
+    return "".join(random.choices(string.ascii_letters + string.digits, k=20))
+
+def _ref_path(v: Any) -> Any:
+    return v.path if isinstance(v, FakeDocumentReference) else v
+
+def _get_field(d: Dict[str, Any], field: str) -> Tuple[bool, Any]:
+    cur: Any = d
+    for part in field.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return False, None
+        cur = cur[part]
+    return True, cur
+
+# ---------- escrita de campos ----------
+def _transform(old: Any, v: Any, now: datetime) -> Any:
+    if v is transforms.SERVER_TIMESTAMP:
+        return now
+    if isinstance(v, transforms.Increment):
+        return (old if isinstance(old, (int, float)) and not isinstance(old, bool) else 0) + v.value
+    if isinstance(v, transforms.Maximum):
+        return v.value if old is None else max(old, v.value)
+    if isinstance(v, transforms.Minimum):
+        return v.value if old is None else min(old, v.value)
+    if isinstance(v, transforms.ArrayUnion):
+        cur = list(old) if isinstance(old, list) else []
+        return cur + [x for x in v.values if x not in cur]
+    if isinstance(v, transforms.ArrayRemove):
+        return [x for x in (old if isinstance(old, list) else []) if x not in v.values]
+    return v
+
+def _merge_into(doc: Dict[str, Any], data: Dict[str, Any], now: datetime) -> None:
+    """set(merge=True): mapas são mesclados recursivamente."""
+    for k, v in data.items():
+        if v is transforms.DELETE_FIELD:
+            doc.pop(k, None)
+        elif isinstance(v, dict):
+            sub = doc.get(k)
+            sub = dict(sub) if isinstance(sub, dict) else {}
+            _merge_into(sub, v, now)
+            doc[k] = sub
+        else:
+            doc[k] = _transform(doc.get(k), v, now)
+
+def _update_into(doc: Dict[str, Any], data: Dict[str, Any], now: datetime) -> None:
+    """update(): 'a.b' aponta para campo aninhado; mapa como valor substitui o campo inteiro."""
+    for key, v in data.items():
+        parts = key.split(".")
+        cur = doc
+        for p in parts[:-1]:
+            nxt = cur.get(p)
+            nxt = dict(nxt) if isinstance(nxt, dict) else {}
+            cur[p] = nxt
+            cur = nxt
+        last = parts[-1]
+        if v is transforms.DELETE_FIELD:
+            cur.pop(last, None)
+        elif isinstance(v, dict):
+            sub: Dict[str, Any] = {}
+            _merge_into(sub, v, now)
+            cur[last] = sub
+        else:
+            cur[last] = _transform(cur.get(last), v, now)
+
+# ---------- snapshots / referências ----------
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]], update_time: Optional[datetime] = None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+        self.create_time = self.update_time = self.read_time = update_time
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return _get_field(self._data or {}, field)[1]
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeClient", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, FakeDocumentReference) and other.path == self.path
+
+    def __hash__(self) -> int:
+        return hash(self.path)
+
+    @property
+    def parent(self) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+    def collections(self) -> List["FakeCollectionReference"]:
+        return [self.collection(n) for n in self._client._subcollections(self.path)]
+
+    def get(self, field_paths: Optional[Iterable[str]] = None, transaction: Any = None) -> FakeSnapshot:
+        c = self._client
+        c._rpc()
+        with c._lock:
+            data = c._docs.get(self.path)
+            c.reads += 1
+            if transaction is not None:
+                transaction._reads.setdefault(self.path, c._doc_versions.get(self.path, 0))
+            return FakeSnapshot(self, _project(data, field_paths), c._updated.get(self.path))
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        self._client._commit([("set", self.path, data, merge)])
+
+    def update(self, data: Dict[str, Any]) -> None:
+        self._client._commit([("update", self.path, data, False)])
+
+    def create(self, data: Dict[str, Any]) -> None:
+        self._client._commit([("create", self.path, data, False)])
+
+    def delete(self) -> None:
+        self._client._commit([("delete", self.path, None, False)])
+
+def _project(data: Optional[Dict[str, Any]], fields: Optional[Iterable[str]]) -> Optional[Dict[str, Any]]:
+    """Projeção do select()/field_paths: só os campos pedidos ('a.b' traz {a: {b: …}})."""
+    if data is None or fields is None:
+        return data
+    out: Dict[str, Any] = {}
+    for f in fields:
+        found, v = _get_field(data, f)
+        if not found:
+            continue
+        *parents, last = f.split(".")
+        cur = out
+        for p in parents:
+            cur = cur.setdefault(p, {})
+        cur[last] = v
+    return out
+
+# ---------- consultas ----------
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    "array_contains_any": lambda a, b: isinstance(a, list) and any(x in a for x in b),
+}
+
+def _descending(direction: Any) -> bool:
+    return str(direction).upper().endswith("DESCENDING")
+
+class _AggResult:
+    def __init__(self, alias: str, value: Any):
+        self.alias = alias
+        self.value = value
+
+class FakeAggregationQuery:
+    def __init__(self, query: "FakeQuery"):
+        self._query = query
+        self._aggs: List[Tuple[str, Optional[str], str]] = []
+
+    def _add(self, kind: str, field: Optional[str], alias: Optional[str]) -> "FakeAggregationQuery":
+        self._aggs.append((kind, field, alias or f"field_{len(self._aggs) + 1}"))
+        return self
+
+    def count(self, alias: Optional[str] = None) -> "FakeAggregationQuery":
+        return self._add("count", None, alias)
+
+    def sum(self, field: str, alias: Optional[str] = None) -> "FakeAggregationQuery":
+        return self._add("sum", field, alias)
+
+    def avg(self, field: str, alias: Optional[str] = None) -> "FakeAggregationQuery":
+        return self._add("avg", field, alias)
+
+    def get(self, transaction: Any = None) -> List[List[_AggResult]]:
+        c = self._query._client
+        c._rpc()
+        rows = self._query._results()
+        c.reads += max(1, len(rows) // 1000)
+        out = []
+        for kind, field, alias in self._aggs:
+            if kind == "count":
+                out.append(_AggResult(alias, len(rows)))
+                continue
+            vals = [v for _, d in rows for found, v in [_get_field(d, field)]
+                    if found and isinstance(v, (int, float)) and not isinstance(v, bool)]
+            if kind == "sum":
+                out.append(_AggResult(alias, sum(vals)))
+            else:
+                out.append(_AggResult(alias, sum(vals) / len(vals) if vals else None))
+        return [out]
+
+    stream = get
+
+class FakeQuery:
+    def __init__(self, client: "FakeClient", scope: Tuple[str, str], filters=(), orders=(), limit=None, offset=0,
+                 fields=None, start=None, end=None):
+        self._client = client
+        self._scope = scope            # ("col", caminho) ou ("group", id da coleção)
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._fields = fields
+        self._start = start            # (valores, inclusivo)
+        self._end = end
+
+    def _copy(self, **kw) -> "FakeQuery":
+        d = dict(filters=self._filters, orders=self._orders, limit=self._limit, offset=self._offset,
+                 fields=self._fields, start=self._start, end=self._end)
+        d.update(kw)
+        return FakeQuery(self._client, self._scope, **d)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value: Any = None, *, filter: Any = None) -> "FakeQuery":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING") -> "FakeQuery":
+        return self._copy(orders=self._orders + ((field_path, _descending(direction)),))
+
+    def limit(self, n: int) -> "FakeQuery":
+        return self._copy(limit=n)
+
+    def offset(self, n: int) -> "FakeQuery":
+        return self._copy(offset=n)
+
+    def select(self, field_paths: Iterable[str]) -> "FakeQuery":
+        return self._copy(fields=list(field_paths))
+
+    def _cursor(self, c: Any) -> List[Any]:
+        orders = self._full_orders()
+        if isinstance(c, FakeSnapshot):
+            data = self._client._docs.get(c.reference.path) or c._data or {}
+            return [c.reference.path if f == "__name__" else _get_field(data, f)[1] for f, _ in orders]
+        if isinstance(c, dict):
+            vals = []
+            for f, _ in orders:
+                if f not in c:
+                    break
+                vals.append(_ref_path(c[f]))
+            return vals
+        return [_ref_path(v) for v in c]
+
+    def start_at(self, c: Any) -> "FakeQuery":
+        return self._copy(start=(self._cursor(c), True))
+
+    def start_after(self, c: Any) -> "FakeQuery":
+        return self._copy(start=(self._cursor(c), False))
+
+    def end_at(self, c: Any) -> "FakeQuery":
+        return self._copy(end=(self._cursor(c), True))
+
+    def end_before(self, c: Any) -> "FakeQuery":
+        return self._copy(end=(self._cursor(c), False))
+
+    def count(self, alias: Optional[str] = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self).count(alias)
+
+    def sum(self, field: str, alias: Optional[str] = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self).sum(field, alias)
+
+    def avg(self, field: str, alias: Optional[str] = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self).avg(field, alias)
+
+    def _full_orders(self) -> Tuple[Tuple[str, bool], ...]:
+        orders = self._orders
+        if not any(f == "__name__" for f, _ in orders):
+            orders = orders + (("__name__", orders[-1][1] if orders else False),)
+        return orders
+
+    def _sorted(self) -> Tuple[List[Tuple[str, Dict[str, Any]]], List[tuple]]:
+        """Docs do escopo filtrados e ordenados (+ chaves de ordenação); reaproveitado entre páginas."""
+        c = self._client
+        orders = self._full_orders()
+        key = (self._scope, repr(self._filters), orders)
+        with c._lock:
+            hit = c._query_cache.get(key)
+            if hit is not None and hit[0] == c._version:
+                return hit[1], hit[2]
+            rows = [(p, c._docs[p]) for p in c._scope_paths(self._scope)]
+            version = c._version
+        out = []
+        for p, d in rows:
+            ok = True
+            for f, op, v in self._filters:
+                if f == "__name__":
+                    a, v = p, (v if op in ("in", "not-in") else _ref_path(v))
+                    if op in ("in", "not-in"):
+                        v = [_ref_path(x) for x in v]
+                else:
+                    found, a = _get_field(d, f)
+                    if not found:
+                        ok = False
+                        break
+                try:
+                    if not _OPS[op](a, v):
+                        ok = False
+                        break
+                except TypeError:
+                    ok = False
+                    break
+            if ok and all(f == "__name__" or _get_field(d, f)[0] for f, _ in orders):
+                out.append((p, d))
+        for f, desc in reversed(orders):
+            def value(x, f=f):
+                return x[0] if f == "__name__" else _get_field(x[1], f)[1]
+            try:
+                out.sort(key=value, reverse=desc)
+            except TypeError:  # tipos misturados: agrupa pelo nome do tipo, depois pelo valor em texto
+                out.sort(key=lambda x: (type(value(x)).__name__, str(value(x))), reverse=desc)
+        keys = [tuple(p if f == "__name__" else _get_field(d, f)[1] for f, _ in orders) for p, d in out]
+        with c._lock:
+            c._query_cache[key] = (version, out, keys)
+        return out, keys
+
+    def _bound(self, keys: List[tuple], cursor: Tuple[List[Any], bool], is_start: bool) -> int:
+        vals, inclusive = cursor
+        n = len(vals)
+        orders = self._full_orders()[:n]
+        cv = tuple(vals)
+        if n and not any(desc for _, desc in orders):
+            try:
+                prefix = keys if keys and n == len(keys[0]) else [k[:n] for k in keys]
+                if is_start:
+                    return bisect.bisect_left(prefix, cv) if inclusive else bisect.bisect_right(prefix, cv)
+                return bisect.bisect_right(prefix, cv) if inclusive else bisect.bisect_left(prefix, cv)
+            except TypeError:
+                pass
+        def before(k: tuple) -> bool:  # k vem antes do cursor na ordem da query
+            for (f, desc), a, b in zip(orders, k, cv):
+                if a == b:
+                    continue
+                try:
+                    return (a > b) if desc else (a < b)
+                except TypeError:
+                    return str(a) < str(b)
+            return False
+        for i, k in enumerate(keys):
+            eq = k[:n] == cv
+            if is_start and not before(k) and (inclusive or not eq):
+                return i
+            if not is_start and not before(k) and not (inclusive and eq):
+                return i
+        return len(keys)
+
+    def _results(self) -> List[Tuple[str, Dict[str, Any]]]:
+        rows, keys = self._sorted()
+        lo, hi = 0, len(rows)
+        if self._start is not None:
+            lo = self._bound(keys, self._start, True)
+        if self._end is not None:
+            hi = self._bound(keys, self._end, False)
+        lo += self._offset
+        if self._limit is not None:
+            hi = min(hi, lo + self._limit)
+        return rows[lo:hi] if lo < hi else []
+
+    def stream(self, transaction: Any = None) -> Iterator[FakeSnapshot]:
+        c = self._client
+        c._rpc()
+        rows = self._results()
+        c.reads += max(1, len(rows))
+        for p, d in rows:
+            yield FakeSnapshot(FakeDocumentReference(c, p), _project(d, self._fields), c._updated.get(p))
+
+    def get(self, transaction: Any = None) -> List[FakeSnapshot]:
+        return list(self.stream())
+
+    def get_partitions(self, partition_count: int) -> Iterator["_Partition"]:
+        """Divide o escopo em faixas de __name__ (como as partition queries do Firestore)."""
+        rows, _ = FakeQuery(self._client, self._scope)._sorted()
+        paths = [p for p, _ in rows]
+        n = max(1, min(partition_count, len(paths) or 1))
+        cuts = [paths[len(paths) * i // n] for i in range(1, n)]
+        bounds = [None] + cuts + [None]
+        for lo, hi in zip(bounds, bounds[1:]):
+            yield _Partition(self, lo, hi)
+
+class _Partition:
+    def __init__(self, query: FakeQuery, start: Optional[str], end: Optional[str]):
+        self._q, self.start_at, self.end_at = query, start, end
+
+    def query(self) -> FakeQuery:
+        q = self._q.order_by("__name__")
+        if self.start_at is not None:
+            q = q.start_at([self.start_at])
+        if self.end_at is not None:
+            q = q.end_before([self.end_at])
+        return q
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client: "FakeClient", path: str):
+        super().__init__(client, ("col", path))
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self) -> Optional[FakeDocumentReference]:
+        return FakeDocumentReference(self._client, self.path.rsplit("/", 1)[0]) if "/" in self.path else None
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, f"{self.path}/{document_id or _auto_id()}")
+
+    def add(self, data: Dict[str, Any], document_id: Optional[str] = None) -> Tuple[datetime, FakeDocumentReference]:
+        ref = self.document(document_id)
+        ref.create(data)
+        return datetime.now(timezone.utc), ref
+
+    def list_documents(self) -> List[FakeDocumentReference]:
+        with self._client._lock:
+            paths = set(self._client._children.get(self.path, ()))
+            pre = self.path + "/"
+            paths.update(pre + p[len(pre):].split("/")[0] for p in self._client._docs if p.startswith(pre))
+        self._client._rpc()
+        return [FakeDocumentReference(self._client, p) for p in sorted(paths)]
+
+# ---------- escrita ----------
+class FakeWriteBatch:
+    """WriteBatch atômico: valida tudo (404/409) antes de aplicar."""
+
+    def __init__(self, client: "FakeClient"):
+        self._client = client
+        self._ops: List[Tuple[str, str, Any, bool]] = []
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def set(self, ref: FakeDocumentReference, data: Dict[str, Any], merge: bool = False) -> "FakeWriteBatch":
+        self._ops.append(("set", ref.path, data, merge))
+        return self
+
+    def update(self, ref: FakeDocumentReference, data: Dict[str, Any]) -> "FakeWriteBatch":
+        self._ops.append(("update", ref.path, data, False))
+        return self
+
+    def create(self, ref: FakeDocumentReference, data: Dict[str, Any]) -> "FakeWriteBatch":
+        self._ops.append(("create", ref.path, data, False))
+        return self
+
+    def delete(self, ref: FakeDocumentReference) -> "FakeWriteBatch":
+        self._ops.append(("delete", ref.path, None, False))
+        return self
+
+    def commit(self, timeout: Any = None) -> List[Any]:
+        if len(self._ops) > MAX_BATCH_OPS:
+            raise self._client._error("InvalidArgument", f"maximum {MAX_BATCH_OPS} writes allowed per request")
+        self._client._commit(self._ops)
+        self._ops = []
+        return []
+
+class FakeTransaction(FakeWriteBatch):
+    """
+    Transação para o firestore.transactional: ref.get(transaction=t) anota a versão do doc lido;
+    o commit aplica as escritas de uma vez ou dá Aborted (o decorator repete) se algum doc lido mudou.
+    """
+
+    def __init__(self, client: "FakeClient", max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id: Optional[bytes] = None
+        self._reads: Dict[str, int] = {}
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    def _clean_up(self) -> None:
+        self._ops = []
+        self._reads = {}
+        self._id = None
+
+    def _begin(self, retry_id: Optional[bytes] = None) -> None:
+        if self._id is not None:
+            raise ValueError("transação já iniciada")
+        self._client._rpc()
+        self._id = _auto_id().encode()
+
+    def _rollback(self) -> None:
+        if self._id is not None:
+            self._client._rpc()
+        self._clean_up()
+
+    def _commit(self) -> List[Any]:
+        if self._id is None:
+            raise ValueError("transação não iniciada")
+        if self._read_only and self._ops:
+            raise self._client._error("InvalidArgument", "escrita em transação somente leitura")
+        if len(self._ops) > MAX_BATCH_OPS:
+            raise self._client._error("InvalidArgument", f"maximum {MAX_BATCH_OPS} writes allowed per request")
+        self._client._commit(self._ops, reads=self._reads)
+        self._clean_up()
+        return []
+
+    def get(self, ref_or_query: Any, **kwargs) -> Any:
+        if isinstance(ref_or_query, FakeDocumentReference):
+            return ref_or_query.get(transaction=self, **kwargs)
+        return ref_or_query.stream(transaction=self, **kwargs)
+
+class _BulkWriteFailure:
+    def __init__(self, ref: FakeDocumentReference, op: str, message: str, attempts: int):
+        self.reference, self.operation, self.message, self.attempts = ref, op, message, attempts
+        self.code = 5 if message.startswith("404") else 6 if message.startswith("409") else 13
+
+class FakeBulkWriter:
+    """BulkWriter síncrono: cada op é aplicada (com retentativas via on_write_error) ao ser enfileirada em lote."""
+
+    def __init__(self, client: "FakeClient", options: Any = None):
+        self._client = client
+        self._ops: List[Tuple[str, FakeDocumentReference, Any, bool]] = []
+        self._on_error = lambda err, bw: err.attempts < 15
+        self._on_result = None
+
+    def on_write_error(self, callback) -> None:
+        self._on_error = callback
+
+    def on_write_result(self, callback) -> None:
+        self._on_result = callback
+
+    def _add(self, op: str, ref: FakeDocumentReference, data: Any = None, merge: bool = False) -> None:
+        self._ops.append((op, ref, data, merge))
+        if len(self._ops) >= 20:  # mesmo tamanho de lote do BulkWriter real
+            self.flush()
+
+    def set(self, ref, data, merge: bool = False) -> None:
+        self._add("set", ref, data, merge)
+
+    def update(self, ref, data) -> None:
+        self._add("update", ref, data)
+
+    def create(self, ref, data) -> None:
+        self._add("create", ref, data)
+
+    def delete(self, ref, option: Any = None) -> None:
+        self._add("delete", ref)
+
+    def flush(self) -> None:
+        ops, self._ops = self._ops, []
+        if ops:
+            self._client._rpc()
+        for op, ref, data, merge in ops:
+            attempts = 0
+            while True:
+                attempts += 1
+                try:
+                    self._client._commit([(op, ref.path, data, merge)], rpc=False)
+                    if self._on_result is not None:
+                        self._on_result(ref, None, self)
+                    break
+                except Exception as e:
+                    if not self._on_error(_BulkWriteFailure(ref, op, str(e), attempts), self):
+                        break
+
+    def close(self) -> None:
+        self.flush()
+
+class FakeClient:
+    """Cliente Firestore em memória (thread-safe). latency_ms: atraso simulado por RPC."""
+
+    def __init__(self, project: str = "fake-hidro", latency_ms: float = 0.0):
+        self.project = project
+        self.latency_s = latency_ms / 1000.0
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._updated: Dict[str, datetime] = {}
+        self._children: Dict[str, set] = {}   # caminho da coleção -> caminhos dos docs
+        self._groups: Dict[str, set] = {}     # id da coleção -> caminhos dos docs
+        self._version = 0
+        self._doc_versions: Dict[str, int] = {}   # caminho -> _version da última escrita (transações)
+        self._query_cache: Dict[Any, Any] = {}
+        self.reads = self.writes = self.deletes = self.commits = self.rpcs = 0
+
+    def _rpc(self) -> None:
+        with self._lock:
+            self.rpcs += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def _error(self, kind: str, message: str) -> Exception:
+        exc = lazy_import("google.api_core.exceptions")
+        return getattr(exc, kind)(message)
+
+    # ----- API pública -----
+    def collection(self, path: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, path)
+
+    def document(self, path: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self, path)
+
+    def collection_group(self, collection_id: str) -> FakeQuery:
+        return FakeQuery(self, ("group", collection_id))
+
+    def collections(self) -> List[FakeCollectionReference]:
+        with self._lock:
+            names = sorted({p.split("/", 1)[0] for p in self._docs})
+        return [self.collection(n) for n in names]
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def bulk_writer(self, options: Any = None) -> FakeBulkWriter:
+        return FakeBulkWriter(self, options)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False) -> FakeTransaction:
+        return FakeTransaction(self, max_attempts, read_only)
+
+    def get_all(self, references: Iterable[FakeDocumentReference], field_paths: Optional[Iterable[str]] = None,
+                transaction: Any = None) -> Iterator[FakeSnapshot]:
+        refs = list(references)
+        self._rpc()
+        with self._lock:
+            snaps = [FakeSnapshot(r, _project(self._docs.get(r.path), field_paths), self._updated.get(r.path)) for r in refs]
+            self.reads += len(refs)
+        yield from snaps
+
+    def recursive_delete(self, reference: Any, bulk_writer: Optional[FakeBulkWriter] = None) -> int:
+        pre = reference.path + "/"
+        with self._lock:
+            paths = [p for p in self._docs if p.startswith(pre) or p == reference.path]
+        bw = bulk_writer or self.bulk_writer()
+        for p in paths:
+            bw.delete(FakeDocumentReference(self, p))
+        bw.close()
+        return len(paths)
+
+    def close(self) -> None:
+        pass
+
+    # ----- estado interno -----
+    def _subcollections(self, doc_path: str) -> List[str]:
+        pre = doc_path + "/"
+        with self._lock:
+            return sorted({c[len(pre):] for c in self._children if c.startswith(pre) and "/" not in c[len(pre):] and self._children[c]})
+
+    def _scope_paths(self, scope: Tuple[str, str]) -> Iterable[str]:
+        kind, name = scope
+        src = self._children if kind == "col" else self._groups
+        return list(src.get(name, ()))
+
+    def _commit(self, ops: List[Tuple[str, str, Any, bool]], rpc: bool = True, reads: Optional[Dict[str, int]] = None) -> None:
+        if rpc:
+            self._rpc()
+        with self._lock:
+            for path, ver in (reads or {}).items():
+                if self._doc_versions.get(path, 0) != ver:
+                    raise self._error("Aborted", f"409 Aborted due to cross-transaction contention: {path}")
+            for op, path, _, _ in ops:
+                if op == "update" and path not in self._docs:
+                    raise self._error("NotFound", f"404 No document to update: {path}")
+                if op == "create" and path in self._docs:
+                    raise self._error("Conflict", f"409 Document already exists: {path}")
+            now = datetime.now(timezone.utc)
+            self._version += 1
+            for op, path, data, merge in ops:
+                self._doc_versions[path] = self._version
+                col, _ = path.rsplit("/", 1)
+                if op == "delete":
+                    if self._docs.pop(path, None) is not None:
+                        self._children[col].discard(path)
+                        self._groups[col.rsplit("/", 1)[-1]].discard(path)
+                    self._updated.pop(path, None)
+                    self.deletes += 1
+                    continue
+                old = self._docs.get(path)
+                doc = dict(old) if old is not None and (merge or op == "update") else {}
+                if op == "update":
+                    _update_into(doc, data, now)
+                else:
+                    _merge_into(doc, data, now)
+                if old is None:
+                    self._children.setdefault(col, set()).add(path)
+                    self._groups.setdefault(col.rsplit("/", 1)[-1], set()).add(path)
+                self._docs[path] = doc
+                self._updated[path] = now
+                self.writes += 1
+            self.commits += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"docs": len(self._docs), "reads": self.reads, "writes": self.writes, "deletes": self.deletes,
+                    "commits": self.commits, "rpcs": self.rpcs}
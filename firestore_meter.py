@@ -0,0 +1,671 @@
+# Medição de custo do Firestore por execução: leituras, gravações e deletes por coleção, bytes (tamanho
+# de documento pelas regras do Firestore), latência de cada RPC (histograma) e estimativa em USD.
+#   python .\hidro.py --meter export --csv                        # relatório no fim da execução
+#   python .\hidro.py --meter --meter-out custo.json seed …       # + JSON (para comparar otimizações)
+#   python .\hidro.py --meter --prices precos.json rollup …       # tabela de preços própria
+#   python .\hidro.py --profile export.prof export --csv          # cProfile (snakeviz, flameprof, gprof2dot)
+#   python .\hidro.py --profile export.folded export --csv        # pilhas amostradas (flamegraph.pl, speedscope)
+#   set HIDRO_METER=1 (PowerShell: $env:HIDRO_METER="1")          # liga a medição nos scripts rodados sozinhos
+#
+# Com HIDRO_METER ligado, hidro_core.get_db() devolve o cliente embrulhado num MeteredClient. Referências,
+# queries, lotes, BulkWriter e transações criados a partir dele também são medidos. Regras de cobrança usadas:
+#   - query: 1 leitura por doc devolvido (mínimo 1); aggregation: 1 leitura a cada 1000 entradas (mínimo 1)
+#   - get/get_all: 1 leitura por doc pedido (inclusive os inexistentes)
+#   - set/update/create: 1 gravação; delete: 1 delete (também dentro de lote, BulkWriter e transação)
+# A cota grátis diária (50k leituras, 20k gravações, 20k deletes) não é descontada. Preços (USD por 100k)
+# no padrão abaixo (Standard edition, mesmos números das notas de custo do README); --prices / HIDRO_PRICES
+# aponta um JSON com as chaves a trocar, ex.: {"reads": 0.06, "writes": 0.18, "deletes": 0.02}.
+
+from __future__ import annotations
+
+import os
+import sys
+import json
+import math
+import time
+import atexit
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from hidro_core import lazy_import
+
+transforms = lazy_import("google.cloud.firestore_v1.transforms")
+
+DEFAULT_PRICES = {"reads": 0.03, "writes": 0.09, "deletes": 0.01, "per_ops": 100_000, "currency": "USD"}
+# limites dos baldes do histograma de latência (ms): 0,25 ms … ~2 min, dobrando
+HIST_BOUNDS_MS = [0.25 * 2 ** k for k in range(20)]
+
+# ---------- tamanho de documento (regras de storage do Firestore) ----------
+def _name_size(path: str) -> int:
+    return sum(len(s.encode("utf-8")) + 1 for s in path.split("/")) + 16
+
+def value_size(v: Any) -> int:
+    if v is None or isinstance(v, bool):
+        return 1
+    if isinstance(v, (int, float, datetime)):
+        return 8
+    if isinstance(v, str):
+        return len(v.encode("utf-8")) + 1
+    if isinstance(v, bytes):
+        return len(v)
+    if isinstance(v, dict):
+        return sum(len(str(k).encode("utf-8")) + 1 + value_size(x) for k, x in v.items())
+    if isinstance(v, (list, tuple)):
+        return sum(value_size(x) for x in v)
+    if v is transforms.DELETE_FIELD:
+        return 0
+    path = getattr(v, "path", None)
+    if isinstance(path, str):  # DocumentReference
+        return _name_size(path)
+    if hasattr(v, "latitude"):  # GeoPoint
+        return 16
+    return 8  # SERVER_TIMESTAMP, Increment, Maximum… (valor numérico/timestamp)
+
+def doc_size(path: str, data: Optional[Dict[str, Any]]) -> int:
+    """Tamanho do documento: nome + campos + 32 bytes (docs.cloud.google.com/firestore/docs/storage-size)."""
+    return _name_size(path) + (value_size(data) if data else 0) + 32
+
+def _collection_id(path: str) -> str:
+    """Id da coleção de um caminho de doc ou de coleção (t_medidor/X/t_leituras/2025_09 -> t_leituras)."""
+    parts = path.split("/")
+    return parts[-2] if len(parts) % 2 == 0 else parts[-1]
+
+# ---------- acumulador ----------
+class RpcHistogram:
+    """Histograma de latência em baldes log2 (+ contagem, soma e máximo)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(HIST_BOUNDS_MS) + 1)
+        self.n = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def add(self, seconds: float) -> None:
+        ms = seconds * 1000
+        i = 0
+        while i < len(HIST_BOUNDS_MS) and ms > HIST_BOUNDS_MS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.n += 1
+        self.total_s += seconds
+        self.max_s = max(self.max_s, seconds)
+
+    def percentile_ms(self, p: float) -> Optional[float]:
+        """Limite superior do balde que contém o percentil p."""
+        if not self.n:
+            return None
+        target = math.ceil(p / 100 * self.n)
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return min(HIST_BOUNDS_MS[i], self.max_s * 1000) if i < len(HIST_BOUNDS_MS) else self.max_s * 1000
+        return self.max_s * 1000
+
+class Meter:
+    """Contadores thread-safe por coleção e por tipo de RPC."""
+
+    def __init__(self, prices: Optional[Dict[str, Any]] = None):
+        self.prices = {**DEFAULT_PRICES, **(prices or {})}
+        self._lock = threading.Lock()
+        self.by_collection: Dict[str, Dict[str, int]] = {}
+        self.rpcs: Dict[str, RpcHistogram] = {}
+        self.started = time.perf_counter()
+
+    def _col(self, col: str) -> Dict[str, int]:
+        c = self.by_collection.get(col)
+        if c is None:
+            c = self.by_collection[col] = {"reads": 0, "writes": 0, "deletes": 0, "bytes_read": 0, "bytes_written": 0}
+        return c
+
+    def read(self, col: str, n: int = 1, nbytes: int = 0) -> None:
+        with self._lock:
+            c = self._col(col)
+            c["reads"] += n
+            c["bytes_read"] += nbytes
+
+    def write(self, col: str, nbytes: int = 0) -> None:
+        with self._lock:
+            c = self._col(col)
+            c["writes"] += 1
+            c["bytes_written"] += nbytes
+
+    def delete(self, col: str) -> None:
+        with self._lock:
+            self._col(col)["deletes"] += 1
+
+    def rpc(self, kind: str, seconds: float) -> None:
+        with self._lock:
+            h = self.rpcs.get(kind)
+            if h is None:
+                h = self.rpcs[kind] = RpcHistogram()
+            h.add(seconds)
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            out = {"reads": 0, "writes": 0, "deletes": 0, "bytes_read": 0, "bytes_written": 0}
+            for c in self.by_collection.values():
+                for k in out:
+                    out[k] += c[k]
+            return out
+
+    def cost_usd(self, counts: Optional[Dict[str, int]] = None) -> float:
+        counts = counts or self.totals()
+        p = self.prices
+        return sum(counts[k] / p["per_ops"] * p[k] for k in ("reads", "writes", "deletes"))
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            cols = {k: dict(v) for k, v in sorted(self.by_collection.items())}
+            rpcs = {k: {"n": h.n, "total_s": round(h.total_s, 4), "p50_ms": h.percentile_ms(50),
+                        "p95_ms": h.percentile_ms(95), "p99_ms": h.percentile_ms(99),
+                        "max_ms": round(h.max_s * 1000, 3), "hist": dict(zip([f"<={b:g}ms" for b in HIST_BOUNDS_MS] + ["mais"], h.counts))}
+                    for k, h in sorted(self.rpcs.items())}
+        for v in cols.values():
+            v["usd"] = round(self.cost_usd(v), 6)
+        totals = self.totals()
+        return {"colecoes": cols, "total": {**totals, "usd": round(self.cost_usd(totals), 6)}, "rpcs": rpcs,
+                "precos": self.prices, "segundos": round(time.perf_counter() - self.started, 3)}
+
+    def print_report(self, file=None) -> None:
+        file = file or sys.stderr
+        r = self.report()
+        p = r["precos"]
+        print(f"\n── Firestore nesta execução ({r['segundos']:.1f}s) ──", file=file)
+        print(f"{'coleção':16s} {'leituras':>10s} {'gravações':>10s} {'deletes':>9s} {'KB lidos':>10s} {'KB gravados':>12s} {p['currency']:>10s}", file=file)
+        for name, c in list(r["colecoes"].items()) + [("total", r["total"])]:
+            print(f"{name:16s} {c['reads']:>10d} {c['writes']:>10d} {c['deletes']:>9d} {c['bytes_read'] / 1024:>10.1f} "
+                  f"{c['bytes_written'] / 1024:>12.1f} {c['usd']:>10.4f}", file=file)
+        if r["rpcs"]:
+            print(f"{'RPC':16s} {'n':>10s} {'total s':>10s} {'p50 ms':>9s} {'p95 ms':>10s} {'p99 ms':>12s} {'máx ms':>10s}", file=file)
+            for kind, h in r["rpcs"].items():
+                f = lambda v: "-" if v is None else f"{v:.2f}"
+                print(f"{kind:16s} {h['n']:>10d} {h['total_s']:>10.2f} {f(h['p50_ms']):>9s} {f(h['p95_ms']):>10s} "
+                      f"{f(h['p99_ms']):>12s} {h['max_ms']:>10.2f}", file=file)
+        print(f"estimativa: {p['currency']} {r['total']['usd']:.4f} (por {p['per_ops']:,} ops: leituras {p['reads']}, "
+              f"gravações {p['writes']}, deletes {p['deletes']}; sem cota grátis)", file=file)
+
+# ---------- proxies ----------
+def _unwrap(v: Any) -> Any:
+    return v._target if isinstance(v, _Proxy) else v
+
+def _unwrap_cursor(c: Any) -> Any:
+    if isinstance(c, dict):
+        return {k: _unwrap(v) for k, v in c.items()}
+    if isinstance(c, (list, tuple)):
+        return type(c)(_unwrap(v) for v in c)
+    return _unwrap(c)
+
+def _unwrap_kwargs(kw: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: _unwrap(v) for k, v in kw.items()}
+
+class _Proxy:
+    """Repassa ao objeto real tudo o que não é medido."""
+
+    def __init__(self, target: Any, meter: Meter):
+        self._target = target
+        self._meter = meter
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target, name)
+
+    def __eq__(self, other: Any) -> bool:
+        return self._target == _unwrap(other)
+
+    def __hash__(self) -> int:
+        return hash(self._target)
+
+    def __repr__(self) -> str:
+        return f"Metered({self._target!r})"
+
+class MeteredSnapshot(_Proxy):
+    @property
+    def reference(self) -> "MeteredDocument":
+        return MeteredDocument(self._target.reference, self._meter)
+
+def _timed_stream(meter: Meter, kind: str, col: str, it: Iterable[Any]) -> Iterator[MeteredSnapshot]:
+    """Conta docs/bytes e soma o tempo gasto esperando o stream (não o do consumidor)."""
+    it = iter(it)
+    n = nbytes = 0
+    waited = 0.0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            try:
+                snap = next(it)
+            except StopIteration:
+                waited += time.perf_counter() - t0
+                break
+            waited += time.perf_counter() - t0
+            n += 1
+            nbytes += doc_size(snap.reference.path, snap.to_dict())
+            yield MeteredSnapshot(snap, meter)
+    finally:
+        meter.read(col, max(1, n), nbytes)
+        meter.rpc(kind, waited)
+
+class MeteredQuery(_Proxy):
+    def __init__(self, target: Any, meter: Meter, col: str):
+        super().__init__(target, meter)
+        self._col_id = col
+
+    def _wrap(self, q: Any) -> "MeteredQuery":
+        return MeteredQuery(q, self._meter, self._col_id)
+
+    def where(self, *args, **kwargs):
+        f = kwargs.get("filter")
+        if f is not None and isinstance(getattr(f, "value", None), _Proxy):
+            f.value = _unwrap(f.value)
+        return self._wrap(self._target.where(*[_unwrap(a) for a in args], **_unwrap_kwargs(kwargs)))
+
+    def order_by(self, *args, **kwargs):
+        return self._wrap(self._target.order_by(*args, **kwargs))
+
+    def limit(self, n):
+        return self._wrap(self._target.limit(n))
+
+    def limit_to_last(self, n):
+        return self._wrap(self._target.limit_to_last(n))
+
+    def offset(self, n):
+        return self._wrap(self._target.offset(n))
+
+    def select(self, field_paths):
+        return self._wrap(self._target.select(field_paths))
+
+    def start_at(self, c):
+        return self._wrap(self._target.start_at(_unwrap_cursor(c)))
+
+    def start_after(self, c):
+        return self._wrap(self._target.start_after(_unwrap_cursor(c)))
+
+    def end_at(self, c):
+        return self._wrap(self._target.end_at(_unwrap_cursor(c)))
+
+    def end_before(self, c):
+        return self._wrap(self._target.end_before(_unwrap_cursor(c)))
+
+    def stream(self, transaction=None, **kwargs):
+        if transaction is not None:
+            kwargs["transaction"] = _unwrap(transaction)
+        return _timed_stream(self._meter, "query", self._col_id, self._target.stream(**kwargs))
+
+    def get(self, transaction=None, **kwargs):
+        return list(self.stream(transaction, **kwargs))
+
+    def count(self, alias=None):
+        return MeteredAggregation(self._target.count(alias=alias), self._meter, self._col_id)
+
+    def sum(self, field_ref, alias=None):
+        return MeteredAggregation(self._target.sum(field_ref, alias=alias), self._meter, self._col_id)
+
+    def avg(self, field_ref, alias=None):
+        return MeteredAggregation(self._target.avg(field_ref, alias=alias), self._meter, self._col_id)
+
+    def get_partitions(self, partition_count, **kwargs):
+        t0 = time.perf_counter()
+        parts = list(self._target.get_partitions(partition_count, **kwargs))
+        self._meter.rpc("partitions", time.perf_counter() - t0)
+        self._meter.read(self._col_id, max(1, len(parts)))
+        return [MeteredPartition(p, self._meter, self._col_id) for p in parts]
+
+class MeteredPartition(_Proxy):
+    def __init__(self, target: Any, meter: Meter, col: str):
+        super().__init__(target, meter)
+        self._col_id = col
+
+    def query(self):
+        return MeteredQuery(self._target.query(), self._meter, self._col_id)
+
+class MeteredAggregation(_Proxy):
+    def __init__(self, target: Any, meter: Meter, col: str):
+        super().__init__(target, meter)
+        self._col_id = col
+
+    def _wrap(self, a):
+        return MeteredAggregation(a, self._meter, self._col_id)
+
+    def count(self, alias=None):
+        return self._wrap(self._target.count(alias=alias))
+
+    def sum(self, field_ref, alias=None):
+        return self._wrap(self._target.sum(field_ref, alias=alias))
+
+    def avg(self, field_ref, alias=None):
+        return self._wrap(self._target.avg(field_ref, alias=alias))
+
+    def get(self, transaction=None, **kwargs):
+        if transaction is not None:
+            kwargs["transaction"] = _unwrap(transaction)
+        t0 = time.perf_counter()
+        rows = self._target.get(**kwargs)
+        self._meter.rpc("aggregation", time.perf_counter() - t0)
+        # 1 leitura a cada 1000 entradas de índice; sem count() no pedido, conta o mínimo
+        n = max((int(r.value or 0) for row in rows for r in row if getattr(r, "alias", None) and isinstance(r.value, int)), default=0)
+        self._meter.read(self._col_id, max(1, math.ceil(n / 1000)))
+        return rows
+
+class MeteredDocument(_Proxy):
+    @property
+    def parent(self):
+        return MeteredCollection(self._target.parent, self._meter)
+
+    def collection(self, name):
+        return MeteredCollection(self._target.collection(name), self._meter)
+
+    def collections(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        cols = list(self._target.collections(*args, **kwargs))
+        self._meter.rpc("list", time.perf_counter() - t0)
+        self._meter.read(_collection_id(self._target.path), 1)
+        return [MeteredCollection(c, self._meter) for c in cols]
+
+    def get(self, field_paths=None, transaction=None, **kwargs):
+        kwargs = {**kwargs, "field_paths": field_paths}
+        if transaction is not None:
+            kwargs["transaction"] = _unwrap(transaction)
+        t0 = time.perf_counter()
+        snap = self._target.get(**kwargs)
+        self._meter.rpc("get", time.perf_counter() - t0)
+        self._meter.read(_collection_id(self._target.path), 1, doc_size(self._target.path, snap.to_dict()) if snap.exists else 0)
+        return MeteredSnapshot(snap, self._meter)
+
+    def _write(self, op: str, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = getattr(self._target, op)(*args, **kwargs)
+        self._meter.rpc("commit", time.perf_counter() - t0)
+        col = _collection_id(self._target.path)
+        if op == "delete":
+            self._meter.delete(col)
+        else:
+            self._meter.write(col, doc_size(self._target.path, args[0] if args else kwargs.get("document_data")))
+        return out
+
+    def set(self, *args, **kwargs):
+        return self._write("set", *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._write("update", *args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._write("create", *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._write("delete", *args, **kwargs)
+
+class MeteredCollection(MeteredQuery):
+    def __init__(self, target: Any, meter: Meter):
+        super().__init__(target, meter, target.id)
+
+    @property
+    def parent(self):
+        p = self._target.parent
+        return MeteredDocument(p, self._meter) if p is not None else None
+
+    def document(self, *args, **kwargs):
+        return MeteredDocument(self._target.document(*args, **kwargs), self._meter)
+
+    def add(self, document_data, *args, **kwargs):
+        t0 = time.perf_counter()
+        ts, ref = self._target.add(document_data, *args, **kwargs)
+        self._meter.rpc("commit", time.perf_counter() - t0)
+        self._meter.write(self._col_id, doc_size(ref.path, document_data))
+        return ts, MeteredDocument(ref, self._meter)
+
+    def list_documents(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        refs = list(self._target.list_documents(*args, **kwargs))
+        self._meter.rpc("list", time.perf_counter() - t0)
+        self._meter.read(self._col_id, max(1, len(refs)))
+        return [MeteredDocument(r, self._meter) for r in refs]
+
+class _PendingWrites(_Proxy):
+    """Base de lote/transação: registra as ops e só conta no commit."""
+
+    def __init__(self, target: Any, meter: Meter):
+        super().__init__(target, meter)
+        self._pending: List[tuple] = []
+
+    def _op(self, op: str, ref: Any, data: Any = None, *args, **kwargs):
+        ref = _unwrap(ref)
+        self._pending.append((op, ref.path, data))
+        getattr(self._target, op)(ref, *(() if op == "delete" else (data,)), *args, **kwargs)
+        return self
+
+    def set(self, reference, document_data, *args, **kwargs):
+        return self._op("set", reference, document_data, *args, **kwargs)
+
+    def update(self, reference, field_updates, *args, **kwargs):
+        return self._op("update", reference, field_updates, *args, **kwargs)
+
+    def create(self, reference, document_data, *args, **kwargs):
+        return self._op("create", reference, document_data, *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        return self._op("delete", reference, None, *args, **kwargs)
+
+    def _count(self) -> None:
+        pending, self._pending = self._pending, []
+        for op, path, data in pending:
+            if op == "delete":
+                self._meter.delete(_collection_id(path))
+            else:
+                self._meter.write(_collection_id(path), doc_size(path, data))
+
+class MeteredBatch(_PendingWrites):
+    def __len__(self) -> int:
+        return len(self._target)
+
+    def commit(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = self._target.commit(*args, **kwargs)
+        self._meter.rpc("commit", time.perf_counter() - t0)
+        self._count()
+        return out
+
+class MeteredTransaction(_PendingWrites):
+    """Transação: leituras contam no get (ou no ref.get(transaction=…)); escritas contam no _commit."""
+
+    def get(self, ref_or_query, **kwargs):
+        target = _unwrap(ref_or_query)
+        if isinstance(ref_or_query, MeteredDocument):
+            t0 = time.perf_counter()
+            snap = self._target.get(target, **kwargs)
+            self._meter.rpc("get", time.perf_counter() - t0)
+            self._meter.read(_collection_id(target.path), 1, doc_size(target.path, snap.to_dict()) if snap.exists else 0)
+            return MeteredSnapshot(snap, self._meter)
+        col = ref_or_query._col_id if isinstance(ref_or_query, MeteredQuery) else "(transação)"
+        return _timed_stream(self._meter, "query", col, self._target.get(target, **kwargs))
+
+    def _commit(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = self._target._commit(*args, **kwargs)
+        self._meter.rpc("commit", time.perf_counter() - t0)
+        self._count()
+        return out
+
+    def _rollback(self, *args, **kwargs):
+        self._pending = []
+        return self._target._rollback(*args, **kwargs)
+
+class MeteredBulkWriter(_Proxy):
+    """BulkWriter: conta cada op ao enfileirar; o tempo medido é do flush/close (o envio é em segundo plano)."""
+
+    def _op(self, op: str, ref: Any, *args, **kwargs):
+        ref = _unwrap(ref)
+        out = getattr(self._target, op)(ref, *args, **kwargs)
+        if op == "delete":
+            self._meter.delete(_collection_id(ref.path))
+        else:
+            self._meter.write(_collection_id(ref.path), doc_size(ref.path, args[0] if args else None))
+        return out
+
+    def set(self, reference, *args, **kwargs):
+        return self._op("set", reference, *args, **kwargs)
+
+    def update(self, reference, *args, **kwargs):
+        return self._op("update", reference, *args, **kwargs)
+
+    def create(self, reference, *args, **kwargs):
+        return self._op("create", reference, *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        return self._op("delete", reference, *args, **kwargs)
+
+    def flush(self):
+        t0 = time.perf_counter()
+        out = self._target.flush()
+        self._meter.rpc("bulk_writer", time.perf_counter() - t0)
+        return out
+
+    def close(self):
+        t0 = time.perf_counter()
+        out = self._target.close()
+        self._meter.rpc("bulk_writer", time.perf_counter() - t0)
+        return out
+
+class MeteredClient(_Proxy):
+    """Cliente Firestore medido: mesma API, tudo o que sai dele também é medido."""
+
+    def collection(self, *path):
+        return MeteredCollection(self._target.collection(*path), self._meter)
+
+    def document(self, *path):
+        return MeteredDocument(self._target.document(*path), self._meter)
+
+    def collection_group(self, collection_id):
+        return MeteredQuery(self._target.collection_group(collection_id), self._meter, collection_id)
+
+    def collections(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        cols = list(self._target.collections(*args, **kwargs))
+        self._meter.rpc("list", time.perf_counter() - t0)
+        self._meter.read("(raiz)", 1)
+        return [MeteredCollection(c, self._meter) for c in cols]
+
+    def batch(self):
+        return MeteredBatch(self._target.batch(), self._meter)
+
+    def transaction(self, *args, **kwargs):
+        return MeteredTransaction(self._target.transaction(*args, **kwargs), self._meter)
+
+    def bulk_writer(self, *args, **kwargs):
+        return MeteredBulkWriter(self._target.bulk_writer(*args, **kwargs), self._meter)
+
+    def get_all(self, references, field_paths=None, transaction=None, **kwargs):
+        refs = [_unwrap(r) for r in references]
+        if transaction is not None:
+            kwargs["transaction"] = _unwrap(transaction)
+        t0 = time.perf_counter()
+        snaps = list(self._target.get_all(refs, field_paths=field_paths, **kwargs))
+        self._meter.rpc("get_all", time.perf_counter() - t0)
+        per_col: Dict[str, List[int]] = {}
+        for s in snaps:
+            c = per_col.setdefault(_collection_id(s.reference.path), [0, 0])
+            c[0] += 1
+            c[1] += doc_size(s.reference.path, s.to_dict()) if s.exists else 0
+        for col, (n, nbytes) in per_col.items():
+            self._meter.read(col, n, nbytes)
+        return [MeteredSnapshot(s, self._meter) for s in snaps]
+
+    def recursive_delete(self, reference, *, bulk_writer=None, **kwargs):
+        bw = bulk_writer if isinstance(bulk_writer, MeteredBulkWriter) else self.bulk_writer() if bulk_writer is None \
+            else MeteredBulkWriter(bulk_writer, self._meter)
+        t0 = time.perf_counter()
+        n = self._target.recursive_delete(_unwrap(reference), bulk_writer=bw, **kwargs)
+        self._meter.rpc("recursive_delete", time.perf_counter() - t0)
+        self._meter.read(_collection_id(_unwrap(reference).path), max(1, n))  # a varredura lê cada doc apagado
+        return n
+
+# ---------- ligação com hidro_core / hidro.py ----------
+_meter: Optional[Meter] = None
+_meter_lock = threading.Lock()
+
+def load_prices(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+def current_meter() -> Optional[Meter]:
+    return _meter
+
+def install(client: Any) -> MeteredClient:
+    """Embrulha o cliente num MeteredClient com o Meter do processo (relatório no fim da execução)."""
+    global _meter
+    with _meter_lock:
+        if _meter is None:
+            _meter = Meter(load_prices(os.getenv("HIDRO_PRICES")))
+            atexit.register(_finish)
+    return MeteredClient(client, _meter)
+
+def _finish() -> None:
+    if _meter is None:
+        return
+    _meter.print_report()
+    out = os.getenv("HIDRO_METER_OUT")
+    if out:
+        Path(out).write_text(json.dumps(_meter.report(), ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"relatório de custo → {out}", file=sys.stderr)
+
+# ---------- profiling ----------
+class StackSampler:
+    """Amostra as pilhas de todas as threads a cada `interval_s` e grava no formato 'folded' (a;b;c N)."""
+
+    def __init__(self, interval_s: float = 0.005):
+        self.interval_s = interval_s
+        self.stacks: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    co = frame.f_code
+                    stack.append(f"{co.co_name} ({Path(co.co_filename).name}:{co.co_firstlineno})")
+                    frame = frame.f_back
+                if tid not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                key = ";".join([names.get(tid, str(tid))] + stack[::-1])
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, path: Path) -> None:
+        self._stop.set()
+        self._thread.join()
+        with path.open("w", encoding="utf-8") as f:
+            for stack, n in sorted(self.stacks.items()):
+                f.write(f"{stack} {n}\n")
+
+def run_profiled(path: Path, fn, *args) -> Any:
+    """
+    Roda fn(*args) sob profiling: .folded/.txt = pilhas amostradas (flamegraph.pl, speedscope, inferno);
+    outra extensão = cProfile/pstats (snakeviz, flameprof, gprof2dot), com o top 15 por tempo acumulado.
+    """
+    if path.suffix in (".folded", ".txt"):
+        sampler = StackSampler().start()
+        try:
+            return fn(*args)
+        finally:
+            sampler.stop(path)
+            print(f"pilhas amostradas ({sum(sampler.stacks.values())} amostras) → {path}", file=sys.stderr)
+    import cProfile
+    import pstats
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(fn, *args)
+    finally:
+        prof.dump_stats(str(path))
+        print(f"\ncProfile → {path}", file=sys.stderr)
+        pstats.Stats(prof, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
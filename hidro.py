@@ -0,0 +1,130 @@
+# python .\hidro.py --help
+# python .\hidro.py inspect --summary --limit 100
+# python .\hidro.py export --medidor MTR-000001 --start 2025-09-01 --end 2025-09-30 --csv
+# python .\hidro.py seed --mode bootstrap --xlsx Template_Carga_Firestore_v3.xlsx
+# python .\hidro.py bench-startup                 # mede a subida de cada comando (em subprocessos)
+# python .\hidro.py --meter export --csv          # + leituras/gravações/deletes, latência e custo (firestore_meter.py)
+# python .\hidro.py --profile export.prof export --csv   # cProfile (ou .folded: pilhas para flamegraph)
+#
+# Ponto de entrada único: cada comando é o main() do script correspondente, importado só quando
+# escolhido (os scripts continuam rodando sozinhos, ex.: python .\export_readings.py …).
+# Cliente Firestore, credenciais e emulador: ver hidro_core.py.
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import importlib
+from pathlib import Path
+from typing import Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# comando -> (módulo, descrição)
+COMMANDS = {
+    "seed": ("seed_firestore", "bootstrap via Excel, simulação e carga de leituras"),
+    "load-excel": ("load_from_excel", "carga inicial via Excel (ids automáticos)"),
+    "export": ("export_readings", "exporta leituras (CSV/JSONL/Parquet, resumo por agregação)"),
+    "inspect": ("teste_read_all", "inspeção paginada de medidores e leituras"),
+    "ingest": ("ingest_service", "serviço HTTP de ingestão dos ESP32 (FastAPI, micro-lotes)"),
+    "loadgen": ("loadgen", "carga em tempo real / soak test da ingestão (taxa, rajadas, quedas, duplicados)"),
+    "leak": ("leak_detector", "detecção incremental de vazamentos (f_flag_vazamento) e benchmark"),
+    "mirror": ("mirror_firestore", "espelho local SQLite (sync incremental) e consultas SQL"),
+    "archive": ("archive_firestore", "arquiva meses antigos em Parquet/JSONL e remove do Firestore"),
+    "pack": ("packed_days", "layout compacto (1 doc por medidor-dia): migração dos items"),
+    "bench": ("bench_suite", "benchmark de gravação, export e purge (fake em memória ou emulador)"),
+    "rollup": ("rollup_firestore", "agregados diários/mensais incrementais"),
+    "purge": ("purge_firestore", "apaga leituras e coleções raiz"),
+}
+
+# opção global -> (variável de ambiente, recebe valor?, descrição)
+GLOBAL_OPTS = {
+    "--meter": ("HIDRO_METER", False, "mede leituras/gravações/deletes, latência por RPC e custo estimado"),
+    "--meter-out": ("HIDRO_METER_OUT", True, "grava também o relatório de custo em JSON (implica --meter)"),
+    "--prices": ("HIDRO_PRICES", True, "JSON com a tabela de preços (USD por 100k ops)"),
+    "--profile": (None, True, "profiling do comando: .prof = cProfile, .folded = pilhas para flamegraph"),
+}
+
+def usage() -> str:
+    lines = ["uso: hidro.py [opções globais] <comando> [opções]   (hidro.py <comando> --help para as opções)", "", "comandos:"]
+    for name, (_, desc) in COMMANDS.items():
+        lines.append(f"  {name:14s}{desc}")
+    lines.append(f"  {'bench-startup':14s}mede o tempo de subida dos comandos")
+    lines += ["", "opções globais:"]
+    for opt, (_, takes, desc) in GLOBAL_OPTS.items():
+        lines.append(f"  {opt + (' ARQ' if takes else ''):18s}{desc}")
+    return "\n".join(lines)
+
+def parse_global(argv: list[str]) -> tuple[dict, list[str]]:
+    """Separa as opções globais (antes do comando) do resto."""
+    opts: dict = {}
+    while argv and argv[0] in GLOBAL_OPTS:
+        opt = argv.pop(0)
+        if GLOBAL_OPTS[opt][1]:
+            if not argv:
+                print(f"{opt} precisa de um valor", file=sys.stderr)
+                sys.exit(2)
+            opts[opt] = argv.pop(0)
+        else:
+            opts[opt] = "1"
+    return opts, argv
+
+# ---------- bench-startup ----------
+def _time_run(cmd: list[str], repeat: int) -> list[float]:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        out.append(time.perf_counter() - t0)
+    return out
+
+def bench_startup(argv: list[str]) -> None:
+    ap = argparse.ArgumentParser(prog="hidro.py bench-startup", description="Tempo de subida (processo novo até o fim do --help)")
+    ap.add_argument("--repeat", type=int, default=5, help="Execuções por caso (default 5)")
+    args = ap.parse_args(argv)
+
+    py = sys.executable
+    cases = [("python vazio", [py, "-c", "pass"])]
+    cases += [(f"hidro.py {name} --help", [py, "hidro.py", name, "--help"]) for name in COMMANDS]
+    # referência: o que cada comando pagava importando tudo no topo, e o que paga ao abrir o cliente
+    cases.append(("imports antigos (pandas + firebase_admin)", [py, "-c", "import pandas, firebase_admin.firestore"]))
+    cases.append(("1º uso do cliente (google.cloud.firestore)", [py, "-c", "from hidro_core import lazy_import; lazy_import('google.cloud.firestore').Client"]))
+
+    print(f"{'caso':48s} {'mín ms':>8s} {'mediana ms':>11s}")
+    for label, cmd in cases:
+        ts = _time_run(cmd, max(1, args.repeat))
+        print(f"{label:48s} {min(ts) * 1000:8.0f} {statistics.median(ts) * 1000:11.0f}")
+
+def main(argv: Optional[list[str]] = None) -> None:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    opts, argv = parse_global(argv)
+    for opt, value in opts.items():
+        env = GLOBAL_OPTS[opt][0]
+        if env:
+            os.environ[env] = value
+    if "--meter-out" in opts:
+        os.environ["HIDRO_METER"] = "1"
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return
+    cmd, rest = argv[0], argv[1:]
+    if cmd == "bench-startup":
+        bench_startup(rest)
+        return
+    if cmd not in COMMANDS:
+        print(f"comando desconhecido: {cmd}\n\n{usage()}", file=sys.stderr)
+        sys.exit(2)
+    sys.argv[0] = f"hidro.py {cmd}"  # prog do argparse do comando
+    entry = importlib.import_module(COMMANDS[cmd][0]).main
+    if "--profile" in opts:
+        from firestore_meter import run_profiled
+        run_profiled(Path(opts["--profile"]), entry, rest)
+    else:
+        entry(rest)
+
+if __name__ == "__main__":
+    main()
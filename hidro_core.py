@@ -0,0 +1,104 @@
+# Núcleo compartilhado pelos scripts (seed, export, purge, rollup, load_from_excel, inspeção):
+#   - get_db(): um cliente Firestore por processo, criado no primeiro uso e reaproveitado
+#       credencial: GOOGLE_APPLICATION_CREDENTIALS (.env ou ambiente; caminho relativo = relativo a
+#                   esta pasta) ou, sem ela, DEFAULT_JSON nesta pasta
+#       emulador:   com FIRESTORE_EMULATOR_HOST=localhost:8080 conecta no emulador, sem credencial
+#                   (projeto = GOOGLE_CLOUD_PROJECT ou EMULATOR_PROJECT)
+#       medição:    com HIDRO_METER=1 o cliente vem embrulhado no firestore_meter.MeteredClient
+#                   (leituras/gravações/deletes por coleção, latência por RPC, custo estimado no fim)
+#   - lazy_import(): módulos pesados (google.cloud.firestore, pandas, numpy…) só são carregados no
+#     primeiro acesso a um atributo; --help e comandos que não usam o módulo não pagam o import.
+#
+# Emulador (Firebase CLI):
+#   firebase emulators:start --only firestore
+#   set FIRESTORE_EMULATOR_HOST=localhost:8080        (PowerShell: $env:FIRESTORE_EMULATOR_HOST="localhost:8080")
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import importlib.util
+from pathlib import Path
+from types import ModuleType
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# usado quando não há GOOGLE_APPLICATION_CREDENTIALS (troque pelo nome exato do seu JSON)
+DEFAULT_JSON = "thermosafehidraulico-firebase-adminsdk-fbsvc-1f30ae4b7a.json"
+EMULATOR_PROJECT = "demo-hidro"
+
+_env_loaded = False
+_db = None
+_db_lock = threading.Lock()
+
+def lazy_import(name: str) -> ModuleType:
+    """Módulo com carga adiada (importlib LazyLoader); se já importado, devolve o próprio."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Módulo não encontrado: {name}")
+    if name in sys.modules:  # find_spec de um submódulo importa o pacote pai, que pode já tê-lo carregado
+        return sys.modules[name]
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+def preload(*modules: ModuleType) -> None:
+    """Carrega já os módulos lazy; chame antes de abrir threads (o LazyLoader só é thread-safe no Python ≥ 3.12.3)."""
+    for m in modules:
+        m.__dict__
+
+def load_env() -> None:
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def credentials_path() -> Path:
+    load_env()
+    cred_env = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "").strip()
+    if cred_env:
+        cred_path = Path(cred_env)
+        if not cred_path.is_absolute():
+            cred_path = (BASE_DIR / cred_path).resolve()
+    else:
+        cred_path = (BASE_DIR / DEFAULT_JSON).resolve()
+    if not cred_path.exists():
+        raise FileNotFoundError(f"Credencial não encontrada: {cred_path} (defina GOOGLE_APPLICATION_CREDENTIALS no .env)")
+    return cred_path
+
+def emulator_host() -> str | None:
+    load_env()
+    return os.getenv("FIRESTORE_EMULATOR_HOST", "").strip() or None
+
+def _new_client():
+    from google.cloud import firestore
+    if emulator_host():
+        # o cliente detecta FIRESTORE_EMULATOR_HOST sozinho (canal inseguro + credencial anônima)
+        return firestore.Client(project=os.getenv("GOOGLE_CLOUD_PROJECT") or EMULATOR_PROJECT)
+    from google.oauth2 import service_account
+    creds = service_account.Credentials.from_service_account_file(str(credentials_path()))
+    return firestore.Client(project=creds.project_id, credentials=creds)
+
+def metering_enabled() -> bool:
+    load_env()
+    return os.getenv("HIDRO_METER", "").strip().lower() in ("1", "true", "sim", "yes")
+
+def get_db():
+    """Cliente Firestore do processo (thread-safe; o cliente é reaproveitado por todas as threads)."""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                client = _new_client()
+                if metering_enabled():
+                    from firestore_meter import install
+                    client = install(client)
+                _db = client
+    return _db
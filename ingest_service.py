@@ -0,0 +1,488 @@
+# Serviço HTTP de ingestão das leituras dos ESP32 (FastAPI + asyncio), com micro-lotes no Firestore.
+#
+# python .\ingest_service.py --port 8080                        # ou: python .\hidro.py ingest --port 8080
+# uvicorn ingest_service:app --port 8080                         # config pelas variáveis INGEST_* abaixo
+#
+# POST /leituras   corpo = 1 leitura ou lista de leituras (mesmos nomes f_* do Firestore):
+#   {"f_medidor_id": "MTR-000001", "f_cliente_id": "CLI-000001", "f_ts_utc": "2025-09-18T12:00:00Z",
+#    "f_valor_m3": 0.012, "f_pulsos": 12, "f_status_sensor": 1, "f_flag_vazamento": false}
+#   201 → gravado (a resposta só sai depois do commit: o ESP32 pode descartar o que enviou)
+#   422 → leitura inválida ou medidor inexistente em t_medidor (nada do lote é aceito; não reenviar)
+#   503 → fila cheia (back-pressure) ou falha no commit; reenviar após Retry-After
+#   Entrega "pelo menos uma vez": no layout items cada micro-lote é um único commit (tudo ou nada), mas
+#   uma requisição pode cair em vários micro-lotes (faixas diferentes ou mais leituras que --batch-max);
+#   se só um deles falhar a resposta é 503 e o reenvio duplica as leituras que já tinham entrado.
+#   No layout dias o reenvio é idempotente (mesmo f_ts_utc é descartado).
+# GET /metrics     contadores, vazão e latências p50/p95/p99 (requisição→commit e por flush)
+# GET /healthz
+#
+# Como funciona: cada leitura vai para uma "faixa" (crc32(f_medidor_id) % --lanes) com fila limitada.
+# Cada faixa junta até --batch-max leituras ou --flush-ms de espera (limitado ao que cabe num WriteBatch)
+# e grava tudo com o BatchedReadingWriter do seed_firestore numa thread (items em WriteBatch, bucket
+# 1x por mês, f_last_*/f_monthly_total_m3 coalescidos por medidor).
+# Medidor sempre na mesma faixa => os updates de um medidor nunca concorrem entre si.
+# Medidores conferidos na chegada (get_all só das chaves; existentes ficam em cache, inexistentes por
+# UNKNOWN_TTL_S): um id desconhecido não derruba o micro-lote dos outros medidores da faixa.
+# Medidores "quentes" (rajadas de upload): --write-behind-s N tira os agregados do commit dos items e
+# grava 1 update por medidor a cada N s; --shards N espalha esses updates em t_medidor/{id}/t_shards
+# (ver meter_aggregates.py). O 201 continua saindo só depois do commit dos items.
+# --layout dias (INGEST_LAYOUT): acrescenta as leituras nos docs-dia t_leituras/{AAAA_MM}/dias/{DD}
+# (1 transação por medidor a cada flush; reenvio com o mesmo f_ts_utc é descartado), ver packed_days.py.
+# --leak-detect: f_flag_vazamento calculado na chegada pelo leak_detector (estado em memória, salvo em
+# --leak-state ao parar); episódios marcam/desmarcam as leituras anteriores (só no layout items) e resumem em t_medidor.
+#
+# Teste ponta a ponta no emulador:
+#   firebase emulators:start --only firestore
+#   set FIRESTORE_EMULATOR_HOST=localhost:8080   (PowerShell: $env:FIRESTORE_EMULATOR_HOST="localhost:8080")
+#   python .\ingest_service.py --port 8081
+#   curl -X POST localhost:8081/leituras -H "content-type: application/json" -d "{\"f_medidor_id\":\"MTR-000001\",\"f_ts_utc\":\"2025-09-18T12:00:00Z\",\"f_valor_m3\":0.012,\"f_pulsos\":12}"
+# (o medidor precisa existir em t_medidor: rode antes o seed --mode bootstrap no emulador)
+
+from __future__ import annotations
+
+import os
+import time
+import zlib
+import asyncio
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+try:
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+    from pydantic import BaseModel, Field, ValidationError, field_validator
+except ImportError as e:
+    raise RuntimeError("O serviço de ingestão requer fastapi e uvicorn: pip install fastapi uvicorn") from e
+
+from hidro_core import get_db, lazy_import, preload
+from leak_detector import FlagWriter, LeakDetector, load_state, save_state
+from meter_aggregates import MeterAggregator, missing_meters, ops_per_meter
+from seed_firestore import MAX_BATCH_OPS, month_bucket, new_reading_writer, packed_days
+
+gexc = lazy_import("google.api_core.exceptions")
+
+# config (variáveis de ambiente, para rodar via uvicorn; a CLI sobrescreve)
+FLUSH_MS = int(os.getenv("INGEST_FLUSH_MS", "200"))        # espera máxima para completar um micro-lote
+BATCH_MAX = int(os.getenv("INGEST_BATCH_MAX", "400"))      # leituras por micro-lote
+QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "20000"))    # leituras pendentes por faixa (back-pressure)
+LANES = int(os.getenv("INGEST_LANES", "4"))                # faixas = flushes em paralelo
+WRITE_BEHIND_S = float(os.getenv("INGEST_WRITE_BEHIND_S", "0"))  # agregados do medidor a cada N s (0 = junto com os items)
+SHARDS = int(os.getenv("INGEST_SHARDS", "0"))              # shards dos agregados do medidor (0 = no próprio doc)
+LAYOUT = os.getenv("INGEST_LAYOUT", "items")              # items (1 doc por leitura) ou dias (1 doc por medidor-dia)
+LEAK_DETECT = os.getenv("INGEST_LEAK_DETECT", "0") == "1"   # calcula f_flag_vazamento na chegada
+LEAK_STATE = os.getenv("INGEST_LEAK_STATE", "")             # arquivo de estado do detector (vazio = só em memória)
+MAX_PER_REQUEST = 1000
+MAX_FUTURE = timedelta(days=1)                             # tolerância para relógio adiantado do ESP32
+LATENCY_WINDOW = 10_000                                    # amostras guardadas para os percentis
+UNKNOWN_TTL_S = 60.0                                       # cache de medidor inexistente (novo cadastro vale depois disso)
+
+# ---------- Modelo ----------
+class Leitura(BaseModel):
+    f_medidor_id: str = Field(min_length=1, max_length=64)
+    f_cliente_id: Optional[str] = None
+    f_ts_utc: datetime
+    f_valor_m3: float = Field(ge=0)
+    f_pulsos: int = Field(ge=0)
+    f_status_sensor: int = 1
+    f_flag_vazamento: bool = False
+
+    @field_validator("f_medidor_id")
+    @classmethod
+    def _strip_id(cls, v: str) -> str:
+        v = v.strip()
+        if not v or "/" in v:
+            raise ValueError("f_medidor_id inválido")
+        return v
+
+    @field_validator("f_ts_utc")
+    @classmethod
+    def _utc(cls, v: datetime) -> datetime:
+        v = v.replace(tzinfo=timezone.utc) if v.tzinfo is None else v.astimezone(timezone.utc)
+        if v > datetime.now(timezone.utc) + MAX_FUTURE:
+            raise ValueError("f_ts_utc no futuro")
+        return v
+
+# ---------- Métricas ----------
+def percentiles(values: Any, ps: Tuple[float, ...] = (50, 95, 99)) -> Dict[str, Optional[float]]:
+    s = sorted(values)
+    if not s:
+        return {f"p{p:g}": None for p in ps}
+    return {f"p{p:g}": s[min(len(s) - 1, int(round(p / 100 * (len(s) - 1))))] for p in ps}
+
+class IngestMetrics:
+    """Contadores e janelas de latência (ms). Só mexido no event loop, sem lock."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.requests = 0
+        self.received = 0
+        self.committed = 0
+        self.rejected = 0       # requisições com 422 (payload inválido não tem nº de leituras confiável)
+        self.shed = 0           # 503 por fila cheia
+        self.failed = 0         # erro no commit
+        self.flushes = 0
+        self.request_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.flush_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.flush_sizes: Deque[int] = deque(maxlen=LATENCY_WINDOW)
+        self._recent: Deque[Tuple[float, int]] = deque()  # (instante, leituras commitadas) — último minuto
+
+    def on_commit(self, n: int, flush_ms: float) -> None:
+        now = time.perf_counter()
+        self.committed += n
+        self.flushes += 1
+        self.flush_ms.append(flush_ms)
+        self.flush_sizes.append(n)
+        self._recent.append((now, n))
+        while self._recent and self._recent[0][0] < now - 60:
+            self._recent.popleft()
+
+    def snapshot(self, queue_depth: int, aggregator: Optional[MeterAggregator] = None, leak_detector: Optional[LeakDetector] = None) -> Dict[str, Any]:
+        el = time.perf_counter() - self.t0
+        recent = sum(n for _, n in self._recent)
+        return {
+            "uptime_s": round(el, 1),
+            "requests": self.requests,
+            "readings_received": self.received,
+            "readings_committed": self.committed,
+            "requests_rejected": self.rejected,
+            "readings_shed": self.shed,
+            "readings_failed": self.failed,
+            "queue_depth": queue_depth,
+            "flushes": self.flushes,
+            "avg_flush_size": round(sum(self.flush_sizes) / len(self.flush_sizes), 1) if self.flush_sizes else None,
+            "throughput_rps_total": round(self.committed / el, 1) if el > 0 else 0.0,
+            "throughput_rps_1min": round(recent / min(60.0, el), 1) if el > 0 else 0.0,
+            "request_latency_ms": percentiles(self.request_ms),
+            "flush_latency_ms": percentiles(self.flush_ms),
+            "meter_aggregates": None if aggregator is None else {
+                "pending_meters": aggregator.pending_meters(),
+                "meter_updates": aggregator.total_meter_updates,
+                "commits": aggregator.total_commits,
+                "errors": aggregator.errors,
+                "dropped_meters": aggregator.dropped_meters,
+            },
+            "leak_detector": None if leak_detector is None else {
+                "meters": len(leak_detector.states),
+                "meters_leaking": sum(1 for st in list(leak_detector.states.values()) if st.leak),
+                "out_of_order": leak_detector.out_of_order,
+            },
+        }
+
+# ---------- Micro-lotes ----------
+class _Ticket:
+    """Uma requisição: libera a resposta quando todas as suas leituras foram commitadas."""
+
+    __slots__ = ("remaining", "future")
+
+    def __init__(self, n: int, loop: asyncio.AbstractEventLoop):
+        self.remaining = n
+        self.future = loop.create_future()
+
+    def done(self, n: int) -> None:
+        self.remaining -= n
+        if self.remaining <= 0 and not self.future.done():
+            self.future.set_result(None)
+
+    def fail(self, exc: BaseException) -> None:
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+_STOP = object()
+
+class _CommitBudget:
+    """Ops que um micro-lote usa no BatchedReadingWriter: item + bucket novo + agregados por medidor."""
+
+    def __init__(self, med_ops: int):
+        self.med_ops = med_ops
+        self.ops = 0
+        self._buckets: set = set()
+        self._meters: set = set()
+
+    def add(self, r: Leitura) -> bool:
+        """Reserva a leitura; False se ela não cabe mais no mesmo WriteBatch."""
+        b = (r.f_medidor_id, month_bucket(r.f_ts_utc))
+        cost = 1 + (b not in self._buckets) + (r.f_medidor_id not in self._meters) * self.med_ops
+        if self.ops + cost > MAX_BATCH_OPS:
+            return False
+        self.ops += cost
+        self._buckets.add(b)
+        self._meters.add(r.f_medidor_id)
+        return True
+
+class MicroBatcher:
+    """Faixas com fila limitada; cada faixa grava micro-lotes por tamanho ou janela de tempo."""
+
+    def __init__(self, db, lanes: int = LANES, batch_max: int = BATCH_MAX, flush_ms: int = FLUSH_MS,
+                 queue_max: int = QUEUE_MAX, metrics: Optional[IngestMetrics] = None,
+                 write_behind_s: float = WRITE_BEHIND_S, shards: int = SHARDS, leak_detector: Optional[LeakDetector] = None,
+                 layout: str = LAYOUT):
+        if layout not in ("items", "dias"):
+            raise ValueError(f"layout inválido: {layout} (use items ou dias)")
+        if layout == "dias":
+            preload(packed_days)  # lazy: carrega antes das threads das faixas
+        self.db = db
+        self.layout = layout
+        self.lanes = max(1, lanes)
+        self.batch_max = max(1, batch_max)
+        self.flush_s = flush_ms / 1000.0
+        self.queue_max = queue_max
+        self.metrics = metrics or IngestMetrics()
+        self.shards = max(0, shards)
+        self.aggregator = MeterAggregator(db, write_behind_s, self.shards) if write_behind_s > 0 else None
+        self.leak_detector = leak_detector
+        self._leak_lock = threading.Lock()
+        self._leak_retry: List[Dict[str, Any]] = []  # eventos cuja gravação falhou (qualquer faixa regrava)
+        self._known: set = set()                 # medidores que existem em t_medidor (só cresce)
+        self._unknown: Dict[str, float] = {}     # inexistentes -> validade (time.monotonic)
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._executor = ThreadPoolExecutor(max_workers=self.lanes, thread_name_prefix="ingest-flush")
+
+    def lane_of(self, f_medidor_id: str) -> int:
+        return zlib.crc32(f_medidor_id.encode("utf-8")) % self.lanes
+
+    def depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    async def start(self) -> None:
+        self._queues = [asyncio.Queue(maxsize=self.queue_max + 1) for _ in range(self.lanes)]  # +1: sentinela
+        self._tasks = [asyncio.create_task(self._lane_loop(i)) for i in range(self.lanes)]
+        if self.aggregator is not None:
+            self.aggregator.start()
+
+    async def stop(self) -> None:
+        """Grava o que estiver na fila e encerra as faixas."""
+        for q in self._queues:
+            await q.put(_STOP)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        if self.aggregator is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.aggregator.close)
+
+    async def unknown_meters(self, leituras: List[Leitura]) -> List[str]:
+        """Medidores da requisição que não existem em t_medidor (consulta só os que não estão em cache)."""
+        now = time.monotonic()
+        ids = {r.f_medidor_id for r in leituras} - self._known
+        missing = {mid for mid in ids if self._unknown.get(mid, 0.0) > now}
+        todo = sorted(ids - missing)
+        if todo:
+            gone = await asyncio.get_running_loop().run_in_executor(None, missing_meters, self.db, todo)
+            if len(self._unknown) > QUEUE_MAX:
+                self._unknown = {k: v for k, v in self._unknown.items() if v > now}
+            for mid in todo:
+                if mid in gone:
+                    self._unknown[mid] = now + UNKNOWN_TTL_S
+                    missing.add(mid)
+                else:
+                    self._known.add(mid)
+        return sorted(missing)
+
+    def submit(self, leituras: List[Leitura]) -> Optional[asyncio.Future]:
+        """Enfileira a requisição inteira ou nada (None = sem espaço). Sem await: atômico no event loop."""
+        by_lane: Dict[int, List[Leitura]] = {}
+        for r in leituras:
+            by_lane.setdefault(self.lane_of(r.f_medidor_id), []).append(r)
+        if any(self._queues[i].qsize() + len(rs) > self.queue_max for i, rs in by_lane.items()):
+            return None
+        ticket = _Ticket(len(leituras), asyncio.get_running_loop())
+        for i, rs in by_lane.items():
+            for r in rs:
+                self._queues[i].put_nowait((r, ticket))
+        return ticket.future
+
+    async def _lane_loop(self, lane: int) -> None:
+        q = self._queues[lane]
+        loop = asyncio.get_running_loop()
+        stopping = False
+        carry = None  # leitura que não coube no WriteBatch do micro-lote anterior
+        med_ops = 0 if self.aggregator is not None else ops_per_meter(self.shards)
+        while not stopping:
+            first = carry if carry is not None else await q.get()
+            carry = None
+            if first is _STOP:
+                return
+            items = [first]
+            # layout items: micro-lote = um único commit (tudo ou nada); dias faz 1 transação por medidor
+            budget = _CommitBudget(med_ops) if self.layout == "items" else None
+            if budget is not None:
+                budget.add(first[0])
+            deadline = loop.time() + self.flush_s
+            while len(items) < self.batch_max:
+                try:
+                    item = q.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(q.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                if budget is not None and not budget.add(item[0]):
+                    carry = item
+                    break
+                items.append(item)
+            await self._flush(items)
+
+    async def _flush(self, items: List[Tuple[Leitura, _Ticket]]) -> None:
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        try:
+            await loop.run_in_executor(self._executor, self._write, [r for r, _ in items])
+        except Exception as e:
+            if isinstance(e, gexc.NotFound):
+                # medidor removido depois de entrar no cache: o reenvio volta a ser conferido (→ 422)
+                self._known.difference_update(r.f_medidor_id for r, _ in items)
+            self.metrics.failed += len(items)
+            for _, t in items:
+                t.fail(e)
+            print(f"⚠️  flush falhou ({len(items)} leituras): {e}")
+            return
+        self.metrics.on_commit(len(items), (time.perf_counter() - t0) * 1000)
+        counts: Dict[int, Tuple[_Ticket, int]] = {}
+        for _, t in items:
+            counts[id(t)] = (t, counts.get(id(t), (t, 0))[1] + 1)
+        for t, n in counts.values():
+            t.done(n)
+
+    def _write(self, leituras: List[Leitura]) -> int:
+        # roda na thread da faixa: um writer por flush (os writers não são thread-safe)
+        w = new_reading_writer(self.db, MAX_BATCH_OPS, layout=self.layout, shards=self.shards, aggregator=self.aggregator)
+        det = self.leak_detector
+        events: List[Dict[str, Any]] = []
+        # o detector avança leitura a leitura: se o commit falhar, volta ao estado anterior (o reenvio
+        # do cliente é observado de novo em vez de cair como fora de ordem e perder o episódio)
+        snap = det.snapshot({r.f_medidor_id for r in leituras}) if det is not None else None
+        for r in leituras:
+            flag = r.f_flag_vazamento
+            if det is not None:
+                # medidor sempre na mesma faixa => o estado de um medidor só é tocado por esta thread
+                flag = det.observe(r.f_medidor_id, r.f_ts_utc, r.f_valor_m3, events) or flag
+            w.add(r.f_medidor_id, r.f_cliente_id, r.f_ts_utc, r.f_valor_m3, r.f_pulsos, r.f_status_sensor, flag)
+        try:
+            w.flush()
+        except Exception:
+            if snap is not None:
+                det.restore(snap)
+            raise
+        with self._leak_lock:
+            events, self._leak_retry = self._leak_retry + events, []
+        if events:
+            # depois do commit dos items, para a marcação retroativa enxergar as leituras deste lote;
+            # os items já entraram: falha aqui não vira 503, os eventos ficam para o próximo flush
+            try:
+                fw = FlagWriter(self.db)
+                fw.apply_events(events)
+                fw.flush()
+            except Exception as e:
+                with self._leak_lock:
+                    self._leak_retry = events + self._leak_retry
+                print(f"⚠️  episódios de vazamento: gravação falhou, nova tentativa no próximo flush ({e})")
+        return w.total_readings
+
+# ---------- App ----------
+def _parse_body(body: Any) -> List[Leitura]:
+    items = body if isinstance(body, list) else [body]
+    if not items:
+        raise ValueError("corpo vazio")
+    if len(items) > MAX_PER_REQUEST:
+        raise ValueError(f"máximo de {MAX_PER_REQUEST} leituras por requisição")
+    return [Leitura.model_validate(x) for x in items]
+
+def create_app(db=None, lanes: int = LANES, batch_max: int = BATCH_MAX, flush_ms: int = FLUSH_MS, queue_max: int = QUEUE_MAX,
+               write_behind_s: float = WRITE_BEHIND_S, shards: int = SHARDS,
+               leak_detect: bool = LEAK_DETECT, leak_state: str = LEAK_STATE, layout: str = LAYOUT) -> FastAPI:
+    """App FastAPI; `db` opcional (default: hidro_core.get_db() na subida)."""
+    state: Dict[str, MicroBatcher] = {}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        state_path = Path(leak_state).resolve() if leak_state else None
+        detector = LeakDetector.from_state(load_state(state_path) if state_path else None) if leak_detect else None
+        batcher = MicroBatcher(db if db is not None else get_db(), lanes, batch_max, flush_ms, queue_max,
+                               write_behind_s=write_behind_s, shards=shards, leak_detector=detector, layout=layout)
+        await batcher.start()
+        state["batcher"] = batcher
+        try:
+            yield
+        finally:
+            await batcher.stop()
+            if detector is not None and state_path:
+                save_state(state_path, detector.state_dict())
+
+    app = FastAPI(title="Ingestão de leituras", lifespan=lifespan)
+
+    @app.post("/leituras")
+    async def post_leituras(request: Request):
+        t0 = time.perf_counter()
+        batcher = state["batcher"]
+        m = batcher.metrics
+        m.requests += 1
+        try:
+            leituras = _parse_body(await request.json())
+        except ValidationError as e:
+            m.rejected += 1
+            return JSONResponse({"erro": "leitura inválida", "detalhes": e.errors(include_url=False, include_context=False)}, status_code=422)
+        except ValueError as e:
+            m.rejected += 1
+            return JSONResponse({"erro": str(e)}, status_code=422)
+        missing = await batcher.unknown_meters(leituras)
+        if missing:
+            m.rejected += 1
+            return JSONResponse({"erro": "medidor inexistente em t_medidor", "medidores": missing}, status_code=422)
+        m.received += len(leituras)
+        fut = batcher.submit(leituras)
+        if fut is None:
+            m.shed += len(leituras)
+            retry = max(1, int(round(batcher.flush_s * 5)))
+            return JSONResponse({"erro": "fila cheia, tente novamente"}, status_code=503, headers={"Retry-After": str(retry)})
+        try:
+            await fut
+        except Exception as e:
+            return JSONResponse({"erro": f"falha ao gravar: {e}"}, status_code=503, headers={"Retry-After": "5"})
+        m.request_ms.append((time.perf_counter() - t0) * 1000)
+        return JSONResponse({"gravadas": len(leituras)}, status_code=201)
+
+    @app.get("/metrics")
+    async def metrics():
+        b = state["batcher"]
+        return b.metrics.snapshot(b.depth(), b.aggregator, b.leak_detector)
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"ok": True}
+
+    return app
+
+app = create_app()
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Serviço HTTP de ingestão de leituras (micro-lotes no Firestore)")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--lanes", type=int, default=LANES, help=f"Faixas / flushes em paralelo (default {LANES})")
+    ap.add_argument("--batch-max", type=int, default=BATCH_MAX, help=f"Leituras por micro-lote (default {BATCH_MAX})")
+    ap.add_argument("--flush-ms", type=int, default=FLUSH_MS, help=f"Espera máxima para fechar um micro-lote (default {FLUSH_MS} ms)")
+    ap.add_argument("--queue-max", type=int, default=QUEUE_MAX, help=f"Leituras pendentes por faixa antes de responder 503 (default {QUEUE_MAX})")
+    ap.add_argument("--write-behind-s", type=float, default=WRITE_BEHIND_S, help="Grava f_last_*/f_monthly_total_m3 a cada N s, fora do commit dos items (default 0 = junto)")
+    ap.add_argument("--shards", type=int, default=SHARDS, help="Espalha os agregados do medidor em N shards (default 0 = no doc do medidor)")
+    ap.add_argument("--layout", choices=["items", "dias"], default=LAYOUT, help="items (1 doc por leitura) ou dias (1 doc por medidor-dia, ver packed_days.py)")
+    ap.add_argument("--leak-detect", action="store_true", default=LEAK_DETECT, help="Calcula f_flag_vazamento na chegada (leak_detector)")
+    ap.add_argument("--leak-state", default=LEAK_STATE, help="Arquivo de estado do detector, carregado na subida e salvo ao parar")
+    args = ap.parse_args(argv)
+    import uvicorn
+    uvicorn.run(create_app(None, args.lanes, args.batch_max, args.flush_ms, args.queue_max, args.write_behind_s, args.shards,
+                           args.leak_detect, args.leak_state, args.layout),
+                host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
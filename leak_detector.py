@@ -0,0 +1,561 @@
+# python .\leak_detector.py detect                                  # processa as leituras novas desde a última execução
+# python .\leak_detector.py detect --medidor MTR-000001 --start 2025-09-01 --dry-run
+# python .\leak_detector.py bench --medidores 2000 --days 30         # replay em dados simulados, sem Firestore
+# (ou: python .\hidro.py leak …; no serviço de ingestão: python .\ingest_service.py --leak-detect)
+#
+# Detecção incremental de vazamentos → f_flag_vazamento nas leituras + resumo do episódio em t_medidor.
+# Estado de tamanho fixo por medidor (LeakState), atualizado leitura a leitura, sem reler histórico:
+#   - volume por hora local (cada leitura cobre (leitura anterior, leitura]; o consumo acumulado numa
+#     queda de sensor é rateado pelas horas da queda)
+#   - vazão mínima noturna (NIGHT_HOURS, horário local) e sua linha de base (média móvel exponencial
+#     que desce rápido e sobe devagar, só atualizada fora de vazamento)
+#   - duração da vazão contínua: horas seguidas acima do limiar = base + max(LEAK_MIN_L_H, LEAK_REL × base),
+#     com os volumes das últimas RUN_HIST_H horas dessa corrida (tamanho limitado)
+# Um episódio abre quando a mínima da noite passa do limiar (a água não parou a noite toda) ou quando a
+# vazão fica acima dele por CONTINUOUS_H horas; fecha na primeira hora abaixo do limiar ou abaixo de
+# START_FRAC × a vazão estimada do vazamento.
+# A vazão do vazamento é estimada pelo excesso mínimo sobre a base (na noite ou na corrida) e o início,
+# pelo trecho final da corrida que sempre ficou acima dela (o uso diurno antes do vazamento não conta).
+# Ao abrir, as leituras desde esse início são marcadas (query por f_ts_utc nos buckets
+# do trecho); ao fechar, as da hora de fechamento são desmarcadas. O que chega depois já sai marcado.
+# No layout dias (packed_days) a marca vai na posição da leitura no array f_flag_vazamento do doc-dia.
+#
+# Em t_medidor/{id}: f_vazamento_ativo, f_vazamento_atual {f_inicio, f_deteccao, f_motivo} (episódio aberto),
+# f_vazamento_ultimo {f_inicio, f_fim, f_duracao_h, f_volume_m3, f_vazao_l_h, f_motivo}, f_qtd_vazamentos,
+# f_volume_vazamento_m3. Updates em WriteBatch (≤ 500 ops).
+# Estado entre execuções: --state (JSON, default .leak_state.json nesta pasta). O detect fecha o lote e
+# salva o estado logo após cada episódio e cada commit, então uma queda no meio não reprocessa episódios
+# já gravados (f_qtd_vazamentos/f_volume_vazamento_m3 são Increment; reaplicar flags é inofensivo);
+# resta só a janela entre o commit de um episódio e a gravação do arquivo.
+
+from __future__ import annotations
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from hidro_core import get_db, lazy_import
+from packed_days import DAYS_COL, day_start, parse_row_id, set_day_flags
+
+firestore = lazy_import("google.cloud.firestore")
+np = lazy_import("numpy")
+reading_generator = lazy_import("reading_generator")
+
+STATE_FILE = Path(__file__).resolve().parent / ".leak_state.json"
+MAX_BATCH_OPS = 500
+
+TZ_OFFSET_H = -3            # horário de Brasília (mesmo do reading_generator)
+NIGHT_HOURS = (1, 5)        # janela noturna local [01h, 05h)
+NIGHT_MIN_HOURS = 3         # horas observadas na janela para avaliar a noite
+WARMUP_NIGHTS = 2           # noites de aprendizado da base antes de abrir episódio pela mínima noturna
+LEAK_MIN_L_H = 4.0          # excesso mínimo sobre a base (L/h) para contar como vazão "anormal"
+LEAK_REL = 0.5              # … ou esta fração da base, o que for maior
+CONTINUOUS_H = 24           # horas seguidas acima do limiar para abrir episódio sem passar pela noite
+BASE_UP = 0.05              # peso da noite nova quando a mínima sobe (devagar)
+BASE_DOWN = 0.5             # … e quando desce (rápido)
+MAX_GAP_H = 24              # lacuna maior que isso: recomeça a vazão contínua (não dá para ratear)
+RUN_HIST_H = 48             # horas da corrida guardadas para estimar o início do vazamento
+START_FRAC = 0.85           # início = 1ª hora do trecho final com excesso ≥ START_FRAC × vazão do vazamento
+
+# ---------- Estado por medidor ----------
+class LeakState:
+    """Estado O(1) de um medidor. Horas são índices de hora local (epoch local // 3600)."""
+
+    __slots__ = ("last_s", "hour", "hour_vol", "base", "nights", "night_day", "night_min", "night_n",
+                 "run_start", "run_hist", "leak", "ep_start", "ep_detect", "ep_hours", "ep_flow", "ep_reason")
+
+    def __init__(self):
+        self.last_s: Optional[float] = None     # epoch (s) da última leitura aceita
+        self.hour: Optional[int] = None         # hora local em acumulação
+        self.hour_vol = 0.0                     # litros na hora em acumulação
+        self.base: Optional[float] = None       # base da mínima noturna (L/h)
+        self.nights = 0
+        self.night_day: Optional[int] = None
+        self.night_min = 0.0
+        self.night_n = 0
+        self.run_start: Optional[int] = None    # 1ª hora da vazão contínua acima do limiar
+        self.run_hist: List[float] = []         # litros/h das últimas RUN_HIST_H horas da corrida
+        self.leak = False
+        self.ep_start: Optional[int] = None
+        self.ep_detect: Optional[float] = None
+        self.ep_hours = 0
+        self.ep_flow = 0.0                      # vazão estimada do vazamento (L/h acima da base)
+        self.ep_reason: Optional[str] = None
+
+    def to_list(self) -> List[Any]:
+        return [getattr(self, k) for k in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values: List[Any]) -> "LeakState":
+        st = cls()
+        for k, v in zip(cls.__slots__, values):
+            setattr(st, k, v)
+        return st
+
+def _hour_dt(h: int) -> datetime:
+    """Início (UTC) da hora local h."""
+    return datetime.fromtimestamp(h * 3600 - TZ_OFFSET_H * 3600, tz=timezone.utc)
+
+def _dt(s: float) -> datetime:
+    return datetime.fromtimestamp(s, tz=timezone.utc)
+
+# ---------- Detector ----------
+class LeakDetector:
+    """
+    observe() por leitura, em ordem de f_ts_utc por medidor; devolve o flag daquela leitura.
+    Aberturas/fechamentos de episódio vão para `events` (ou para a lista passada a observe()).
+    Medidores diferentes podem ser observados em threads diferentes; o mesmo medidor, não.
+    """
+
+    def __init__(self, states: Optional[Dict[str, LeakState]] = None):
+        self.states: Dict[str, LeakState] = states or {}
+        self.events: List[Dict[str, Any]] = []
+        self.readings = 0
+        self.out_of_order = 0
+
+    # estado (checkpoint JSON)
+    def state_dict(self) -> Dict[str, Any]:
+        return {"version": 1, "medidores": {mid: st.to_list() for mid, st in self.states.items()}}
+
+    @classmethod
+    def from_state(cls, d: Optional[Dict[str, Any]]) -> "LeakDetector":
+        meds = (d or {}).get("medidores") or {}
+        return cls({mid: LeakState.from_list(v) for mid, v in meds.items()})
+
+    def last_ts(self, f_medidor_id: str) -> Optional[datetime]:
+        st = self.states.get(f_medidor_id)
+        return _dt(st.last_s) if st and st.last_s is not None else None
+
+    def snapshot(self, f_medidor_ids: Iterable[str]) -> Dict[str, Optional[List[Any]]]:
+        """Cópia do estado destes medidores (None = sem estado), para restore() se a gravação falhar."""
+        out: Dict[str, Optional[List[Any]]] = {}
+        for mid in f_medidor_ids:
+            st = self.states.get(mid)
+            out[mid] = None if st is None else [list(v) if isinstance(v, list) else v for v in st.to_list()]
+        return out
+
+    def restore(self, snap: Dict[str, Optional[List[Any]]]) -> None:
+        """Volta os medidores ao snapshot(): o reenvio das mesmas leituras é observado de novo."""
+        for mid, values in snap.items():
+            if values is None:
+                self.states.pop(mid, None)
+            else:
+                self.states[mid] = LeakState.from_list(values)
+
+    def drain(self) -> List[Dict[str, Any]]:
+        evs, self.events = self.events, []
+        return evs
+
+    def observe(self, f_medidor_id: str, ts: datetime, valor_m3: float, events: Optional[List[Dict[str, Any]]] = None) -> bool:
+        return self.observe_s(f_medidor_id, ts.timestamp(), valor_m3, events)
+
+    def observe_s(self, f_medidor_id: str, t: float, valor_m3: float, events: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """Como observe(), com o instante em epoch (s). Leitura fora de ordem é ignorada (flag atual)."""
+        st = self.states.get(f_medidor_id)
+        if st is None:
+            st = self.states[f_medidor_id] = LeakState()
+        out = self.events if events is None else events
+        liters = float(valor_m3 or 0.0) * 1000.0
+        prev = st.last_s
+        if prev is not None and t <= prev:
+            self.out_of_order += 1
+            return st.leak
+        self.readings += 1
+        h = int((t + TZ_OFFSET_H * 3600) // 3600)
+        if prev is None or t - prev > MAX_GAP_H * 3600:
+            if prev is not None:
+                self._reset_run(st, f_medidor_id, out)
+            self._add(st, f_medidor_id, h, liters, out)
+        else:
+            hp = int((prev + TZ_OFFSET_H * 3600) // 3600)
+            if hp == h:
+                self._add(st, f_medidor_id, h, liters, out)
+            else:
+                # rateia pelo tempo em cada hora do intervalo (prev, t]
+                span = t - prev
+                local_prev = prev + TZ_OFFSET_H * 3600
+                for hh in range(hp, h + 1):
+                    a = max(local_prev, hh * 3600.0)
+                    b = min(local_prev + span, (hh + 1) * 3600.0)
+                    self._add(st, f_medidor_id, hh, liters * max(0.0, b - a) / span, out)
+        st.last_s = t
+        return st.leak
+
+    def _threshold(self, st: LeakState) -> Optional[float]:
+        if st.base is None:
+            return None
+        return st.base + max(LEAK_MIN_L_H, LEAK_REL * st.base)
+
+    def _add(self, st: LeakState, mid: str, h: int, liters: float, out: List[Dict[str, Any]]) -> None:
+        if st.hour is None:
+            st.hour = h
+        elif h != st.hour:
+            self._close_hour(st, mid, st.hour, st.hour_vol, out)
+            st.hour, st.hour_vol = h, 0.0
+        st.hour_vol += liters
+
+    def _close_hour(self, st: LeakState, mid: str, h: int, vol: float, out: List[Dict[str, Any]]) -> None:
+        thr = self._threshold(st)
+        if st.leak and vol - st.base < START_FRAC * st.ep_flow:
+            # hora abaixo do que o vazamento sozinho daria: acabou (mesmo com uso normal acima do limiar)
+            self._close(st, mid, h, out)
+            st.run_start, st.run_hist = None, []
+        if thr is not None and vol > thr:
+            if st.run_start is None:
+                st.run_start, st.run_hist = h, []
+            st.run_hist.append(vol)
+            if len(st.run_hist) > RUN_HIST_H:
+                del st.run_hist[0]
+            if st.leak:
+                st.ep_hours += 1
+            elif h - st.run_start + 1 >= CONTINUOUS_H:
+                self._open(st, mid, h, "vazao_continua", min(st.run_hist[-CONTINUOUS_H:]) - st.base, out)
+        else:
+            if st.leak:
+                self._close(st, mid, h, out)
+            st.run_start, st.run_hist = None, []
+
+        hod, day = h % 24, h // 24
+        if NIGHT_HOURS[0] <= hod < NIGHT_HOURS[1]:
+            if st.night_day != day:
+                st.night_day, st.night_min, st.night_n = day, vol, 0
+            st.night_min = min(st.night_min, vol)
+            st.night_n += 1
+            if hod == NIGHT_HOURS[1] - 1 and st.night_n >= NIGHT_MIN_HOURS:
+                self._end_night(st, mid, h, out)
+
+    def _end_night(self, st: LeakState, mid: str, h: int, out: List[Dict[str, Any]]) -> None:
+        nmf = st.night_min
+        if st.base is None:
+            st.base, st.nights = nmf, 1
+            return
+        thr = self._threshold(st)
+        if not st.leak and st.nights >= WARMUP_NIGHTS and nmf > thr and st.run_start is not None:
+            self._open(st, mid, h, "vazao_minima_noturna", nmf - st.base, out)
+        if not st.leak:
+            st.base += (BASE_DOWN if nmf < st.base else BASE_UP) * (nmf - st.base)
+            st.nights += 1
+
+    def _open(self, st: LeakState, mid: str, h: int, reason: str, flow: float, out: List[Dict[str, Any]]) -> None:
+        lvl = st.base + START_FRAC * flow
+        n = 0
+        for vol in reversed(st.run_hist):
+            if vol < lvl:
+                break
+            n += 1
+        st.leak = True
+        st.ep_start = h - max(1, n) + 1
+        st.ep_detect = (h + 1) * 3600 - TZ_OFFSET_H * 3600
+        st.ep_hours = max(1, n)
+        st.ep_flow = flow
+        st.ep_reason = reason
+        out.append({
+            "tipo": "inicio", "f_medidor_id": mid, "f_inicio": _hour_dt(st.ep_start),
+            "f_deteccao": _dt(st.ep_detect), "f_motivo": reason,
+        })
+
+    def _close(self, st: LeakState, mid: str, h: int, out: List[Dict[str, Any]]) -> None:
+        out.append({
+            "tipo": "fim", "f_medidor_id": mid, "f_inicio": _hour_dt(st.ep_start), "f_fim": _hour_dt(h),
+            "f_deteccao": _hour_dt(h + 1), "f_motivo": st.ep_reason, "f_duracao_h": st.ep_hours,
+            "f_volume_m3": round(st.ep_flow * st.ep_hours / 1000.0, 6),
+            "f_vazao_l_h": round(st.ep_flow, 3),
+        })
+        st.leak = False
+        st.ep_start = st.ep_detect = st.ep_reason = None
+        st.ep_hours, st.ep_flow = 0, 0.0
+
+    def _reset_run(self, st: LeakState, mid: str, out: List[Dict[str, Any]]) -> None:
+        """Lacuna longa: fecha a hora aberta e recomeça a corrida (episódio aberto termina na lacuna)."""
+        if st.hour is not None:
+            self._close_hour(st, mid, st.hour, st.hour_vol, out)
+        if st.leak:
+            self._close(st, mid, st.hour + 1, out)
+        st.hour, st.hour_vol = None, 0.0
+        st.run_start, st.run_hist = None, []
+
+def flag_ranges(events: Iterable[Dict[str, Any]]) -> Iterable[Tuple[str, datetime, datetime, bool]]:
+    """(f_medidor_id, de, até, flag) das leituras a corrigir por evento: marca o início, desmarca o fecho."""
+    for ev in events:
+        if ev["tipo"] == "inicio":
+            yield ev["f_medidor_id"], ev["f_inicio"], ev["f_deteccao"], True
+        else:
+            yield ev["f_medidor_id"], ev["f_fim"], ev["f_deteccao"], False
+
+# ---------- Gravação ----------
+def month_buckets(start_dt: datetime, end_dt: datetime) -> List[str]:
+    y, m = start_dt.year, start_dt.month
+    out = []
+    while (y, m) <= (end_dt.year, end_dt.month):
+        out.append(f"{y:04d}_{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+class FlagWriter:
+    """
+    Updates de f_flag_vazamento (por caminho do doc, sem repetir o mesmo doc no lote) e resumo do
+    episódio em t_medidor, em WriteBatch de até batch_size ops. Não é thread-safe.
+    Leituras de docs-dia (layout dias) mudam a posição do array f_flag_vazamento, numa transação por
+    doc-dia gravada antes do lote (reaplicar é inofensivo se o lote falhar).
+    """
+
+    def __init__(self, db, batch_size: int = MAX_BATCH_OPS, dry_run: bool = False):
+        self.db = db
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self._flags: Dict[str, bool] = {}
+        self._days: Dict[str, Dict[int, bool]] = {}  # caminho do doc-dia -> {segundos do dia: flag}
+        self._meters: List[Tuple[str, Dict[str, Any]]] = []
+        self.docs_updated = 0
+        self.docs_read = 0
+        self.commits = 0
+
+    def _pending(self) -> int:
+        return len(self._flags) + len(self._days) + len(self._meters)
+
+    def set_doc(self, path: str, flag: bool) -> None:
+        self._flags[path] = flag
+        if self._pending() >= self.batch_size:
+            self.flush()
+
+    def set_day(self, path: str, offset_s: int, flag: bool) -> None:
+        self._days.setdefault(path, {})[offset_s] = flag
+        if self._pending() >= self.batch_size:
+            self.flush()
+
+    def set_reading(self, f_medidor_id: str, ts: datetime, doc_id: str, flag: bool) -> None:
+        bucket = f"t_medidor/{f_medidor_id}/t_leituras/{ts.year:04d}_{ts.month:02d}"
+        row = parse_row_id(doc_id)
+        if row is not None:
+            self.set_day(f"{bucket}/{DAYS_COL}/{row[0]:02d}", row[1], flag)
+        else:
+            self.set_doc(f"{bucket}/items/{doc_id}", flag)
+
+    def set_range(self, f_medidor_id: str, start: datetime, end: datetime, flag: bool) -> int:
+        """Marca/desmarca as leituras do medidor com f_ts_utc em [start, end] (só chaves são lidas)."""
+        n = 0
+        med = self.db.collection("t_medidor").document(f_medidor_id)
+        for b in month_buckets(start, end):
+            q = (med.collection("t_leituras").document(b).collection("items")
+                 .where("f_ts_utc", ">=", start).where("f_ts_utc", "<=", end).select([]))
+            for snap in q.stream():
+                self.set_doc(snap.reference.path, flag)
+                n += 1
+            dq = (med.collection("t_leituras").document(b).collection(DAYS_COL)
+                  .where("f_dia", ">=", day_start(start)).where("f_dia", "<=", end).select(["f_dia", "f_offsets_s"]))
+            for snap in dq.stream():
+                d = snap.to_dict() or {}
+                for off in d.get("f_offsets_s") or []:
+                    if start <= d["f_dia"] + timedelta(seconds=off) <= end:
+                        self.set_day(snap.reference.path, off, flag)
+                        n += 1
+        self.docs_read += n
+        return n
+
+    def record_episode(self, ev: Dict[str, Any]) -> None:
+        if ev["tipo"] == "inicio":
+            upd = {"f_vazamento_ativo": True,
+                   "f_vazamento_atual": {k: ev[k] for k in ("f_inicio", "f_deteccao", "f_motivo")}}
+        else:
+            ultimo = {k: ev[k] for k in ("f_inicio", "f_fim", "f_duracao_h", "f_volume_m3", "f_vazao_l_h", "f_motivo")}
+            upd = {"f_vazamento_ativo": False, "f_vazamento_atual": firestore.DELETE_FIELD, "f_vazamento_ultimo": ultimo,
+                   "f_qtd_vazamentos": firestore.Increment(1), "f_volume_vazamento_m3": firestore.Increment(ev["f_volume_m3"])}
+        self._meters.append((ev["f_medidor_id"], upd))
+        if self._pending() >= self.batch_size:
+            self.flush()
+
+    def apply_events(self, events: Iterable[Dict[str, Any]]) -> None:
+        events = list(events)
+        for mid, a, b, flag in flag_ranges(events):
+            self.set_range(mid, a, b, flag)
+        for ev in events:
+            self.record_episode(ev)
+
+    def flush(self) -> int:
+        n = self._pending()
+        if not n:
+            return 0
+        if not self.dry_run:
+            for path, flags in self._days.items():
+                set_day_flags(self.db, self.db.document(path), flags)
+                self.commits += 1
+            if self._flags or self._meters:
+                batch = self.db.batch()
+                for path, flag in self._flags.items():
+                    batch.update(self.db.document(path), {"f_flag_vazamento": flag})
+                for mid, upd in self._meters:
+                    batch.update(self.db.collection("t_medidor").document(mid), upd)
+                batch.commit()
+                self.commits += 1
+        self.docs_updated += len(self._flags) + sum(len(f) for f in self._days.values())
+        self._flags, self._days, self._meters = {}, {}, []
+        return n
+
+# ---------- Estado em disco ----------
+def load_state(path: Path) -> Optional[Dict[str, Any]]:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return None
+
+def save_state(path: Path, state: Dict[str, Any]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+# ---------- Comandos ----------
+def cmd_detect(db, state_path: Path, medidores: Optional[List[str]], start: Optional[datetime], end: Optional[datetime],
+               clear: bool = False, dry_run: bool = False, workers: int = 8, reset: bool = False) -> None:
+    from export_readings import iter_items_bucketed
+    det = LeakDetector.from_state(None if reset else load_state(state_path))
+    # cada medidor retoma da sua última leitura vista (a própria é relida e pulada); medidor ainda sem
+    # estado (cadastro novo ou checkpoint no meio da execução anterior) é lido desde --start/o início
+    if medidores is None:
+        medidores = sorted(s.id for s in db.collection("t_medidor").select([]).stream())
+    lasts = {m: det.last_ts(m) for m in medidores}
+    starts = {m: t for m, t in lasts.items() if t is not None}
+    novos = len(medidores) - len(starts)
+    print(f"→ Detecção de vazamentos ({len(starts)} medidores retomando do estado, {novos} desde "
+          f"{start.isoformat() if start else 'o início'})")
+    writer = FlagWriter(db, dry_run=dry_run)
+    fields = ["f_valor_m3", "f_flag_vazamento", "_doc_id"]
+    t0 = time.perf_counter()
+    lidas = abertos = fechados = 0
+    for row in iter_items_bucketed(db, start, end, medidores, fields=fields, workers=workers, starts=starts):
+        mid, ts = row.get("f_medidor_id"), row.get("f_ts_utc")
+        if not mid or not isinstance(ts, datetime):
+            continue
+        last = det.last_ts(mid)
+        if last is not None and ts <= last:
+            continue
+        commits = writer.commits
+        evs: List[Dict[str, Any]] = []
+        flag = det.observe(mid, ts, row.get("f_valor_m3") or 0.0, evs)
+        lidas += 1
+        if flag != bool(row.get("f_flag_vazamento")) and (flag or clear):
+            writer.set_reading(mid, ts, row["_doc_id"], flag)
+        for ev in evs:
+            if ev["tipo"] == "inicio":
+                abertos += 1
+                print(f"   ⚠️  {mid}: vazamento desde {ev['f_inicio']:%Y-%m-%d %H:%M} ({ev['f_motivo']})")
+            else:
+                fechados += 1
+                print(f"   ✔ {mid}: fim {ev['f_fim']:%Y-%m-%d %H:%M}, {ev['f_duracao_h']} h, {ev['f_volume_m3']:.3f} m³")
+        if evs:
+            writer.apply_events(evs)
+        if not dry_run and (evs or writer.commits != commits):
+            # episódio (Increment) ou commit nesta leitura: grava o resto dela e o estado logo em seguida,
+            # para nenhum commit com episódio ficar atrás do checkpoint
+            writer.flush()
+            save_state(state_path, det.state_dict())
+        if lidas % 100_000 == 0:
+            print(f"   … {lidas} leituras ({lidas / (time.perf_counter() - t0):.0f}/s)")
+    writer.flush()
+    if not dry_run:
+        save_state(state_path, det.state_dict())
+    el = time.perf_counter() - t0
+    ativos = sum(1 for st in det.states.values() if st.leak)
+    print(f"✅ {lidas} leituras em {el:.1f}s: {abertos} episódios abertos, {fechados} fechados, {ativos} em aberto; "
+          f"{writer.docs_updated} leituras atualizadas" + (" [dry-run]" if dry_run else ""))
+
+def _runs(mask) -> List[Tuple[int, int]]:
+    """Trechos [a, b) de True num array booleano."""
+    d = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(d == 1).tolist(), np.flatnonzero(d == -1).tolist()))
+
+def cmd_bench(medidores: int, days: int, step_min: int, leaks_per_month: float, dropouts_per_month: float, seed: int) -> None:
+    """Replay de séries simuladas (reading_generator) pelo detector, comparando com os vazamentos injetados."""
+    t1 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    t0 = t1 - timedelta(days=days)
+    print(f"→ Gerando {medidores} medidores × {days} dias a cada {step_min} min …")
+    series = []
+    for i in range(medidores):
+        mid = f"MTR-{i + 1:06d}"
+        s = reading_generator.generate_series(mid, t0, t1, step_min, reading_generator.meter_rng(seed, mid),
+                                             leaks_per_month=leaks_per_month, dropouts_per_month=dropouts_per_month)
+        series.append((mid, s["ts"].astype("datetime64[s]").astype(np.int64).tolist(), s["valor_m3"].tolist(), s["vazamento"]))
+    total = sum(len(ts) for _, ts, _, _ in series)
+
+    det = LeakDetector()
+    t_start = time.perf_counter()
+    flags_by_med = []
+    for mid, ts, vals, _ in series:
+        observe = det.observe_s
+        flags_by_med.append([observe(mid, t, v) for t, v in zip(ts, vals)])
+    el = time.perf_counter() - t_start
+    state_bytes = sum(sys.getsizeof(st) + sum(sys.getsizeof(getattr(st, k)) for k in LeakState.__slots__) for st in det.states.values())
+
+    # aplica as correções retroativas dos eventos, como o FlagWriter faria no Firestore
+    index = {mid: k for k, (mid, _, _, _) in enumerate(series)}
+    flags = [np.array(f, dtype=bool) for f in flags_by_med]
+    for mid, a, b, flag in flag_ranges(det.events):
+        k = index[mid]
+        ts = np.asarray(series[k][1])
+        flags[k][(ts >= a.timestamp()) & (ts <= b.timestamp())] = flag
+
+    tp = fp = fn = 0
+    delays: List[float] = []
+    found = missed = 0
+    first_detect = {}
+    for ev in det.events:
+        if ev["tipo"] == "inicio":
+            first_detect.setdefault(ev["f_medidor_id"], []).append(ev["f_deteccao"].timestamp())
+    for (mid, ts, _, truth), pred in zip(series, flags):
+        tp += int((truth & pred).sum())
+        fp += int((~truth & pred).sum())
+        fn += int((truth & ~pred).sum())
+        ts_arr = np.asarray(ts)
+        for a, b in _runs(truth):
+            if pred[a:b].any():
+                found += 1
+                dets = [d for d in first_detect.get(mid, []) if ts_arr[a] <= d <= ts_arr[b - 1] + 3600]
+                if dets:
+                    delays.append((min(dets) - ts_arr[a]) / 3600)
+            else:
+                missed += 1
+
+    episodes = sum(1 for ev in det.events if ev["tipo"] == "inicio")
+    prec = tp / (tp + fp) if tp + fp else 0.0
+    rec = tp / (tp + fn) if tp + fn else 0.0
+    print(f"   {total} leituras em {el:.2f}s → {total / el:,.0f} leituras/s "
+          f"(≈ {total / el * step_min * 60:,.0f} medidores a cada {step_min} min em 1 núcleo)")
+    print(f"   estado: {state_bytes / 1024:.0f} KiB ({state_bytes / max(1, medidores):.0f} B/medidor, independe do histórico)")
+    print(f"   episódios detectados: {episodes}; vazamentos injetados: {found + missed} ({found} achados, {missed} perdidos)")
+    if delays:
+        print(f"   atraso de detecção: mediana {statistics.median(delays):.1f} h, máx {max(delays):.1f} h")
+    print(f"   por leitura: precisão {prec:.3f}, recall {rec:.3f} (falsos positivos {fp}, não marcadas {fn})")
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Detecção incremental de vazamentos (f_flag_vazamento + resumo em t_medidor)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    d = sub.add_parser("detect", help="Processa as leituras novas do Firestore e grava flags/episódios")
+    d.add_argument("--medidor", action="append", help="Só estes medidores (pode repetir)")
+    d.add_argument("--start", help="Início (UTC) YYYY-MM-DD ou YYYY-MM-DDTHH:MM:SS (default: retoma do estado)")
+    d.add_argument("--end", help="Fim (UTC)")
+    d.add_argument("--state", default=str(STATE_FILE), help=f"Estado dos medidores entre execuções (default {STATE_FILE.name})")
+    d.add_argument("--reset", action="store_true", help="Ignora o estado salvo (recomeça o aprendizado da base)")
+    d.add_argument("--clear", action="store_true", help="Também desmarca leituras com f_flag_vazamento=True fora de episódio")
+    d.add_argument("--dry-run", action="store_true", help="Só detecta e mostra os episódios, sem gravar nada")
+    d.add_argument("--workers", type=int, default=8, help="Buckets lidos em paralelo (default 8)")
+    b = sub.add_parser("bench", help="Replay de dados simulados pelo detector (sem Firestore)")
+    b.add_argument("--medidores", type=int, default=1000, help="Medidores simulados (default 1000)")
+    b.add_argument("--days", type=int, default=30, help="Dias por medidor (default 30)")
+    b.add_argument("--step", type=int, default=5, help="Minutos entre leituras (default 5)")
+    b.add_argument("--leaks-per-month", type=float, default=1.0, help="Vazamentos injetados por medidor/mês (default 1)")
+    b.add_argument("--dropouts-per-month", type=float, default=1.0, help="Quedas de sensor por medidor/mês (default 1)")
+    b.add_argument("--seed", type=int, default=42, help="Semente do gerador (default 42)")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "bench":
+        cmd_bench(args.medidores, args.days, args.step, args.leaks_per_month, args.dropouts_per_month, args.seed)
+        return
+    from export_readings import parse_dt
+    cmd_detect(get_db(), Path(args.state).resolve(), args.medidor, parse_dt(args.start), parse_dt(args.end),
+               args.clear, args.dry_run, args.workers, args.reset)
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,12 @@
 from __future__ import annotations
-import os
+import argparse
 from pathlib import Path
 from typing import Optional, Dict, Any
 from datetime import datetime, timezone
-import pandas as pd
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
+from hidro_core import get_db
+from cadastro_io import ValidationReport, default_report_path, iter_cadastro_batches
 
-def init_db():
-    load_dotenv()
-    cred_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "").strip()
-    if not cred_path:
-        raise RuntimeError("Defina GOOGLE_APPLICATION_CREDENTIALS no .env")
-    cred_path = str(Path(cred_path).resolve())
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(credentials.Certificate(cred_path))
-    return firestore.client()
+MAX_BATCH_OPS = 500
 
 def now_utc(): return datetime.now(timezone.utc)
 
@@ -25,18 +15,17 @@ def coerce_bool(x):
     s = str(x).strip().lower()
     return s in ("true","1","sim","yes","y","t")
 
-def load_xlsx(path: Path) -> Dict[str, pd.DataFrame]:
-    xls = pd.ExcelFile(path)
-    dfs = {}
-    for sheet in ["t_localizacao","t_condominio","t_cliente","t_medidor"]:
-        if sheet in xls.sheet_names:
-            df = pd.read_excel(path, sheet_name=sheet)
-            dfs[sheet] = df.fillna("")
-        else:
-            dfs[sheet] = pd.DataFrame()
-    return dfs
+def _write(db, col: str, doc: Dict[str, Any], doc_id: Optional[str] = None, batch=None) -> str:
+    # sem doc_id => id automático (como collection.add); com batch => só enfileira no lote
+    ref = db.collection(col).document(doc_id) if doc_id else db.collection(col).document()
+    if batch is not None:
+        batch.set(ref, doc)
+    else:
+        ref.set(doc)
+    return ref.id
 
-def insert_localizacao(db, row: Dict[str, Any]) -> str:
+# as linhas chegam normalizadas pelo cadastro_io (CPF limpo, f_tem_valvula bool, lat/lon float ou "")
+def insert_localizacao(db, row: Dict[str, Any], batch=None) -> str:
     doc = {
         "f_logradouro": row.get("f_logradouro",""),
         "f_numero": row.get("f_numero",""),
@@ -45,14 +34,13 @@ def insert_localizacao(db, row: Dict[str, Any]) -> str:
         "f_uf": row.get("f_uf",""),
         "f_cep": row.get("f_cep",""),
         "f_complemento": row.get("f_complemento","") or "",
-        "f_geo": None if not row.get("f_geo_lat") else {"lat": float(row["f_geo_lat"]), "lon": float(row.get("f_geo_lon",0) or 0)},
+        "f_geo": None if row.get("f_geo_lat", "") == "" else {"lat": float(row["f_geo_lat"]), "lon": float(row["f_geo_lon"])},
         "f_created_at": now_utc(),
         "f_ativo": True,
     }
-    ref = db.collection("t_localizacao").add(doc)[1]
-    return ref.id
+    return _write(db, "t_localizacao", doc, batch=batch)
 
-def insert_condominio(db, row: Dict[str, Any]) -> str:
+def insert_condominio(db, row: Dict[str, Any], batch=None) -> str:
     doc = {
         "f_nome_condominio": row.get("f_nome_condominio",""),
         "f_tipo": row.get("f_tipo","condominio"),
@@ -63,13 +51,12 @@ def insert_condominio(db, row: Dict[str, Any]) -> str:
         "f_created_at": now_utc(),
         "f_ativo": True,
     }
-    ref = db.collection("t_condominio").add(doc)[1]
-    return ref.id
+    return _write(db, "t_condominio", doc, batch=batch)
 
-def insert_cliente(db, row: Dict[str, Any]) -> str:
+def insert_cliente(db, row: Dict[str, Any], batch=None) -> str:
     doc = {
         "f_nome_cliente": row.get("f_nome_cliente",""),
-        "f_cpf": str(row.get("f_cpf","")).replace(".","").replace("-","").strip(),
+        "f_cpf": row.get("f_cpf",""),
         "f_condominio_id": row.get("f_condominio_id","") or None,
         "f_bloco": row.get("f_bloco","") or None,
         "f_apto": row.get("f_apto","") or None,
@@ -79,11 +66,10 @@ def insert_cliente(db, row: Dict[str, Any]) -> str:
         "f_created_at": now_utc(),
         "f_ativo": True,
     }
-    ref = db.collection("t_cliente").add(doc)[1]
-    return ref.id
+    return _write(db, "t_cliente", doc, batch=batch)
 
-def insert_medidor(db, row: Dict[str, Any]) -> str:
-    f_medidor_id = row.get("f_medidor_id") or ""
+def insert_medidor(db, row: Dict[str, Any], batch=None) -> str:
+    f_medidor_id = row.get("f_medidor_id") or row.get("_id") or ""
     if not f_medidor_id:
         raise ValueError("f_medidor_id é obrigatório na aba t_medidor")
     doc = {
@@ -100,41 +86,55 @@ def insert_medidor(db, row: Dict[str, Any]) -> str:
         "f_last_valor_m3": None,
         "f_monthly_total_m3": {},
     }
-    db.collection("t_medidor").document(f_medidor_id).set(doc)
-    return f_medidor_id
+    return _write(db, "t_medidor", doc, f_medidor_id, batch)
 
-if __name__ == "__main__":
-    import argparse
+INSERTERS = {
+    "t_localizacao": insert_localizacao,
+    "t_condominio": insert_condominio,
+    "t_cliente": insert_cliente,
+    "t_medidor": insert_medidor,
+}
+
+def main(argv: Optional[list[str]] = None):
     p = argparse.ArgumentParser(description="Carga inicial Firestore via XLSX")
     p.add_argument("--xlsx", required=True, help="Caminho do arquivo Excel com abas t_*")
-    args = p.parse_args()
+    p.add_argument("--errors", help="Relatório CSV das linhas inválidas (default <xlsx>_erros.csv)")
+    p.add_argument("--check", action="store_true", help="Só valida a planilha (sem Firestore) e gera o relatório de erros")
+    args = p.parse_args(argv)
 
-    db = init_db()
     xlsx_path = Path(args.xlsx).resolve()
-    dfs = load_xlsx(xlsx_path)
-
-    print("Carregando: t_localizacao …")
-    loc_ids = []
-    for _, r in dfs["t_localizacao"].iterrows():
-        loc_ids.append(insert_localizacao(db, r.to_dict()))
-    print(f"  ok ({len(loc_ids)})")
-
-    print("Carregando: t_condominio …")
-    cond_ids = []
-    for _, r in dfs["t_condominio"].iterrows():
-        cond_ids.append(insert_condominio(db, r.to_dict()))
-    print(f"  ok ({len(cond_ids)})")
-
-    print("Carregando: t_cliente …")
-    cli_ids = []
-    for _, r in dfs["t_cliente"].iterrows():
-        cli_ids.append(insert_cliente(db, r.to_dict()))
-    print(f"  ok ({len(cli_ids)})")
-
-    print("Carregando: t_medidor …")
-    med_ids = []
-    for _, r in dfs["t_medidor"].iterrows():
-        med_ids.append(insert_medidor(db, r.to_dict()))
-    print(f"  ok ({len(med_ids)})")
+    errors_path = Path(args.errors).resolve() if args.errors else default_report_path(xlsx_path)
+    if args.check:
+        report = ValidationReport()
+        for _ in iter_cadastro_batches(xlsx_path, report, required=False, require_id=False):
+            pass
+        print(report.summary())
+        if report:
+            report.write_csv(errors_path)
+            print(f"❌ {len(report)} linhas com erro → {errors_path}")
+            raise SystemExit(1)
+        print("✅ Planilha válida.")
+        raise SystemExit(0)
 
+    db = get_db()
+    report = ValidationReport()
+    counts: Dict[str, int] = {}
+    for sheet, rows in iter_cadastro_batches(xlsx_path, report, required=False, require_id=False):
+        if sheet not in counts:
+            print(f"Carregando: {sheet} …")
+            counts[sheet] = 0
+        for i in range(0, len(rows), MAX_BATCH_OPS):
+            batch = db.batch()
+            for row in rows[i:i + MAX_BATCH_OPS]:
+                INSERTERS[sheet](db, row, batch)
+            batch.commit()
+        counts[sheet] += len(rows)
+    for sheet, n in counts.items():
+        print(f"  {sheet}: ok ({n})")
+    if report:
+        report.write_csv(errors_path)
+        print(f"⚠️  {len(report)} linhas com erro ficaram fora da carga → {errors_path}")
     print("✅ Carga concluída.")
+
+if __name__ == "__main__":
+    main()
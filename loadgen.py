@@ -0,0 +1,676 @@
+# Gerador de carga em tempo real (soak test) do caminho de ingestão das leituras.
+#
+# python .\loadgen.py --url http://localhost:8081/leituras --xlsx .\cadastro.xlsx --duration 2h
+# python .\loadgen.py --url http://localhost:8081/leituras --meters 2000 --create-meters --interval 5m
+# python .\loadgen.py --meters 2000 --speed 60 --duration 10m --outages-per-hour 2 --dup 0.01 --reorder 0.02
+# python .\loadgen.py --rate 500 --duration 30m --out .\bench\soak.json     # 500 leituras/s (acelera o relógio)
+# python .\loadgen.py --direct --limit-medidores 200 --speed 10 --duration 5m   # sem o serviço: BatchedReadingWriter
+# python .\loadgen.py --fake --meters 500 --speed 100 --duration 1m          # em memória (fake_firestore), valida o gerador
+# (ou: python .\hidro.py loadgen …)
+#
+# Diferente do seed --mode simulate (histórico o mais rápido possível), aqui cada medidor envia no relógio
+# de parede, como em produção: 1 leitura a cada --interval (ts = hora da medição), com:
+#   --speed N         relógio simulado N× mais rápido (o ts anda N× mais rápido que a parede)
+#   --rate R          alvo em leituras/s; calcula o --speed a partir de medidores e --interval
+#   --jitter F        desvio aleatório de ±F×interval no instante de cada leitura
+#   --burst K         o ESP32 junta K leituras e envia numa requisição só (lista)
+#   --outages-per-hour / --outage-frac / --outage-min
+#                     quedas de rede (tempo simulado): um bloco contíguo de medidores (~ um condomínio) fica
+#                     offline e acumula as leituras; na volta, todos reenviam o atraso em até --storm-s s
+#                     (tempestade de reconexão, em pacotes de até 1000 leituras)
+#   --reorder P       pacote atrasado 1..3 intervalos (chega depois dos seguintes: fora de ordem)
+#   --dup P           pacote reenviado (ack perdido): leituras duplicadas no Firestore
+# Com --speed > 1 o relógio simulado começa em agora − duração×speed, para terminar ~agora
+# (o serviço recusa f_ts_utc mais de 1 dia no futuro); sem --duration, use --start.
+#
+# Mede, por janela de --report-s e no total:
+#   e2e      instante agendado do envio → 201 (inclui fila do cliente, 503 + Retry-After e retries)
+#   rtt      cada tentativa HTTP (ou commit, no --direct)
+#   status   201 / 422 / 503 / 5xx / conexão / timeout, retries e pacotes desistidos (--max-retries);
+#            no --direct, NotFound/InvalidArgument contam como 422 e as demais exceções como 5xx
+#   atraso   quanto o agendador está atrasado: com --concurrency requisições em voo ele espera, então
+#            atraso > 0 = o alvo (ou o gerador) não acompanha a taxa pedida
+# Resumo final (e linha do tempo por janela) em JSON com --out.
+#
+# Os medidores precisam existir em t_medidor (o serviço faz update dos agregados): use os do cadastro
+# (--xlsx / --medidor / Firestore com --limit-medidores) ou --meters N --create-meters (MTR-LG000001…,
+# condomínio CON-LOADGEN; apague depois com o purge). --create-meters só cria os sintéticos que ainda não
+# existem: medidor já cadastrado nunca é alterado.
+
+from __future__ import annotations
+
+import sys
+import json
+import math
+import time
+import heapq
+import random
+import argparse
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from hidro_core import get_db, lazy_import
+from seed_firestore import CREATE_ONLY, MAX_BATCH_OPS, BatchedReadingWriter, iter_medidores, iter_medidores_offline, medidor_doc
+from meter_aggregates import missing_meters
+from reading_generator import DAILY_M3, DIURNAL_PROFILE, NOISE_SHAPE, SCALE_SIGMA, TZ_OFFSET_H, WEEKDAY_FACTOR
+
+api_exceptions = lazy_import("google.api_core.exceptions")
+
+MAX_PER_REQUEST = 1000          # limite do ingest_service por requisição
+DIURNAL = DIURNAL_PROFILE.tolist()
+WEEKDAY = WEEKDAY_FACTOR.tolist()
+HIST_STEPS = 16                 # baldes por oitava no histograma de latência (~4% de resolução)
+HIST_MIN_MS = 0.1
+RETRY_BASE_S = 0.5
+RETRY_MAX_S = 60.0
+SYNTHETIC_PREFIX = "MTR-LG"
+SYNTHETIC_CONDOMINIO = "CON-LOADGEN"
+
+def parse_duration(s: str) -> float:
+    """'90', '30s', '5m', '2h', '1d' -> segundos."""
+    s = s.strip().lower()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    mult = units.get(s[-1:], None)
+    try:
+        v = float(s[:-1]) * mult if mult else float(s)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"duração inválida: {s!r} (ex.: 30s, 5m, 2h)") from None
+    if v <= 0:
+        raise argparse.ArgumentTypeError("duração precisa ser > 0")
+    return v
+
+# ---------- métricas ----------
+class LatencyHistogram:
+    """Histograma log-linear (HIST_STEPS baldes por oitava): memória constante em soaks longos."""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.n = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        i = 0 if ms <= HIST_MIN_MS else int(math.log2(ms / HIST_MIN_MS) * HIST_STEPS) + 1
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.n += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for i, c in other.counts.items():
+            self.counts[i] = self.counts.get(i, 0) + c
+        self.n += other.n
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Limite superior do balde que contém o percentil p (nunca acima do máximo visto)."""
+        if not self.n:
+            return None
+        target = math.ceil(p / 100 * self.n)
+        acc = 0
+        for i in sorted(self.counts):
+            acc += self.counts[i]
+            if acc >= target:
+                return min(HIST_MIN_MS * 2 ** (i / HIST_STEPS), self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        out: Dict[str, Optional[float]] = {f"p{p:g}": self.percentile(p) for p in (50, 95, 99, 99.9)}
+        out["mean"] = self.total_ms / self.n if self.n else None
+        out["max"] = self.max_ms if self.n else None
+        return {k: (round(v, 2) if v is not None else None) for k, v in out.items()}
+
+COUNTERS = ["packets", "readings", "ok_packets", "ok_readings", "http_201", "http_422", "http_503", "http_5xx",
+            "http_other", "conn_errors", "timeouts", "retries", "gave_up_packets", "gave_up_readings",
+            "duplicates", "reordered", "storm_packets", "outages"]
+
+class Window:
+    """Contadores e histogramas de um intervalo de relatório."""
+
+    def __init__(self):
+        self.c = dict.fromkeys(COUNTERS, 0)
+        self.e2e = LatencyHistogram()
+        self.rtt = LatencyHistogram()
+        self.max_lag_s = 0.0
+
+class LoadStats:
+    """Janela corrente + totais; thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.t0 = time.monotonic()
+        self.total = Window()
+        self.window = Window()
+        self.window_t0 = self.t0
+        self.in_flight = 0
+        self.timeline: List[Dict[str, Any]] = []
+
+    def count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.window.c[key] += n
+            self.total.c[key] += n
+
+    def lag(self, s: float) -> None:
+        if s > self.window.max_lag_s:
+            with self._lock:
+                self.window.max_lag_s = max(self.window.max_lag_s, s)
+                self.total.max_lag_s = max(self.total.max_lag_s, s)
+
+    def attempt(self, rtt_s: float) -> None:
+        with self._lock:
+            self.window.rtt.add(rtt_s * 1000)
+
+    def delivered(self, n: int, e2e_s: float) -> None:
+        with self._lock:
+            for key, v in (("ok_packets", 1), ("ok_readings", n)):
+                self.window.c[key] += v
+                self.total.c[key] += v
+            self.window.e2e.add(e2e_s * 1000)
+
+    def roll(self) -> Dict[str, Any]:
+        """Fecha a janela corrente (vai para a linha do tempo) e abre outra."""
+        now = time.monotonic()
+        with self._lock:
+            w, self.window = self.window, Window()
+            self.total.e2e.merge(w.e2e)
+            self.total.rtt.merge(w.rtt)
+            el = max(now - self.window_t0, 1e-9)
+            self.window_t0 = now
+            snap = {
+                "t_s": round(now - self.t0, 1),
+                "readings_per_s": round(w.c["ok_readings"] / el, 1),
+                "requests_per_s": round(w.c["packets"] / el, 1),
+                **{k: v for k, v in w.c.items() if v},
+                "e2e_ms": w.e2e.summary(),
+                "rtt_ms": w.rtt.summary(),
+                "in_flight": self.in_flight,
+                "max_lag_s": round(w.max_lag_s, 2),
+            }
+            self.timeline.append(snap)
+        return snap
+
+def _ms(v: Optional[float]) -> str:
+    return "-" if v is None else f"{v:.0f}"
+
+def print_window(snap: Dict[str, Any], target_rate: float) -> None:
+    e = snap["e2e_ms"]
+    errs = sum(snap.get(k, 0) for k in ("http_5xx", "http_other", "conn_errors", "timeouts"))
+    print(f"[{snap['t_s']:7.0f}s] {snap['readings_per_s']:8.1f} leit/s (alvo {target_rate:.1f}) | "
+          f"{snap['requests_per_s']:7.1f} req/s | e2e p50 {_ms(e['p50'])} p95 {_ms(e['p95'])} p99 {_ms(e['p99'])} ms | "
+          f"503 {snap.get('http_503', 0)} 422 {snap.get('http_422', 0)} erros {errs} retries {snap.get('retries', 0)} "
+          f"desist. {snap.get('gave_up_packets', 0)} | em voo {snap['in_flight']} | atraso {snap['max_lag_s']:.1f}s", flush=True)
+
+# ---------- destinos ----------
+class Outcome:
+    """Resultado de uma tentativa: ok, erro definitivo ou retry depois de `retry_after` s."""
+    __slots__ = ("ok", "key", "retry_after")
+
+    def __init__(self, ok: bool, key: str, retry_after: Optional[float] = None):
+        self.ok = ok
+        self.key = key
+        self.retry_after = retry_after
+
+class HttpTarget:
+    """POST /leituras com conexão keep-alive por thread (refeita após erro)."""
+
+    def __init__(self, url: str, timeout_s: float):
+        u = urlsplit(url)
+        if u.scheme not in ("http", "https") or not u.hostname:
+            raise ValueError(f"--url inválida: {url}")
+        self.https = u.scheme == "https"
+        self.host = u.hostname
+        self.port = u.port
+        self.path = u.path or "/leituras"
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            c = self._local.conn = cls(self.host, self.port, timeout=self.timeout_s)
+        return c
+
+    def _drop(self) -> None:
+        c = getattr(self._local, "conn", None)
+        if c is not None:
+            c.close()
+            self._local.conn = None
+
+    def send(self, readings: List[Dict[str, Any]]) -> Outcome:
+        body = json.dumps([{k: v for k, v in r.items() if k != "_ts"} for r in readings], separators=(",", ":")).encode("utf-8")
+        try:
+            c = self._conn()
+            c.request("POST", self.path, body, {"Content-Type": "application/json"})
+            r = c.getresponse()
+            r.read()
+        except TimeoutError:
+            self._drop()
+            return Outcome(False, "timeouts", 0.0)
+        except (OSError, http.client.HTTPException):
+            self._drop()
+            return Outcome(False, "conn_errors", 0.0)
+        if r.status in (200, 201):
+            return Outcome(True, "http_201")
+        if r.status == 422:
+            return Outcome(False, "http_422")
+        if r.status == 503:
+            try:
+                ra = float(r.getheader("Retry-After") or 0)
+            except ValueError:
+                ra = 0.0
+            return Outcome(False, "http_503", ra)
+        if r.status >= 500 or r.status == 429:
+            return Outcome(False, "http_5xx", 0.0)
+        return Outcome(False, "http_other")
+
+class DirectTarget:
+    """Grava direto no Firestore com o BatchedReadingWriter (um por thread, 1 commit por pacote)."""
+
+    def __init__(self, db):
+        self.db = db
+        self._local = threading.local()
+
+    def send(self, readings: List[Dict[str, Any]]) -> Outcome:
+        w = getattr(self._local, "writer", None)
+        if w is None:
+            w = self._local.writer = BatchedReadingWriter(self.db)
+        try:
+            for r in readings:
+                w.add(r["f_medidor_id"], r["f_cliente_id"], r["_ts"], r["f_valor_m3"], r["f_pulsos"],
+                      r["f_status_sensor"], r["f_flag_vazamento"])
+            w.flush()
+        except (api_exceptions.InvalidArgument, api_exceptions.NotFound):
+            self._local.writer = None
+            return Outcome(False, "http_422")
+        except (api_exceptions.DeadlineExceeded, TimeoutError):
+            self._local.writer = None
+            return Outcome(False, "timeouts", 0.0)
+        except Exception:
+            self._local.writer = None  # lote pela metade: descarta e recomeça
+            return Outcome(False, "http_5xx", 0.0)
+        return Outcome(True, "http_201")
+
+# ---------- gerador ----------
+class Meter:
+    """Estado de um medidor simulado: escala de consumo, fila local (burst/offline) e próxima leitura."""
+    __slots__ = ("mid", "cli", "scale", "buffer", "offline_until")
+
+    def __init__(self, mid: str, cli: Optional[str], scale: float):
+        self.mid = mid
+        self.cli = cli
+        self.scale = scale
+        self.buffer: List[Dict[str, Any]] = []
+        self.offline_until = 0.0   # tempo simulado (epoch s)
+
+class Packet:
+    __slots__ = ("readings", "created", "attempts", "dup")
+
+    def __init__(self, readings: List[Dict[str, Any]], created: float, dup: bool = False):
+        self.readings = readings
+        self.created = created     # instante (monotonic) agendado para o 1º envio: origem da latência e2e
+        self.attempts = 0
+        self.dup = dup
+
+# tipos de evento (na ordem de desempate do heap)
+EV_SEND, EV_TICK, EV_OUTAGE_START, EV_OUTAGE_END = range(4)
+
+class LoadGenerator:
+    """
+    Agendador de eventos em tempo de parede (heap) + pool de envio.
+    Tempo simulado: sim = sim0 + (parede − w0) × speed.
+    """
+
+    def __init__(self, meters: List[Tuple[str, Optional[str]]], target, args, rng: random.Random):
+        self.target = target
+        self.args = args
+        self.rng = rng
+        self.interval = args.interval
+        self.speed = args.speed
+        self.meters = [Meter(mid, cli, rng.lognormvariate(-SCALE_SIGMA ** 2 / 2, SCALE_SIGMA)) for mid, cli in meters]
+        self.stats = LoadStats()
+        self._heap: List[Tuple[float, int, int, Any]] = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._pending_sends = 0    # pacotes agendados, em voo ou esperando retry
+        self.pool = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="loadgen")
+        self.w0 = time.monotonic()
+        self.sim0 = args.start.timestamp()
+        self.stopped_at: Optional[float] = None
+
+    # relógio
+    def sim_at(self, wall: float) -> float:
+        return self.sim0 + (wall - self.w0) * self.speed
+
+    def wall_at(self, sim: float) -> float:
+        return self.w0 + (sim - self.sim0) / self.speed
+
+    def push(self, wall: float, kind: int, payload: Any) -> None:
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._heap, (wall, kind, self._seq, payload))
+            if kind == EV_SEND and not isinstance(payload, tuple):
+                self._pending_sends += 1
+            self._cond.notify()
+
+    # leituras
+    def reading(self, m: Meter, sim: float) -> Dict[str, Any]:
+        ts = datetime.fromtimestamp(sim, timezone.utc)
+        local = ts + timedelta(hours=TZ_OFFSET_H)
+        mean_m3 = DAILY_M3 * self.interval / 86400 * DIURNAL[local.hour] * WEEKDAY[local.weekday()] * m.scale
+        pulsos = int(round(mean_m3 * 1000 * self.rng.gammavariate(NOISE_SHAPE, 1 / NOISE_SHAPE)))
+        return {"f_medidor_id": m.mid, "f_cliente_id": m.cli, "f_ts_utc": ts.isoformat(), "_ts": ts,
+                "f_valor_m3": pulsos / 1000, "f_pulsos": pulsos, "f_status_sensor": 1, "f_flag_vazamento": False}
+
+    def on_tick(self, i: int, sim: float, due: float) -> None:
+        m = self.meters[i]
+        m.buffer.append(self.reading(m, sim))
+        if m.offline_until <= sim and len(m.buffer) >= self.args.burst:
+            self.emit(m.buffer, due)
+            m.buffer = []
+        nxt = sim + self.interval * (1 + self.rng.uniform(-self.args.jitter, self.args.jitter))
+        self.push(self.wall_at(nxt), EV_TICK, (i, nxt))
+
+    def emit(self, readings: List[Dict[str, Any]], at: float, storm: bool = False) -> None:
+        """Quebra em pacotes de até MAX_PER_REQUEST e agenda; aplica fora de ordem e duplicados."""
+        for a in range(0, len(readings), MAX_PER_REQUEST):
+            d = 0.0
+            if self.args.reorder and self.rng.random() < self.args.reorder:
+                d += self.rng.uniform(1, 3) * self.interval / self.speed
+                self.stats.count("reordered")
+            if storm:
+                self.stats.count("storm_packets")
+            p = Packet(readings[a:a + MAX_PER_REQUEST], at + d)
+            self.push(p.created, EV_SEND, p)
+            if self.args.dup and self.rng.random() < self.args.dup:
+                self.stats.count("duplicates")
+                dup_at = p.created + self.rng.uniform(0.5, 2.0)
+                self.push(dup_at, EV_SEND, Packet(p.readings, dup_at, dup=True))
+
+    def on_outage_start(self, sim: float) -> None:
+        n = len(self.meters)
+        k = max(1, int(round(n * self.args.outage_frac)))
+        a = self.rng.randrange(n)
+        hit = [(a + j) % n for j in range(k)]   # bloco contíguo ~ um condomínio/gateway
+        end = sim + self.args.outage_min * 60 * self.rng.uniform(0.5, 1.5)
+        for i in hit:
+            self.meters[i].offline_until = max(self.meters[i].offline_until, end)
+        self.stats.count("outages")
+        self.push(self.wall_at(end), EV_OUTAGE_END, hit)
+        self.schedule_outage(sim)
+
+    def on_outage_end(self, hit: List[int]) -> None:
+        now = time.monotonic()
+        for i in hit:
+            m = self.meters[i]
+            if m.buffer and m.offline_until <= self.sim_at(now) + 1e-6:
+                self.emit(m.buffer, now + self.rng.uniform(0, self.args.storm_s), storm=True)
+                m.buffer = []
+
+    def schedule_outage(self, sim: float) -> None:
+        if self.args.outages_per_hour > 0:
+            nxt = sim + self.rng.expovariate(self.args.outages_per_hour) * 3600
+            self.push(self.wall_at(nxt), EV_OUTAGE_START, nxt)
+
+    # envio
+    def _send(self, p: Packet) -> None:
+        p.attempts += 1
+        t = time.monotonic()
+        out = self.target.send(p.readings)
+        end = time.monotonic()
+        self.stats.attempt(end - t)
+        self.stats.count(out.key)
+        retry = not out.ok and out.retry_after is not None and p.attempts <= self.args.max_retries
+        if out.ok:
+            self.stats.delivered(len(p.readings), end - p.created)
+        elif retry:
+            self.stats.count("retries")
+            backoff = min(RETRY_MAX_S, RETRY_BASE_S * 2 ** (p.attempts - 1)) * self.rng.uniform(0.5, 1.0)
+            self.push(end + max(out.retry_after, backoff), EV_SEND, ("retry", p))
+        else:
+            self.stats.count("gave_up_packets")
+            self.stats.count("gave_up_readings", len(p.readings))
+        with self._cond:
+            self.stats.in_flight -= 1
+            if not retry:
+                self._pending_sends -= 1
+            self._cond.notify()
+
+    def dispatch(self, p: Packet) -> None:
+        if p.attempts == 0:
+            self.stats.count("packets")
+            self.stats.count("readings", len(p.readings))
+        with self._cond:
+            # no máximo --concurrency em voo: se o alvo não dá conta, o agendador atrasa (e o atraso aparece)
+            while self.stats.in_flight >= self.args.concurrency:
+                self._cond.wait()
+            self.stats.in_flight += 1
+        self.pool.submit(self._send, p)
+
+    # laço principal
+    def run(self, duration_s: Optional[float], report_s: float, drain_s: float, target_rate: float) -> None:
+        for i, m in enumerate(self.meters):
+            first = self.sim0 + self.rng.uniform(0, self.interval)
+            self.push(self.wall_at(first), EV_TICK, (i, first))
+        self.schedule_outage(self.sim0)
+        stop_at = self.w0 + duration_s if duration_s else math.inf
+        next_report = self.w0 + report_s
+        drain_until = math.inf
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    if not self._stopping and now >= stop_at:
+                        self._stopping = True
+                        self.stopped_at = now
+                        drain_until = now + drain_s
+                        # só ficam os envios (e retries) pendentes
+                        self._heap = [e for e in self._heap if e[1] == EV_SEND]
+                        heapq.heapify(self._heap)
+                        print(f"→ Fim da geração; aguardando até {drain_s:.0f}s pelos envios pendentes…", flush=True)
+                    if self._stopping and (self._pending_sends <= 0 or now >= drain_until):
+                        break
+                    wake = min(next_report, stop_at, drain_until, self._heap[0][0] if self._heap else math.inf)
+                    if wake > now:
+                        self._cond.wait(min(wake - now, 1.0))
+                        continue
+                    ev = heapq.heappop(self._heap) if self._heap and self._heap[0][0] <= now else None
+                if now >= next_report:
+                    print_window(self.stats.roll(), target_rate)
+                    next_report += report_s
+                if ev is None:
+                    continue
+                due, kind, _, payload = ev
+                self.stats.lag(now - due)
+                if kind == EV_TICK:
+                    self.on_tick(payload[0], payload[1], due)
+                elif kind == EV_SEND:
+                    self.dispatch(payload[1] if isinstance(payload, tuple) else payload)
+                elif kind == EV_OUTAGE_START:
+                    self.on_outage_start(payload)
+                else:
+                    self.on_outage_end(payload)
+        except KeyboardInterrupt:
+            print("\n→ Interrompido; relatório parcial.", flush=True)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        print_window(self.stats.roll(), target_rate)
+
+    def summary(self) -> Dict[str, Any]:
+        t = self.stats.total
+        el = time.monotonic() - self.w0
+        gen_s = (self.stopped_at or time.monotonic()) - self.w0   # taxas sobre a geração (sem a espera final)
+        c = t.c
+        return {
+            "elapsed_s": round(el, 1),
+            "generation_s": round(gen_s, 1),
+            "sim_range": [datetime.fromtimestamp(self.sim0, timezone.utc).isoformat(),
+                          datetime.fromtimestamp(self.sim_at(self.stopped_at or time.monotonic()), timezone.utc).isoformat()],
+            "readings_per_s": round(c["ok_readings"] / gen_s, 1) if gen_s else None,
+            "requests_per_s": round(c["packets"] / gen_s, 1) if gen_s else None,
+            "counters": c,
+            "buffered_not_sent": sum(len(m.buffer) for m in self.meters),
+            "pending_packets": self._pending_sends,
+            "e2e_ms": t.e2e.summary(),
+            "rtt_ms": t.rtt.summary(),
+            "max_lag_s": round(t.max_lag_s, 2),
+        }
+
+# ---------- medidores ----------
+def synthetic_ids(n: int) -> List[Tuple[str, Optional[str]]]:
+    return [(f"{SYNTHETIC_PREFIX}{i:06d}", None) for i in range(1, n + 1)]
+
+def create_meters(db, meters: List[Tuple[str, Optional[str]]], synthetic_only: bool = True) -> int:
+    """
+    Cria em t_medidor os medidores que ainda não existem (create: doc existente nunca é alterado).
+    Com synthetic_only (fora do --fake), recusa ids que não sejam MTR-LG…. Retorna nº criados.
+    """
+    if synthetic_only:
+        real = [mid for mid, _ in meters if not mid.startswith(SYNTHETIC_PREFIX)]
+        if real:
+            raise ValueError(f"--create-meters só cria medidores sintéticos ({SYNTHETIC_PREFIX}…); recebido {real[0]}")
+    clis = dict(meters)
+    todo = sorted(missing_meters(db, clis))
+    now = datetime.now(timezone.utc)
+    created = 0
+    for i in range(0, len(todo), MAX_BATCH_OPS):
+        part = todo[i:i + MAX_BATCH_OPS]
+        docs = {}
+        for mid in part:
+            _, doc = medidor_doc({"_id": mid, "f_cliente_id": clis[mid], "f_condominio_id": SYNTHETIC_CONDOMINIO, "f_modelo_hw": "ESP32"})
+            docs[mid] = {**doc, **CREATE_ONLY["t_medidor"], "f_created_at": now, "f_ativo": True}
+        batch = db.batch()
+        for mid in part:
+            batch.create(db.collection("t_medidor").document(mid), docs[mid])
+        try:
+            batch.commit()
+            created += len(part)
+        except api_exceptions.Conflict:  # outro processo criou algum no meio: um a um, pulando os existentes
+            for mid in part:
+                try:
+                    db.collection("t_medidor").document(mid).create(docs[mid])
+                    created += 1
+                except api_exceptions.Conflict:
+                    pass
+    print(f"→ {created} medidor(es) criados em t_medidor ({SYNTHETIC_CONDOMINIO}); {len(clis) - created} já existiam.")
+    return created
+
+def load_meters(args, db) -> List[Tuple[str, Optional[str]]]:
+    if args.meters:
+        return synthetic_ids(args.meters)
+    if args.medidor or args.xlsx:
+        return list(iter_medidores_offline(Path(args.xlsx) if args.xlsx else None, args.medidor, args.limit_medidores))
+    return list(iter_medidores(db if db is not None else get_db(), None, args.limit_medidores))
+
+# ---------- main ----------
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Gerador de carga em tempo real / soak test da ingestão de leituras")
+    ap.add_argument("--url", default="http://localhost:8080/leituras", help="Endpoint do ingest_service (default http://localhost:8080/leituras)")
+    ap.add_argument("--direct", action="store_true", help="Grava direto no Firestore (BatchedReadingWriter), sem o serviço HTTP")
+    ap.add_argument("--fake", action="store_true", help="Como --direct, mas num Firestore em memória (fake_firestore); cria os medidores")
+    ap.add_argument("--fake-latency-ms", type=float, default=0.0, help="Latência simulada por RPC no --fake (default 0)")
+    ap.add_argument("--meters", type=int, help=f"N medidores sintéticos ({SYNTHETIC_PREFIX}000001…) em vez do cadastro")
+    ap.add_argument("--create-meters", action="store_true", help="Cria os medidores sintéticos em t_medidor antes de começar")
+    ap.add_argument("--medidor", action="append", help="IDs específicos (pode repetir a flag)")
+    ap.add_argument("--xlsx", help="Lista de medidores da aba t_medidor do Excel (sem ler o Firestore)")
+    ap.add_argument("--limit-medidores", type=int, help="Limita nº de medidores do cadastro")
+    ap.add_argument("--interval", type=parse_duration, default=300.0, help="Intervalo entre leituras de um medidor, em tempo simulado (default 5m)")
+    ap.add_argument("--speed", type=float, default=1.0, help="Relógio simulado N× mais rápido que o real (default 1 = tempo real)")
+    ap.add_argument("--rate", type=float, help="Alvo em leituras/s; define o --speed a partir de medidores e --interval")
+    ap.add_argument("--duration", type=parse_duration, help="Duração da geração em tempo real (ex.: 30m, 12h; default até Ctrl+C)")
+    ap.add_argument("--start", help="Início do relógio simulado (ISO, UTC; default agora ou agora − duração×speed)")
+    ap.add_argument("--jitter", type=float, default=0.1, help="Desvio de ±F×interval no instante de cada leitura (default 0.1)")
+    ap.add_argument("--burst", type=int, default=1, help="Leituras juntadas pelo ESP32 por requisição (default 1)")
+    ap.add_argument("--outages-per-hour", type=float, default=0.0, help="Quedas de rede por hora simulada (default 0)")
+    ap.add_argument("--outage-frac", type=float, default=0.2, help="Fração dos medidores atingida por queda (default 0.2)")
+    ap.add_argument("--outage-min", type=float, default=30.0, help="Duração média da queda em minutos simulados (default 30)")
+    ap.add_argument("--storm-s", type=float, default=10.0, help="Janela real em que os medidores reenviam o atraso na volta (default 10 s)")
+    ap.add_argument("--reorder", type=float, default=0.0, help="Probabilidade de um pacote chegar fora de ordem (default 0)")
+    ap.add_argument("--dup", type=float, default=0.0, help="Probabilidade de um pacote ser reenviado em duplicata (default 0)")
+    ap.add_argument("--concurrency", type=int, default=64, help="Requisições simultâneas (default 64)")
+    ap.add_argument("--timeout", type=float, default=30.0, help="Timeout por requisição em s (default 30)")
+    ap.add_argument("--max-retries", type=int, default=5, help="Retries por pacote em 503/5xx/erro de rede (default 5)")
+    ap.add_argument("--drain-s", type=float, default=30.0, help="Espera pelos envios pendentes no fim (default 30 s)")
+    ap.add_argument("--report-s", type=float, default=10.0, help="Intervalo do relatório parcial (default 10 s)")
+    ap.add_argument("--seed", type=int, help="Semente (mesma semente => mesmo agendamento e valores)")
+    ap.add_argument("--out", help="Grava o resumo e a linha do tempo em JSON")
+    args = ap.parse_args(argv)
+
+    for name in ("jitter", "reorder", "dup"):
+        if not 0 <= getattr(args, name) < 1:
+            ap.error(f"--{name} precisa estar em [0, 1)")
+    if not 0 < args.outage_frac <= 1:
+        ap.error("--outage-frac precisa estar em (0, 1]")
+    if args.burst < 1 or args.concurrency < 1 or args.speed <= 0 or args.max_retries < 0:
+        ap.error("--burst e --concurrency precisam ser ≥ 1, --speed > 0 e --max-retries ≥ 0")
+    if args.meters is not None and args.meters < 1:
+        ap.error("--meters precisa ser ≥ 1")
+    if args.create_meters and not args.meters:
+        ap.error(f"--create-meters precisa de --meters N (só cria os sintéticos {SYNTHETIC_PREFIX}…, nunca altera o cadastro)")
+
+    db = None
+    if args.fake:
+        from fake_firestore import FakeClient
+        db = FakeClient(latency_ms=args.fake_latency_ms)
+        args.direct = True
+        if args.meters is None and not (args.medidor or args.xlsx):
+            ap.error("--fake precisa de --meters, --medidor ou --xlsx (o fake começa vazio)")
+    elif args.direct or args.create_meters or not (args.meters or args.medidor or args.xlsx):
+        db = get_db()
+
+    meters = load_meters(args, db)
+    if not meters:
+        print("Nenhum medidor encontrado para gerar carga.")
+        return
+    if args.create_meters or args.fake:
+        create_meters(db, meters, synthetic_only=not args.fake)
+
+    if args.rate:
+        args.speed = args.rate * args.interval / len(meters)
+    target_rate = len(meters) / args.interval * args.speed
+    now = datetime.now(timezone.utc)
+    if args.start:
+        args.start = datetime.fromisoformat(args.start.replace("Z", "+00:00"))
+        args.start = args.start.replace(tzinfo=timezone.utc) if args.start.tzinfo is None else args.start
+    elif args.speed > 1:
+        if not args.duration:
+            ap.error("com --speed/--rate acelerado, informe --duration ou --start (o ts não pode passar de 1 dia no futuro)")
+        args.start = now - timedelta(seconds=args.duration * args.speed)
+    else:
+        args.start = now
+
+    target = DirectTarget(db) if args.direct else HttpTarget(args.url, args.timeout)
+    rng = random.Random(args.seed)
+    where = ("fake em memória" if args.fake else "Firestore direto") if args.direct else args.url
+    print(f"→ {len(meters)} medidor(es) a cada {args.interval:g}s simulados, speed {args.speed:g}× "
+          f"≈ {target_rate:.1f} leituras/s → {where}", flush=True)
+    gen = LoadGenerator(meters, target, args, rng)
+    gen.run(args.duration, args.report_s, args.drain_s, target_rate)
+
+    s = gen.summary()
+    s["config"] = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in vars(args).items()}
+    s["meters"] = len(meters)
+    s["target_readings_per_s"] = round(target_rate, 1)
+    c, e = s["counters"], s["e2e_ms"]
+    print(f"✓ {c['ok_readings']} leituras gravadas em {s['elapsed_s']}s ({s['readings_per_s']}/s durante {s['generation_s']}s de geração; alvo {target_rate:.1f}/s) | "
+          f"e2e p50 {_ms(e['p50'])} p95 {_ms(e['p95'])} p99 {_ms(e['p99'])} p99.9 {_ms(e['p99.9'])} máx {_ms(e['max'])} ms")
+    print(f"  pacotes {c['packets']} | 503 {c['http_503']} | 422 {c['http_422']} | 5xx {c['http_5xx']} | conexão {c['conn_errors']} | "
+          f"timeout {c['timeouts']} | retries {c['retries']} | desistidos {c['gave_up_packets']} ({c['gave_up_readings']} leituras) | "
+          f"duplicados {c['duplicates']} | fora de ordem {c['reordered']} | quedas {c['outages']} | pendentes no fim {s['pending_packets']} pacotes | no buffer {s['buffered_not_sent']} leituras")
+    if args.out:
+        out = Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        s["timeline"] = gen.stats.timeline
+        out.write_text(json.dumps(s, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+        print(f"  resumo em {out}")
+    if c["gave_up_packets"] or (c["packets"] and not c["ok_packets"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
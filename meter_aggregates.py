@@ -0,0 +1,270 @@
+# Agregados do medidor (f_last_ts_utc, f_last_valor_m3, f_monthly_total_m3) sem gargalo no doc t_medidor.
+#
+# O Firestore sustenta ~1 escrita/s por documento; com 1 update do medidor por leitura, backfills e
+# uploads em rajada do ESP32 ficam serializados nesse doc (e dão erro de contenção). Duas saídas:
+#
+# - MeterAggregator (write-behind): soma em memória por medidor e grava 1 update por medidor a cada
+#   `interval_s` (thread própria), em WriteBatch. Items e agregados deixam de ir no mesmo commit: numa
+#   queda do processo perde-se no máximo o último intervalo dos agregados (os items ficam, e os
+#   t_agg_* do rollup_firestore, calculados a partir deles, continuam corretos).
+#
+# - Shards (contadores distribuídos): com shards=N os agregados vão para
+#   t_medidor/{id}/t_shards/{0..N-1} (shard sorteado a cada flush) em vez do doc do medidor, que só
+#   recebe f_shards=N (1x por processo). Vários processos/workers gravando o mesmo medidor não disputam
+#   mais o mesmo doc. Quem lê usa read_meter_aggregates()/read_monthly_totals(): se f_shards > 0 soma
+#   os meses dos shards e pega a última leitura mais recente entre eles.
+#
+# Medidor sem doc em t_medidor (NotFound no lote): write_aggregates descarta só esse medidor, com aviso,
+# e regrava o resto do lote — senão ele derrubaria todos os flushes seguintes junto com os vizinhos.
+
+from __future__ import annotations
+
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from hidro_core import lazy_import
+
+firestore = lazy_import("google.cloud.firestore")
+gexc = lazy_import("google.api_core.exceptions")
+
+SHARD_COL = "t_shards"
+MAX_BATCH_OPS = 500
+AGG_FIELDS = ["f_last_ts_utc", "f_last_valor_m3", "f_monthly_total_m3", "f_shards"]
+
+_marked_lock = threading.Lock()
+_marked: set = set()  # (projeto, f_medidor_id) já marcados com f_shards neste processo
+
+# ---------- acumulação ----------
+# pendente por medidor: {"ts": datetime, "valor": float, "months": {AAAA_MM: soma_m3}}
+def new_pending() -> Dict[str, Any]:
+    return {"ts": None, "valor": None, "months": {}}
+
+def add_reading(agg: Dict[str, Any], ts: datetime, m3_delta: float, month: str) -> None:
+    if agg["ts"] is None or ts >= agg["ts"]:
+        agg["ts"] = ts
+        agg["valor"] = float(m3_delta)
+    agg["months"][month] = agg["months"].get(month, 0.0) + float(m3_delta)
+
+def merge_pending(dst: Dict[str, Dict[str, Any]], src: Dict[str, Dict[str, Any]]) -> None:
+    for mid, a in src.items():
+        d = dst.get(mid)
+        if d is None:
+            dst[mid] = {"ts": a["ts"], "valor": a["valor"], "months": dict(a["months"])}
+            continue
+        if a["ts"] is not None and (d["ts"] is None or a["ts"] >= d["ts"]):
+            d["ts"], d["valor"] = a["ts"], a["valor"]
+        for m, v in a["months"].items():
+            d["months"][m] = d["months"].get(m, 0.0) + v
+
+# ---------- gravação ----------
+def ops_per_meter(shards: int) -> int:
+    """Operações de lote que apply_aggregates pode usar para um medidor."""
+    return 2 if shards > 0 else 1
+
+def apply_aggregates(batch, db, f_medidor_id: str, agg: Dict[str, Any], shards: int = 0) -> int:
+    """Enfileira no `batch` os agregados de um medidor (doc do medidor ou um shard). Retorna nº de ops."""
+    med_ref = db.collection("t_medidor").document(f_medidor_id)
+    if shards <= 0:
+        upd: Dict[str, Any] = {"f_last_ts_utc": agg["ts"], "f_last_valor_m3": agg["valor"]}
+        for month, total in agg["months"].items():
+            upd[f"f_monthly_total_m3.{month}"] = firestore.Increment(total)
+        batch.update(med_ref, upd)
+        return 1
+    ops = 0
+    key = (getattr(db, "project", None), f_medidor_id)
+    with _marked_lock:
+        first = key not in _marked
+        _marked.add(key)
+    if first:
+        batch.update(med_ref, {"f_shards": shards})
+        ops += 1
+    shard = med_ref.collection(SHARD_COL).document(str(random.randrange(shards)))
+    batch.set(shard, {
+        "f_medidor_id": f_medidor_id,
+        "f_last_ts_utc": agg["ts"],
+        "f_last_valor_m3": agg["valor"],
+        "f_monthly_total_m3": {m: firestore.Increment(v) for m, v in agg["months"].items()},
+    }, merge=True)
+    return ops + 1
+
+def write_aggregates(db, pending: Dict[str, Dict[str, Any]], shards: int = 0, done: Optional[set] = None,
+                     dropped: Optional[set] = None) -> int:
+    """
+    Grava os agregados pendentes em lotes de até MAX_BATCH_OPS. Retorna nº de commits.
+    `done` recebe os medidores já commitados (para não reenviar só esses se um lote posterior falhar);
+    `dropped`, os descartados por não existirem em t_medidor (também entram em `done`).
+    """
+    per_batch = MAX_BATCH_OPS // ops_per_meter(shards)
+    mids = list(pending)
+    commits = 0
+    try:
+        for i in range(0, len(mids), per_batch):
+            part = mids[i:i + per_batch]
+            commits += _commit_aggregates(db, pending, part, shards, dropped)
+            if done is not None:
+                done.update(part)
+    except Exception:
+        unmark(db, pending)
+        raise
+    return commits
+
+def _commit_aggregates(db, pending: Dict[str, Dict[str, Any]], mids: List[str], shards: int, dropped: Optional[set]) -> int:
+    """Um lote com os agregados de `mids`; em NotFound tira os medidores inexistentes e tenta de novo."""
+    batch = db.batch()
+    for mid in mids:
+        apply_aggregates(batch, db, mid, pending[mid], shards)
+    try:
+        batch.commit()
+        return 1
+    except gexc.NotFound:
+        gone = missing_meters(db, mids)
+        if not gone:
+            raise
+        unmark(db, mids)
+        print(f"⚠️  agregados do medidor: {len(gone)} medidor(es) sem doc em t_medidor descartado(s): {', '.join(sorted(gone)[:10])}")
+        if dropped is not None:
+            dropped.update(gone)
+        rest = [mid for mid in mids if mid not in gone]
+        return _commit_aggregates(db, pending, rest, shards, dropped) if rest else 0
+
+def missing_meters(db, f_medidor_ids: Iterable[str]) -> set:
+    """Ids sem doc em t_medidor (get_all só com as chaves, em blocos de MAX_BATCH_OPS)."""
+    ids = list(dict.fromkeys(f_medidor_ids))
+    out: set = set()
+    for i in range(0, len(ids), MAX_BATCH_OPS):
+        refs = [db.collection("t_medidor").document(mid) for mid in ids[i:i + MAX_BATCH_OPS]]
+        out.update(s.id for s in db.get_all(refs, field_paths=[]) if not s.exists)
+    return out
+
+def unmark(db, f_medidor_ids: Iterable[str]) -> None:
+    """Esquece a marcação f_shards (commit falhou): a próxima gravação marca de novo."""
+    project = getattr(db, "project", None)
+    with _marked_lock:
+        for mid in f_medidor_ids:
+            _marked.discard((project, mid))
+
+class MeterAggregator:
+    """
+    Write-behind thread-safe dos agregados do medidor: add()/merge() acumulam, a thread grava a cada
+    interval_s (no máximo 1 escrita por medidor por intervalo). close() grava o que faltar.
+    """
+
+    def __init__(self, db, interval_s: float = 1.0, shards: int = 0):
+        self.db = db
+        self.interval_s = interval_s
+        self.shards = shards
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.total_meter_updates = 0
+        self.total_commits = 0
+        self.errors = 0
+        self.dropped_meters = 0  # agregados descartados: medidor inexistente em t_medidor
+
+    def add(self, f_medidor_id: str, ts: datetime, m3_delta: float) -> None:
+        month = f"{ts.year:04d}_{ts.month:02d}"
+        with self._lock:
+            agg = self._pending.get(f_medidor_id)
+            if agg is None:
+                agg = self._pending[f_medidor_id] = new_pending()
+            add_reading(agg, ts, m3_delta, month)
+
+    def merge(self, pending: Dict[str, Dict[str, Any]]) -> None:
+        with self._lock:
+            merge_pending(self._pending, pending)
+
+    def pending_meters(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Grava o acumulado. Em erro, devolve-o ao pendente (nada se perde) e relança."""
+        with self._flush_lock:
+            with self._lock:
+                todo, self._pending = self._pending, {}
+            if not todo:
+                return 0
+            done: set = set()
+            dropped: set = set()
+            try:
+                self.total_commits += write_aggregates(self.db, todo, self.shards, done, dropped)
+            except Exception:
+                rest = {mid: a for mid, a in todo.items() if mid not in done and mid not in dropped}
+                with self._lock:
+                    merge_pending(rest, self._pending)
+                    self._pending = rest
+                self.total_meter_updates += len(done - dropped)
+                self.dropped_meters += len(dropped)
+                raise
+            self.total_meter_updates += len(todo) - len(dropped)
+            self.dropped_meters += len(dropped)
+            return len(todo) - len(dropped)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.flush()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️  agregados do medidor: flush falhou, nova tentativa em {self.interval_s:g}s ({e})")
+
+    def start(self) -> "MeterAggregator":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="meter-aggregator", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def __enter__(self) -> "MeterAggregator":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+# ---------- leitura ----------
+def _merge_shards(d: Dict[str, Any], shards: Iterable[Any]) -> Dict[str, Any]:
+    out = dict(d)
+    months = dict(out.get("f_monthly_total_m3") or {})
+    last_ts, last_val = out.get("f_last_ts_utc"), out.get("f_last_valor_m3")
+    for s in shards:
+        sd = s.to_dict() or {}
+        for m, v in (sd.get("f_monthly_total_m3") or {}).items():
+            months[m] = months.get(m, 0.0) + float(v or 0.0)
+        ts = sd.get("f_last_ts_utc")
+        if ts is not None and (last_ts is None or ts > last_ts):
+            last_ts, last_val = ts, sd.get("f_last_valor_m3")
+    out.update({"f_monthly_total_m3": months, "f_last_ts_utc": last_ts, "f_last_valor_m3": last_val})
+    return out
+
+def read_meter_aggregates(db, meter_snaps: List[Any], workers: int = 8) -> Dict[str, Dict[str, Any]]:
+    """
+    f_medidor_id -> dados do doc com f_last_* e f_monthly_total_m3 já somados aos shards.
+    Só consulta t_shards dos medidores com f_shards > 0 (em paralelo).
+    """
+    out = {s.id: (s.to_dict() or {}) for s in meter_snaps}
+    sharded = [mid for mid, d in out.items() if d.get("f_shards")]
+    if sharded:
+        def shards_of(mid: str) -> List[Any]:
+            return list(db.collection("t_medidor").document(mid).collection(SHARD_COL).stream())
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sharded)))) as ex:
+            for mid, shards in zip(sharded, ex.map(shards_of, sharded)):
+                out[mid] = _merge_shards(out[mid], shards)
+    return out
+
+def read_monthly_totals(db, f_medidor_id: str) -> Dict[str, float]:
+    """f_monthly_total_m3 de um medidor (AAAA_MM -> m³), somando os shards quando houver."""
+    snap = db.collection("t_medidor").document(f_medidor_id).get(field_paths=AGG_FIELDS)
+    if not snap.exists:
+        return {}
+    return read_meter_aggregates(db, [snap])[f_medidor_id].get("f_monthly_total_m3") or {}
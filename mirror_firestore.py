@@ -0,0 +1,330 @@
+# python .\mirror_firestore.py sync                    # traz só o que entrou desde o último sync
+# python .\mirror_firestore.py sync --full             # relê tudo (1ª carga ou para pegar updates antigos)
+# python .\mirror_firestore.py query "select f_medidor_id, sum(f_valor_m3) from t_leituras where f_ts_utc >= '2025-09-01' group by 1"
+# python .\mirror_firestore.py query --file consulta.sql --csv resultado.csv
+# python .\mirror_firestore.py tables                  # tabelas, colunas e linhas do espelho
+# (ou: python .\hidro.py mirror …)
+#
+# Espelho local (SQLite, arquivo único em exports/) de t_medidor, t_cliente, t_condominio e das leituras,
+# para consultas ad hoc sem reler o Firestore a cada pergunta.
+#   t_leituras: 1 linha por item (chave _path); colunas fixas f_* + _doc_id. Datas em texto UTC
+#               'AAAA-MM-DD HH:MM:SS' (funcionam com date()/strftime() e comparação de texto).
+#               Leituras do layout dias (packed_days) entram desempacotadas, 1 linha por leitura
+#               (_path = <caminho do doc-dia>#<segundos>, _doc_id = "DD-<segundos>").
+#   t_medidor / t_cliente / t_condominio: chave _id; uma coluna por campo (novos campos viram colunas
+#               novas); mapas/listas ficam em JSON (json_extract(f_monthly_total_m3, '$.2025_09')).
+# Incremental:
+#   leituras → collection group items com f_ingested_at após a marca d'água (mesma leitura paginada
+#              do rollup_firestore); a marca d'água é gravada na mesma transação de cada página.
+#   docs-dia → collection group dias com f_updated_at após a marca d'água (todo append regrava o doc,
+#              que é desempacotado de novo inteiro); pede a isenção de índice de collection group
+#              para dias.f_updated_at, como items.f_ingested_at.
+#   cadastro → docs com f_updated_at ou f_created_at após a maior data já vista; docs sem nenhum dos
+#              dois só entram no --full.
+#   agregados do medidor (f_last_*, f_monthly_total_m3, somando os t_shards) → relidos a cada sync:
+#              o write-behind do meter_aggregates não mexe em f_updated_at.
+# Não chegam no incremental: updates em leituras já espelhadas (ex.: f_flag_vazamento do
+# leak_detector) e exclusões (purge/arquivamento) — o espelho mantém as linhas; use --full se precisar.
+
+from __future__ import annotations
+
+import csv
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from hidro_core import BASE_DIR, get_db
+from meter_aggregates import AGG_FIELDS, read_meter_aggregates
+from packed_days import DAYS_COL, unpack_day
+
+DB_FILE = BASE_DIR / "exports" / "hidro_mirror.sqlite"
+CADASTRO = ["t_medidor", "t_cliente", "t_condominio"]
+ITEMS_TABLE = "t_leituras"
+ITEM_COLUMNS = ["_path", "_doc_id", "f_medidor_id", "f_cliente_id", "f_ts_utc", "f_ano_mes_ref", "f_valor_m3", "f_pulsos",
+                "f_status_sensor", "f_flag_vazamento", "f_ingested_at", "f_archived_at"]
+PAGE_SIZE = 1000
+
+# ---------- Conversão ----------
+def sql_ts(v: datetime) -> str:
+    return v.astimezone(timezone.utc).replace(tzinfo=None).isoformat(sep=" ")
+
+def parse_ts(s: str) -> datetime:
+    return datetime.fromisoformat(s).replace(tzinfo=timezone.utc)
+
+def sql_value(v: Any) -> Any:
+    """Valor do Firestore → tipo do SQLite (datas em texto UTC, mapas/listas em JSON)."""
+    if v is None or isinstance(v, (str, int, float)):
+        return int(v) if isinstance(v, bool) else v
+    if isinstance(v, datetime):
+        return sql_ts(v)
+    if isinstance(v, (dict, list)):
+        return json.dumps(v, ensure_ascii=False, default=sql_value)
+    if hasattr(v, "latitude") and hasattr(v, "longitude"):
+        return json.dumps({"lat": v.latitude, "lng": v.longitude})
+    if hasattr(v, "path"):
+        return v.path
+    return str(v)
+
+# ---------- Espelho ----------
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def open_mirror(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(path))
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("PRAGMA synchronous=NORMAL")
+    con.execute("CREATE TABLE IF NOT EXISTS _sync (chave TEXT PRIMARY KEY, valor TEXT)")
+    con.execute(f"""CREATE TABLE IF NOT EXISTS {ITEMS_TABLE} (
+        _path TEXT PRIMARY KEY, _doc_id TEXT, f_medidor_id TEXT, f_cliente_id TEXT, f_ts_utc TEXT, f_ano_mes_ref TEXT,
+        f_valor_m3 REAL, f_pulsos INTEGER, f_status_sensor INTEGER, f_flag_vazamento INTEGER,
+        f_ingested_at TEXT, f_archived_at TEXT)""")
+    con.execute(f"CREATE INDEX IF NOT EXISTS ix_leituras_medidor_ts ON {ITEMS_TABLE} (f_medidor_id, f_ts_utc)")
+    con.execute(f"CREATE INDEX IF NOT EXISTS ix_leituras_ts ON {ITEMS_TABLE} (f_ts_utc)")
+    for col in CADASTRO:
+        con.execute(f"CREATE TABLE IF NOT EXISTS {_q(col)} (_id TEXT PRIMARY KEY)")
+    con.commit()
+    return con
+
+def get_meta(con: sqlite3.Connection, key: str) -> Optional[str]:
+    row = con.execute("SELECT valor FROM _sync WHERE chave = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def set_meta(con: sqlite3.Connection, key: str, value: Optional[str]) -> None:
+    con.execute("INSERT OR REPLACE INTO _sync (chave, valor) VALUES (?, ?)", (key, value))
+
+def table_columns(con: sqlite3.Connection, table: str) -> List[str]:
+    return [r[1] for r in con.execute(f"PRAGMA table_info({_q(table)})")]
+
+# ---------- Cadastro ----------
+def _cadastro_snaps(db, col: str, wm_upd: Optional[str], wm_cri: Optional[str], full: bool) -> Iterable[Any]:
+    ref = db.collection(col)
+    if full:
+        yield from ref.stream()
+        return
+    seen = set()
+    for field, wm in (("f_updated_at", wm_upd), ("f_created_at", wm_cri)):
+        if wm is None:
+            continue
+        for snap in ref.where(field, ">", parse_ts(wm)).stream():
+            if snap.id not in seen:
+                seen.add(snap.id)
+                yield snap
+
+def sync_cadastro(db, con: sqlite3.Connection, col: str, full: bool = False) -> int:
+    """Upsert dos docs novos/alterados de uma coleção de cadastro. Retorna nº de docs lidos."""
+    wm_upd, wm_cri = get_meta(con, f"{col}.f_updated_at"), get_meta(con, f"{col}.f_created_at")
+    full = full or get_meta(con, f"{col}.full_sync") is None
+    cols = set(table_columns(con, col))
+    n = 0
+    for snap in _cadastro_snaps(db, col, wm_upd, wm_cri, full):
+        d = snap.to_dict() or {}
+        for k in d:
+            if k not in cols:
+                con.execute(f"ALTER TABLE {_q(col)} ADD COLUMN {_q(k)}")
+                cols.add(k)
+        keys = ["_id"] + list(d)
+        con.execute(f"INSERT OR REPLACE INTO {_q(col)} ({', '.join(map(_q, keys))}) VALUES ({', '.join('?' * len(keys))})",
+                    [snap.id] + [sql_value(v) for v in d.values()])
+        for field, key in (("f_updated_at", "upd"), ("f_created_at", "cri")):
+            v = d.get(field)
+            if isinstance(v, datetime):
+                s = sql_ts(v)
+                if key == "upd" and (wm_upd is None or s > wm_upd):
+                    wm_upd = s
+                elif key == "cri" and (wm_cri is None or s > wm_cri):
+                    wm_cri = s
+        n += 1
+    set_meta(con, f"{col}.f_updated_at", wm_upd)
+    set_meta(con, f"{col}.f_created_at", wm_cri)
+    if full:
+        set_meta(con, f"{col}.full_sync", sql_ts(datetime.now(timezone.utc)))
+    con.commit()
+    return n
+
+def sync_meter_aggregates(db, con: sqlite3.Connection) -> int:
+    """Regrava f_last_* / f_monthly_total_m3 (com shards) de todos os medidores. Retorna nº de medidores."""
+    aggs = read_meter_aggregates(db, list(db.collection("t_medidor").select(AGG_FIELDS).stream()))
+    cols = set(table_columns(con, "t_medidor"))
+    for k in AGG_FIELDS:
+        if k not in cols:
+            con.execute(f"ALTER TABLE {_q('t_medidor')} ADD COLUMN {_q(k)}")
+    sets = ", ".join(f"{_q(k)} = ?" for k in AGG_FIELDS)
+    con.executemany(f"UPDATE {_q('t_medidor')} SET {sets} WHERE _id = ?",
+                    [[sql_value(d.get(k)) for k in AGG_FIELDS] + [mid] for mid, d in aggs.items()])
+    con.commit()
+    return len(aggs)
+
+# ---------- Leituras ----------
+def item_row(snap) -> Tuple[Any, ...]:
+    d = snap.to_dict() or {}
+    row = {"_path": snap.reference.path, "_doc_id": snap.id}
+    return tuple(row[c] if c in row else sql_value(d.get(c)) for c in ITEM_COLUMNS)
+
+def sync_items(db, con: sqlite3.Connection, full: bool = False, page_size: int = PAGE_SIZE) -> int:
+    """Upsert das leituras com f_ingested_at após a marca d'água (tudo com full). Retorna nº de leituras lidas."""
+    from rollup_firestore import iter_new_items
+    wm_ts, wm_doc = get_meta(con, "items.f_ingested_at"), get_meta(con, "items.doc")
+    wm = None if full or not wm_ts else (parse_ts(wm_ts), wm_doc or "")
+    sql = f"INSERT OR REPLACE INTO {ITEMS_TABLE} ({', '.join(ITEM_COLUMNS)}) VALUES ({', '.join('?' * len(ITEM_COLUMNS))})"
+    t0 = time.perf_counter()
+    rows: List[Tuple[Any, ...]] = []
+    n = 0
+    last = None
+
+    def commit_page() -> None:
+        con.executemany(sql, rows)
+        d = last.to_dict() or {}
+        if isinstance(d.get("f_ingested_at"), datetime):
+            set_meta(con, "items.f_ingested_at", sql_ts(d["f_ingested_at"]))
+            set_meta(con, "items.doc", last.reference.path)
+        con.commit()
+        rows.clear()
+
+    for snap in iter_new_items(db, wm, page_size):
+        rows.append(item_row(snap))
+        last = snap
+        n += 1
+        if len(rows) >= page_size:
+            commit_page()
+            if n % (page_size * 50) == 0:
+                print(f"   … {n} leituras ({n / (time.perf_counter() - t0):.0f}/s)")
+    if rows:
+        commit_page()
+    return n
+
+def iter_new_days(db, watermark: Optional[Tuple[datetime, str]], page_size: int = PAGE_SIZE) -> Iterable[Any]:
+    """Docs-dia com f_updated_at após a marca d'água, em ordem (f_updated_at, nome do doc), paginados."""
+    q = db.collection_group(DAYS_COL).order_by("f_updated_at").order_by("__name__")
+    cursor = {"f_updated_at": watermark[0], "__name__": db.document(watermark[1])} if watermark and watermark[1] else None
+    if watermark and not cursor:
+        q = q.where("f_updated_at", ">", watermark[0])
+    while True:
+        page_q = q.limit(page_size)
+        if cursor is not None:
+            page_q = page_q.start_after(cursor)
+        n = 0
+        for snap in page_q.stream():
+            n += 1
+            cursor = snap
+            yield snap
+        if n < page_size:
+            return
+
+def sync_days(db, con: sqlite3.Connection, full: bool = False, page_size: int = PAGE_SIZE) -> int:
+    """Upsert das leituras dos docs-dia alterados após a marca d'água. Retorna nº de docs-dia lidos."""
+    wm_ts, wm_doc = get_meta(con, "dias.f_updated_at"), get_meta(con, "dias.doc")
+    wm = None if full or not wm_ts else (parse_ts(wm_ts), wm_doc or "")
+    sql = f"INSERT OR REPLACE INTO {ITEMS_TABLE} ({', '.join(ITEM_COLUMNS)}) VALUES ({', '.join('?' * len(ITEM_COLUMNS))})"
+    n = 0
+    for snap in iter_new_days(db, wm, max(1, page_size // 100)):
+        d = snap.to_dict() or {}
+        rows = []
+        for r in unpack_day(d):
+            r["_path"] = f"{snap.reference.path}#{r['_doc_id'][3:]}"
+            rows.append(tuple(r["_path"] if c == "_path" else r["_doc_id"] if c == "_doc_id" else sql_value(r.get(c))
+                              for c in ITEM_COLUMNS))
+        con.executemany(sql, rows)
+        if isinstance(d.get("f_updated_at"), datetime):
+            set_meta(con, "dias.f_updated_at", sql_ts(d["f_updated_at"]))
+            set_meta(con, "dias.doc", snap.reference.path)
+        con.commit()
+        n += 1
+    return n
+
+# ---------- Comandos ----------
+def cmd_sync(db, con: sqlite3.Connection, full: bool = False, page_size: int = PAGE_SIZE) -> None:
+    wm = get_meta(con, "items.f_ingested_at")
+    print(f"→ Sync do espelho ({'completo' if full else 'incremental'}; leituras desde {wm if wm and not full else 'o início'})")
+    t0 = time.perf_counter()
+    lidos = 0
+    for col in CADASTRO:
+        n = sync_cadastro(db, con, col, full)
+        lidos += n
+        print(f"   {col}: {n} docs novos/alterados")
+    n = sync_meter_aggregates(db, con)
+    lidos += n
+    print(f"   t_medidor: agregados de {n} medidores relidos")
+    n = sync_items(db, con, full, page_size)
+    lidos += n
+    print(f"   {ITEMS_TABLE}: {n} leituras novas")
+    n = sync_days(db, con, full, page_size)
+    lidos += n
+    print(f"   {ITEMS_TABLE}: {n} docs-dia novos/alterados")
+    set_meta(con, "last_sync", sql_ts(datetime.now(timezone.utc)))
+    con.commit()
+    total = con.execute(f"SELECT COUNT(*) FROM {ITEMS_TABLE}").fetchone()[0]
+    print(f"✅ {lidos} docs lidos do Firestore em {time.perf_counter() - t0:.1f}s; espelho com {total} leituras")
+
+def cmd_query(con: sqlite3.Connection, sql: str, csv_path: Optional[Path] = None, max_rows: int = 50, delimiter: str = ",") -> None:
+    t0 = time.perf_counter()
+    cur = con.execute(sql)
+    if cur.description is None:
+        con.commit()
+        print(f"✅ ok ({cur.rowcount} linhas afetadas)")
+        return
+    cols = [c[0] for c in cur.description]
+    if csv_path:
+        csv_path.parent.mkdir(parents=True, exist_ok=True)
+        n = 0
+        with csv_path.open("w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f, delimiter=delimiter)
+            w.writerow(cols)
+            for row in cur:
+                w.writerow(row)
+                n += 1
+        print(f"✅ {n} linhas → {csv_path} ({time.perf_counter() - t0:.2f}s)")
+        return
+    rows = cur.fetchmany(max_rows + 1)
+    shown = [[("" if v is None else str(v)) for v in r] for r in rows[:max_rows]]
+    widths = [min(40, max([len(c)] + [len(r[i]) for r in shown])) for i, c in enumerate(cols)]
+    print(" | ".join(c[:w].ljust(w) for c, w in zip(cols, widths)))
+    print("-+-".join("-" * w for w in widths))
+    for r in shown:
+        print(" | ".join(v[:w].ljust(w) for v, w in zip(r, widths)))
+    more = " (mais linhas: use --max-rows ou --csv)" if len(rows) > max_rows else ""
+    print(f"\n{len(shown)} linhas em {time.perf_counter() - t0:.2f}s{more}")
+
+def cmd_tables(con: sqlite3.Connection) -> None:
+    for table in [ITEMS_TABLE] + CADASTRO:
+        n = con.execute(f"SELECT COUNT(*) FROM {_q(table)}").fetchone()[0]
+        print(f"{table} ({n} linhas): {', '.join(table_columns(con, table))}")
+    for key, val in con.execute("SELECT chave, valor FROM _sync ORDER BY chave"):
+        print(f"   {key} = {val}")
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Espelho local (SQLite) do Firestore para consultas ad hoc")
+    ap.add_argument("--db", default=str(DB_FILE), help=f"Arquivo do espelho (default exports/{DB_FILE.name})")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("sync", help="Atualiza o espelho com o que entrou desde o último sync")
+    s.add_argument("--full", action="store_true", help="Relê todos os docs (ignora as marcas d'água)")
+    s.add_argument("--page-size", type=int, default=PAGE_SIZE, help=f"Docs por página/transação (default {PAGE_SIZE})")
+    q = sub.add_parser("query", help="Roda SQL no espelho")
+    q.add_argument("sql", nargs="?", help="Consulta SQL")
+    q.add_argument("--file", help="Lê a consulta de um arquivo .sql")
+    q.add_argument("--csv", help="Grava o resultado inteiro neste CSV em vez de mostrar")
+    q.add_argument("--delimiter", default=",", help="Separador do CSV (default ,)")
+    q.add_argument("--max-rows", type=int, default=50, help="Linhas mostradas no terminal (default 50)")
+    sub.add_parser("tables", help="Lista tabelas, colunas e marcas d'água do espelho")
+    args = ap.parse_args(argv)
+
+    con = open_mirror(Path(args.db).resolve())
+    try:
+        if args.cmd == "sync":
+            cmd_sync(get_db(), con, args.full, args.page_size)
+        elif args.cmd == "query":
+            sql = Path(args.file).read_text(encoding="utf-8") if args.file else args.sql
+            if not sql:
+                ap.error("informe a consulta ou --file")
+            cmd_query(con, sql, Path(args.csv).resolve() if args.csv else None, args.max_rows, args.delimiter)
+        else:
+            cmd_tables(con)
+    finally:
+        con.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,529 @@
+# Layout compacto de leituras: 1 documento por medidor-dia em vez de 1 documento por leitura.
+#
+# python .\packed_days.py migrate --dry-run                          # quantos items/docs-dia sairiam (só lê)
+# python .\packed_days.py migrate --medidor MTR-000001 --start 2025-01 --end 2025-06
+# python .\packed_days.py migrate --workers 8                       # converte tudo e apaga os items migrados
+# python .\packed_days.py check                                     # migrate + export + resumo em memória
+# (ou: python .\hidro.py pack migrate …)
+#
+# A migração apaga cada item cujo segundo já está gravado no doc-dia: os leitores somam os dois layouts,
+# então item e doc-dia com a mesma leitura contariam em dobro (export, --summary, teste_read_all).
+# Interrompida entre a gravação e a exclusão, rode de novo (não duplica e termina de apagar).
+#
+# t_medidor/{id}/t_leituras/{AAAA_MM}/dias/{DD}      (dia em UTC, como o bucket mensal)
+#   f_medidor_id, f_cliente_id, f_dia (00:00 UTC do dia), f_ano_mes_ref
+#   arrays paralelos, em ordem de f_ts_utc:
+#     f_offsets_s        segundos desde f_dia (int; 1 leitura por segundo no máximo)
+#     f_valor_m3, f_pulsos, f_status_sensor, f_flag_vazamento
+#   f_qtd_leituras, f_total_m3, f_total_pulsos, f_first_ts_utc, f_last_ts_utc, f_updated_at
+# Um dia de leituras de 5 min (288) cabe em ~10 KB num doc só: export/relatório leem 1 doc por dia
+# em vez de 288 (≈ 2 ordens de grandeza menos leituras cobradas), e o armazenamento perde o
+# overhead de nome/índices por leitura.
+#
+# Gravação (PackedDayWriter, mesma interface do BatchedReadingWriter): acumula as leituras e, no
+# flush, faz 1 transação por medidor (lê os docs-dia tocados, intercala as novas leituras por
+# f_offsets_s e regrava). Leitura com o mesmo f_ts_utc (segundo) de uma já gravada é descartada:
+# reenvio do ESP32 e migração repetida não duplicam. Os agregados do medidor (f_last_*,
+# f_monthly_total_m3) só contam as leituras realmente acrescentadas.
+# Quem escreve: seed --mode simulate/load --layout dias, ingest_service --layout dias (INGEST_LAYOUT).
+# Quem lê os dois layouts: export_readings (todos os iteradores e o --summary) e teste_read_all.
+# purge_firestore apaga também os docs-dia; o leak_detector marca f_flag_vazamento no array do doc-dia.
+# O archive_firestore pula buckets com docs-dia (nunca apaga o doc do bucket com eles dentro); o
+# mirror_firestore e o rollup_firestore continuam só no layout items.
+#
+# Índices: arrays ganham índice array-contains por elemento. Isente os arrays no Firestore
+# (console → Índices → Isenções, ou firestore.indexes.json):
+#   "fieldOverrides": [{"collectionGroup": "dias", "fieldPath": "f_offsets_s", "indexes": []}, … (idem
+#   f_valor_m3, f_pulsos, f_status_sensor, f_flag_vazamento)]
+# O export sem --medidor ordena o collection group "dias" por (f_medidor_id, f_dia): índice composto,
+# como o de items.
+
+from __future__ import annotations
+
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from hidro_core import get_db, lazy_import, preload
+from meter_aggregates import MAX_BATCH_OPS, MeterAggregator, add_reading, apply_aggregates, new_pending, ops_per_meter, unmark
+
+firestore = lazy_import("google.cloud.firestore")
+
+DAYS_COL = "dias"
+ARRAYS = ["f_offsets_s", "f_valor_m3", "f_pulsos", "f_status_sensor", "f_flag_vazamento"]
+# campos de uma linha (mesmos nomes do doc de items) -> array de onde vêm
+ROW_ARRAYS = {"f_valor_m3": "f_valor_m3", "f_pulsos": "f_pulsos", "f_status_sensor": "f_status_sensor",
+              "f_flag_vazamento": "f_flag_vazamento"}
+DAY_META = ["f_medidor_id", "f_cliente_id", "f_dia", "f_ano_mes_ref", "f_updated_at"]
+MAX_PER_DAY = 20_000      # ~1 MiB por doc: 1 leitura a cada ~4 s
+ONE_DAY = timedelta(days=1)
+
+# leitura pendente: (ts, valor_m3, pulsos, status, vazamento)
+Reading = Tuple[datetime, float, int, int, bool]
+
+def month_bucket(ts: datetime) -> str:
+    return f"{ts.year:04d}_{ts.month:02d}"
+
+def day_start(ts: datetime) -> datetime:
+    ts = ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def day_ref(db, f_medidor_id: str, day: datetime):
+    return (db.collection("t_medidor").document(f_medidor_id).collection("t_leituras")
+            .document(month_bucket(day)).collection(DAYS_COL).document(f"{day.day:02d}"))
+
+# ---------- empacotar / desempacotar ----------
+def merge_day(data: Optional[Dict[str, Any]], f_medidor_id: str, f_cliente_id: Optional[str], day: datetime,
+              readings: Iterable[Reading]) -> Tuple[Dict[str, Any], List[Reading]]:
+    """Intercala `readings` no doc-dia `data` (ou num novo). Retorna (doc novo, leituras acrescentadas)."""
+    data = data or {}
+    cols = {a: list(data.get(a) or []) for a in ARRAYS}
+    have = set(cols["f_offsets_s"])
+    added: List[Reading] = []
+    rows = list(zip(*(cols[a] for a in ARRAYS)))
+    for r in sorted(readings, key=lambda r: r[0]):
+        off = int((r[0] - day).total_seconds())
+        if not 0 <= off < 86400:
+            raise ValueError(f"leitura {r[0].isoformat()} fora do dia {day.date()}")
+        if off in have:
+            continue
+        have.add(off)
+        rows.append((off, float(r[1]), int(r[2]), int(r[3]), bool(r[4])))
+        added.append(r)
+    if len(rows) > MAX_PER_DAY:
+        raise ValueError(f"{f_medidor_id} {day.date()}: mais de {MAX_PER_DAY} leituras no dia")
+    rows.sort(key=lambda x: x[0])
+    doc: Dict[str, Any] = {
+        "f_medidor_id": f_medidor_id,
+        "f_cliente_id": f_cliente_id if f_cliente_id is not None else data.get("f_cliente_id"),
+        "f_dia": day,
+        "f_ano_mes_ref": month_bucket(day).replace("_", "-"),
+    }
+    for i, a in enumerate(ARRAYS):
+        doc[a] = [x[i] for x in rows]
+    doc["f_qtd_leituras"] = len(rows)
+    doc["f_total_m3"] = sum(doc["f_valor_m3"])
+    doc["f_total_pulsos"] = sum(doc["f_pulsos"])
+    doc["f_first_ts_utc"] = day + timedelta(seconds=rows[0][0]) if rows else None
+    doc["f_last_ts_utc"] = day + timedelta(seconds=rows[-1][0]) if rows else None
+    doc["f_updated_at"] = firestore.SERVER_TIMESTAMP
+    return doc, added
+
+def day_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    """Projeção (select) de um doc-dia que basta para as colunas `fields` de uma linha."""
+    if not fields:
+        return None
+    return DAY_META + ["f_offsets_s"] + sorted({ROW_ARRAYS[f] for f in fields if f in ROW_ARRAYS})
+
+def unpack_day(data: Dict[str, Any], start_dt: Optional[datetime] = None, end_dt: Optional[datetime] = None,
+               fields: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Linhas (mesmos campos de um doc de items) de um doc-dia, em ordem de f_ts_utc, dentro de [start_dt, end_dt].
+    _doc_id = "DD-<segundos>" (estável: não muda com novos appends).
+    """
+    day = data["f_dia"]
+    offsets = data.get("f_offsets_s") or []
+    cols = {f: data.get(a) or [] for f, a in ROW_ARRAYS.items() if not fields or f in fields}
+    base = {"f_medidor_id": data.get("f_medidor_id"), "f_cliente_id": data.get("f_cliente_id"),
+            "f_ano_mes_ref": data.get("f_ano_mes_ref"), "f_ingested_at": data.get("f_updated_at"), "f_archived_at": None}
+    if fields:
+        base = {k: v for k, v in base.items() if k in fields or k == "f_medidor_id"}
+    for i, off in enumerate(offsets):
+        ts = day + timedelta(seconds=off)
+        if (start_dt and ts < start_dt) or (end_dt and ts > end_dt):
+            continue
+        row = dict(base)
+        row["f_ts_utc"] = ts
+        for f, vals in cols.items():
+            row[f] = vals[i] if i < len(vals) else None
+        row["_doc_id"] = f"{day.day:02d}-{off:05d}"
+        yield row
+
+def parse_row_id(doc_id: str) -> Optional[Tuple[int, int]]:
+    """(dia, segundos) de um _doc_id "DD-<segundos>" de linha de doc-dia; None para id de items."""
+    dd, sep, off = doc_id.partition("-")
+    if sep and len(dd) == 2 and dd.isdigit() and off.isdigit():
+        return int(dd), int(off)
+    return None
+
+def day_totals(data: Dict[str, Any], start_dt: Optional[datetime], end_dt: Optional[datetime]) -> Tuple[int, float, int]:
+    """(qtd, m³, pulsos) de um doc-dia dentro de [start_dt, end_dt]."""
+    n, m3, pul = 0, 0.0, 0
+    for r in unpack_day(data, start_dt, end_dt, ["f_valor_m3", "f_pulsos"]):
+        n += 1
+        m3 += float(r["f_valor_m3"] or 0)
+        pul += int(r["f_pulsos"] or 0)
+    return n, m3, pul
+
+def bucket_day_totals(db, f_medidor_id: str, bucket: str, start_dt: Optional[datetime], end_dt: Optional[datetime]) -> Tuple[int, float, int]:
+    """
+    (qtd, m³, pulsos) dos docs-dia de um bucket: dias inteiros no período por aggregation query
+    (sum dos totais do doc), dias de borda cortados pelo período lidos e somados aqui (≤ 2 docs).
+    """
+    days = db.collection("t_medidor").document(f_medidor_id).collection("t_leituras").document(bucket).collection(DAYS_COL)
+    lo = hi = None   # 1º e último dia inteiro dentro do período
+    edges: List[datetime] = []
+    if start_dt:
+        lo = day_start(start_dt)
+        if lo < start_dt:
+            edges.append(lo)
+            lo += ONE_DAY
+    if end_dt:
+        hi = day_start(end_dt)
+        if hi + ONE_DAY - timedelta(microseconds=1) > end_dt:
+            if not edges or edges[0] != hi:
+                edges.append(hi)
+            hi -= ONE_DAY
+    n, m3, pul = 0, 0.0, 0
+    if lo is None or hi is None or lo <= hi:
+        q = days
+        if lo is not None:
+            q = q.where("f_dia", ">=", lo)
+        if hi is not None:
+            q = q.where("f_dia", "<=", hi)
+        aq = q.sum("f_qtd_leituras", alias="n").sum("f_total_m3", alias="m3").sum("f_total_pulsos", alias="pulsos")
+        v = {r.alias: r.value for row in aq.get() for r in row}
+        n, m3, pul = int(v.get("n") or 0), float(v.get("m3") or 0.0), int(v.get("pulsos") or 0)
+    for d in edges:
+        if month_bucket(d) != bucket:
+            continue
+        snap = days.document(f"{d.day:02d}").get()
+        if snap.exists:
+            en, em, ep = day_totals(snap.to_dict(), start_dt, end_dt)
+            n, m3, pul = n + en, m3 + em, pul + ep
+    return n, m3, pul
+
+# ---------- gravação ----------
+def append_readings(db, f_medidor_id: str, f_cliente_id: Optional[str], readings: List[Reading]) -> List[Reading]:
+    """
+    Acrescenta as leituras de um medidor aos docs-dia numa transação (docs-dia + buckets mensais).
+    Retorna as leituras realmente acrescentadas (as repetidas por f_ts_utc ficam de fora).
+    """
+    by_day: Dict[datetime, List[Reading]] = {}
+    for r in readings:
+        by_day.setdefault(day_start(r[0]), []).append(r)
+    days = sorted(by_day)
+    med_ref = db.collection("t_medidor").document(f_medidor_id)
+
+    def run(transaction) -> List[Reading]:
+        refs = [day_ref(db, f_medidor_id, d) for d in days]
+        snaps = [ref.get(transaction=transaction) for ref in refs]  # leituras antes das escritas
+        added: List[Reading] = []
+        months = set()
+        for d, ref, snap in zip(days, refs, snaps):
+            doc, new = merge_day(snap.to_dict() if snap.exists else None, f_medidor_id, f_cliente_id, d, by_day[d])
+            if new:
+                transaction.set(ref, doc)
+                added += new
+                if not snap.exists:
+                    months.add(month_bucket(d))
+        for m in sorted(months):
+            first = min(r[0] for r in added if month_bucket(r[0]) == m)
+            transaction.set(med_ref.collection("t_leituras").document(m), {"f_bucket": m, "f_created_at": first}, merge=True)
+        return added
+
+    return firestore.transactional(run)(db.transaction())
+
+def set_day_flags(db, ref, flags: Dict[int, bool]) -> int:
+    """
+    f_flag_vazamento das leituras de um doc-dia (segundos do dia -> flag) numa transação: o array é
+    regravado inteiro, então um append concorrente faz a transação repetir. Retorna nº de leituras alteradas.
+    """
+    def run(transaction) -> int:
+        snap = ref.get(field_paths=["f_offsets_s", "f_flag_vazamento"], transaction=transaction)
+        if not snap.exists:
+            return 0
+        d = snap.to_dict() or {}
+        offsets = d.get("f_offsets_s") or []
+        cur = [bool(x) for x in (d.get("f_flag_vazamento") or [])]
+        cur += [False] * (len(offsets) - len(cur))
+        n = 0
+        for i, off in enumerate(offsets):
+            f = flags.get(off)
+            if f is not None and cur[i] != f:
+                cur[i] = f
+                n += 1
+        if n:
+            transaction.update(ref, {"f_flag_vazamento": cur})
+        return n
+
+    return firestore.transactional(run)(db.transaction())
+
+class PackedDayWriter:
+    """
+    Par do BatchedReadingWriter para o layout dias: add() acumula, flush() grava 1 transação por
+    medidor (em paralelo, `workers`) e depois os agregados do medidor em WriteBatch (ou no
+    MeterAggregator). Não é thread-safe: use uma instância por thread.
+    """
+
+    def __init__(self, db, batch_size: int = MAX_BATCH_OPS, shards: int = 0, aggregator: Optional[MeterAggregator] = None, workers: int = 8,
+                 aggregates: bool = True):
+        if not 3 <= batch_size <= MAX_BATCH_OPS:
+            raise ValueError(f"batch_size deve estar entre 3 e {MAX_BATCH_OPS}")
+        preload(firestore)  # flush() abre threads
+        self.db = db
+        self.batch_size = batch_size
+        self.shards = shards
+        self.aggregator = aggregator
+        self.aggregates = aggregates
+        self.workers = max(1, workers)
+        self._pending: Dict[str, Tuple[Optional[str], List[Reading]]] = {}
+        self._readings = 0
+        self.total_readings = 0
+        self.total_commits = 0
+        self.total_duplicates = 0
+
+    def add(self, f_medidor_id: str, f_cliente_id: Optional[str], ts: datetime, m3_delta: float, pulsos: int, status_sensor: int = 1, flag_vazamento: bool = False) -> int:
+        """Enfileira uma leitura. Retorna nº de leituras gravadas se o lote encheu (senão 0)."""
+        entry = self._pending.get(f_medidor_id)
+        if entry is None:
+            entry = self._pending[f_medidor_id] = (f_cliente_id, [])
+        entry[1].append((ts, m3_delta, pulsos, status_sensor, flag_vazamento))
+        self._readings += 1
+        return self.flush() if self._readings >= self.batch_size else 0
+
+    def flush(self) -> int:
+        """
+        Grava o pendente (docs-dia + agregados). Retorna nº de leituras acrescentadas.
+        Se a transação de algum medidor falha, os agregados dos demais são gravados e o erro é relançado.
+        """
+        if not self._pending:
+            return 0
+        pending, self._pending, self._readings = self._pending, {}, 0
+        n_in = sum(len(rs) for _, rs in pending.values())
+        added: Dict[str, List[Reading]] = {}
+        errors: List[BaseException] = []
+        if len(pending) == 1 or self.workers == 1:
+            for mid, (cli, rs) in pending.items():
+                try:
+                    added[mid] = append_readings(self.db, mid, cli, rs)
+                except Exception as e:
+                    errors.append(e)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as ex:
+                futs = {ex.submit(append_readings, self.db, mid, cli, rs): mid for mid, (cli, rs) in pending.items()}
+                for f in as_completed(futs):
+                    try:
+                        added[futs[f]] = f.result()
+                    except Exception as e:
+                        errors.append(e)
+        # agregados de todo medidor cuja transação passou, mesmo se outra falhou: o retry das que
+        # passaram é deduplicado pelo f_ts_utc e não somaria de novo
+        self.total_commits += len(added)
+
+        aggs: Dict[str, Dict[str, Any]] = {}
+        for mid, rs in added.items():
+            if rs and self.aggregates:
+                agg = aggs[mid] = new_pending()
+                for r in rs:
+                    add_reading(agg, r[0], r[1], month_bucket(r[0]))
+        if self.aggregator is not None:
+            self.aggregator.merge(aggs)
+        elif aggs:
+            self._write_aggregates(aggs)
+        n = sum(len(rs) for rs in added.values())
+        self.total_readings += n
+        if errors:
+            raise errors[0]
+        self.total_duplicates += n_in - n
+        return n
+
+    def _write_aggregates(self, aggs: Dict[str, Dict[str, Any]]) -> None:
+        batch, ops, chunk = self.db.batch(), 0, {}
+        per = ops_per_meter(self.shards)
+        for mid, agg in aggs.items():
+            if ops + per > MAX_BATCH_OPS:
+                self._commit_aggregates(batch, chunk)
+                batch, ops, chunk = self.db.batch(), 0, {}
+            ops += apply_aggregates(batch, self.db, mid, agg, self.shards)
+            chunk[mid] = agg
+        if ops:
+            self._commit_aggregates(batch, chunk)
+
+    def _commit_aggregates(self, batch, chunk: Dict[str, Dict[str, Any]]) -> None:
+        try:
+            batch.commit()
+        except Exception:
+            if self.shards:
+                unmark(self.db, chunk)
+            raise
+
+# ---------- migração items -> dias ----------
+def _bucket_items(db, mid: str, bucket: str, page_size: int = 1000) -> Iterator[Any]:
+    """Todos os items do bucket, paginados por __name__ (sem índice composto)."""
+    col = db.collection("t_medidor").document(mid).collection("t_leituras").document(bucket).collection("items")
+    last = None
+    while True:
+        q = col.order_by("__name__").limit(page_size)
+        if last is not None:
+            q = q.start_after(last)
+        page = list(q.stream())
+        yield from page
+        if len(page) < page_size:
+            return
+        last = page[-1]
+
+def migrate_bucket(db, mid: str, bucket: str, dry_run: bool = False, delete_items: bool = True, ops_per_second: int = 500) -> Dict[str, int]:
+    """
+    Converte os items de um bucket em docs-dia (1 transação para o medidor, como o PackedDayWriter).
+    Idempotente: rodar de novo não duplica (mesmo f_ts_utc é descartado). Items com f_archived_at
+    (arquivamento TTL pendente) ficam onde estão. Com delete_items (default), apaga só os items cujo
+    segundo já está no doc-dia (conferido após a gravação). f_cliente_id do doc-dia = o da leitura mais
+    recente (cliente diferente entre os items só gera aviso). Os agregados do medidor não mudam.
+    """
+    snaps = [s for s in _bucket_items(db, mid, bucket)]
+    st = {"items": len(snaps), "skipped_archived": 0, "days": 0, "packed": 0, "duplicates": 0, "deleted": 0, "mixed_cliente": 0}
+    todo: List[Tuple[Reading, Any]] = []
+    clis: Dict[datetime, Optional[str]] = {}
+    for s in snaps:
+        d = s.to_dict() or {}
+        ts = d.get("f_ts_utc")
+        if d.get("f_archived_at") is not None or not isinstance(ts, datetime):
+            st["skipped_archived"] += 1
+            continue
+        r = (ts, float(d.get("f_valor_m3") or 0.0), int(d.get("f_pulsos") or 0), int(d.get("f_status_sensor") or 0), bool(d.get("f_flag_vazamento")))
+        todo.append((r, s.reference))
+        clis[ts] = d.get("f_cliente_id")
+    st["days"] = len({day_start(r[0]) for r, _ in todo})
+    if dry_run or not todo:
+        return st
+    cli = clis[max(clis)]
+    outros = {c for c in clis.values() if c is not None} - {cli}
+    if outros:
+        st["mixed_cliente"] = 1
+        print(f"  ⚠️  {mid}/{bucket}: items com f_cliente_id diferentes ({', '.join(sorted(outros))}); "
+              f"docs-dia ficam com o da leitura mais recente ({cli})", file=sys.stderr)
+    st["packed"] = len(append_readings(db, mid, cli, [r for r, _ in todo]))
+    st["duplicates"] = len(todo) - st["packed"]
+    if delete_items:
+        # confere o que ficou gravado antes de apagar
+        stored: Dict[datetime, set] = {}
+        for d in sorted({day_start(r[0]) for r, _ in todo}):
+            snap = day_ref(db, mid, d).get()
+            stored[d] = set((snap.to_dict() or {}).get("f_offsets_s") or []) if snap.exists else set()
+        from purge_firestore import make_bulk_writer
+        bw = make_bulk_writer(db, ops_per_second)
+        try:
+            for r, ref in todo:
+                d = day_start(r[0])
+                if int((r[0] - d).total_seconds()) in stored[d]:
+                    bw.delete(ref)
+                    st["deleted"] += 1
+        finally:
+            bw.close()
+    return st
+
+def cmd_migrate(db, medidores: Optional[List[str]], start: Optional[str], end: Optional[str], workers: int = 8,
+                dry_run: bool = False, delete_items: bool = True, ops_per_second: int = 500) -> Dict[str, int]:
+    if medidores is None:
+        medidores = sorted(s.id for s in db.collection("t_medidor").select([]).stream())
+    lo = (start or "").replace("-", "_")[:7]
+    hi = (end or "9999_99").replace("-", "_")[:7]
+
+    def buckets_of(mid: str) -> List[str]:
+        col = db.collection("t_medidor").document(mid).collection("t_leituras")
+        return [s.id for s in col.select([]).stream() if lo <= s.id <= hi]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        tasks = [(mid, b) for mid, bs in zip(medidores, ex.map(buckets_of, medidores)) for b in sorted(bs)]
+    modo = "simulação (só leitura)" if dry_run else ("migra e apaga os items" if delete_items else
+                                                     "migra e MANTÉM os items (leituras em dobro para os leitores)")
+    print(f"→ {len(tasks)} bucket(s) de {len(medidores)} medidor(es) — {modo}")
+    tot = {"buckets": 0, "items": 0, "skipped_archived": 0, "days": 0, "packed": 0, "duplicates": 0, "deleted": 0,
+           "mixed_cliente": 0, "errors": 0}
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = {ex.submit(migrate_bucket, db, mid, b, dry_run, delete_items, ops_per_second): (mid, b) for mid, b in tasks}
+        for f in as_completed(futs):
+            mid, b = futs[f]
+            try:
+                st = f.result()
+            except Exception as e:
+                tot["errors"] += 1
+                print(f"  ⚠️  {mid}/{b}: {e}", file=sys.stderr)
+                continue
+            tot["buckets"] += 1
+            for k, v in st.items():
+                tot[k] += v
+            if tot["buckets"] % 50 == 0:
+                print(f"  … {tot['buckets']}/{len(tasks)} buckets, {tot['items']} items → {tot['days']} docs-dia")
+    el = time.perf_counter() - t0
+    ratio = f" (÷{tot['items'] / tot['days']:.0f} docs lidos por período)" if tot["days"] else ""
+    print(f"✓ {tot['buckets']} bucket(s) em {el:.1f}s: {tot['items']} items → {tot['days']} docs-dia{ratio}")
+    if not dry_run:
+        print(f"  acrescentadas {tot['packed']} | já existentes/repetidas {tot['duplicates']} | "
+              f"com f_archived_at (mantidos) {tot['skipped_archived']} | items apagados {tot['deleted']} | "
+              f"buckets com clientes misturados {tot['mixed_cliente']} | erros {tot['errors']}")
+    return tot
+
+def cmd_check() -> bool:
+    """
+    Regressão em memória (fake_firestore): items de 2 dias migrados com os defaults saem 1 vez só no
+    export (por bucket e por collection group) e no --summary, e migrar de novo não muda nada.
+    """
+    from fake_firestore import FakeClient
+    from export_readings import bucket_summary, iter_items_all_sorted, iter_items_bucketed
+    db = FakeClient()
+    mid, bucket = "MTR-CHECK", "2025_01"
+    med = db.collection("t_medidor").document(mid)
+    med.set({"f_cliente_id": "CLI-A"})
+    bref = med.collection("t_leituras").document(bucket)
+    bref.set({"f_bucket": bucket})
+    t0 = datetime(2025, 1, 1, 23, 50, tzinfo=timezone.utc)  # 5 leituras cruzando a virada do dia
+    for i in range(5):
+        ts = t0 + timedelta(minutes=5 * i)
+        bref.collection("items").document().set({
+            "f_medidor_id": mid, "f_cliente_id": "CLI-A", "f_ts_utc": ts, "f_ano_mes_ref": "2025-01", "f_valor_m3": 1.0,
+            "f_pulsos": 10, "f_status_sensor": 1, "f_flag_vazamento": False, "f_ingested_at": ts})
+
+    def counts() -> Dict[str, Any]:
+        sm = bucket_summary(db, mid, bucket, None, None)
+        return {"por bucket": len(list(iter_items_bucketed(db, None, None, [mid]))),
+                "collection group": len(list(iter_items_all_sorted(db, None, None))),
+                "summary qtd": sm["f_qtd_leituras"], "summary m³": sm["f_total_m3"]}
+
+    esperado = {"por bucket": 5, "collection group": 5, "summary qtd": 5, "summary m³": 5.0}
+    ok = True
+    for etapa in ("1ª migração", "2ª migração"):
+        migrate_bucket(db, mid, bucket)
+        got = counts()
+        bad = {k: v for k, v in got.items() if v != esperado[k]}
+        print(f"   {'✗' if bad else '✔'} {etapa}: {got}")
+        ok = ok and not bad
+    dias = len(list(bref.collection(DAYS_COL).stream()))
+    items = len(list(bref.collection("items").stream()))
+    print(f"   {'✔' if (dias, items) == (2, 0) else '✗'} {dias} docs-dia, {items} items restantes")
+    ok = ok and (dias, items) == (2, 0)
+    print("✅ migração sem leituras em dobro" if ok else "⚠️  migração deixa leituras em dobro")
+    return ok
+
+# ---------- main ----------
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Layout compacto de leituras (1 doc por medidor-dia): migração a partir dos items")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    mg = sub.add_parser("migrate", help="Converte os items dos buckets em docs-dia (t_leituras/AAAA_MM/dias/DD)")
+    mg.add_argument("--medidor", action="append", help="IDs específicos (pode repetir; default todos de t_medidor)")
+    mg.add_argument("--start", help="Primeiro mês (AAAA-MM)")
+    mg.add_argument("--end", help="Último mês (AAAA-MM)")
+    mg.add_argument("--workers", type=int, default=8, help="Buckets em paralelo (default 8)")
+    mg.add_argument("--dry-run", action="store_true", help="Só conta items e docs-dia resultantes, sem gravar")
+    mg.add_argument("--keep-items", action="store_true",
+                    help="Não apaga os items migrados (só para conferência: export/resumo contam essas leituras em dobro)")
+    mg.add_argument("--ops-per-second", type=int, default=500, help="Limite do BulkWriter ao apagar items (default 500)")
+    sub.add_parser("check", help="Confere em memória que migrate + export + resumo não contam leitura em dobro")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "check":
+        if not cmd_check():
+            sys.exit(1)
+        return
+    db = get_db()
+    tot = cmd_migrate(db, args.medidor, args.start, args.end, args.workers, args.dry_run, not args.keep_items, args.ops_per_second)
+    if tot["errors"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
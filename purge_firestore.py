@@ -1,70 +1,147 @@
 # python .\purge_firestore.py
+# python .\purge_firestore.py --workers 16 --partitions 64     # mais paralelismo
+# python .\purge_firestore.py --resume                          # continua um purge interrompido
+# python .\purge_firestore.py --only readings                   # só leituras (items, dias e buckets)
 
 from __future__ import annotations
-import os, time
+import json, time, argparse, threading
 from pathlib import Path
-from dotenv import load_dotenv
-import firebase_admin
-from firebase_admin import credentials, firestore
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from hidro_core import get_db
 
 # Config
 COLS_ROOT = ["t_condominio", "t_localizacao", "t_cliente", "t_medidor"]
+STATE_FILE = Path(__file__).resolve().parent / ".purge_state.json"
 
-def init_db():
-    load_dotenv()
-    cred_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "").strip()
-    if not cred_path:
-        raise RuntimeError("Defina GOOGLE_APPLICATION_CREDENTIALS no .env")
-    cred_path = str(Path(cred_path).resolve())
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(credentials.Certificate(cred_path))
-    return firestore.client()
-
-def delete_collection(coll_ref, batch_size=500):
-    docs = list(coll_ref.limit(batch_size).stream())
-    deleted = 0
-    for doc in docs:
-        doc.reference.delete()
-        deleted += 1
-    return deleted
-
-def purge_readings(db):
-    # apaga por collection group "items" (subcoleção de leituras)
-    print("Apagando collection group: t_leituras/*/items …")
-    group = db.collection_group("items")
-    count = 0
-    for snap in group.stream():
-        snap.reference.delete()
-        count += 1
-        if count % 1000 == 0:
-            print(f"  deletados {count} docs de leitura…")
-    print(f"  total leituras apagadas: {count}")
-
-    # apaga os documentos "bucket" (YYYY_MM) nas subcoleções t_leituras
-    print("Apagando documentos de bucket (t_leituras/AAAA_MM)…")
-    meds = db.collection("t_medidor").stream()
-    buckets_deleted = 0
-    for m in meds:
-        for b in db.collection("t_medidor").document(m.id).collection("t_leituras").stream():
-            b.reference.delete()
-            buckets_deleted += 1
-    print(f"  buckets apagados: {buckets_deleted}")
-
-def purge_roots(db):
+# ---------- progresso / retomada ----------
+class PurgeProgress:
+    """Contador thread-safe de deletes com log periódico de deletes/s."""
+
+    def __init__(self, label: str, every_s: float = 5.0):
+        self.label = label
+        self.every_s = every_s
+        self.deleted = 0
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._last_log = self._t0
+
+    def add(self, n: int = 1) -> None:
+        with self._lock:
+            self.deleted += n
+            now = time.perf_counter()
+            if now - self._last_log >= self.every_s:
+                self._last_log = now
+                print(f"  {self.label}: {self.deleted} deletados ({self.rate():.0f} deletes/s)")
+
+    def rate(self) -> float:
+        el = time.perf_counter() - self._t0
+        return self.deleted / el if el > 0 else 0.0
+
+def load_state(path: Path) -> dict:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"done": [], "deleted": {}}
+
+def save_state(path: Path, state: dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+# ---------- deletes em lote ----------
+def make_bulk_writer(db, ops_per_second: int = 500):
+    from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+    return db.bulk_writer(BulkWriterOptions(initial_ops_per_second=ops_per_second, max_ops_per_second=ops_per_second))
+
+def _purge_partition(db, query, progress: PurgeProgress, ops_per_second: int) -> int:
+    bw = make_bulk_writer(db, ops_per_second)
+    n = 0
+    try:
+        for snap in query.select([]).stream():
+            bw.delete(snap.reference)
+            n += 1
+            progress.add()
+    finally:
+        bw.close()  # flush + aguarda as escritas pendentes
+    return n
+
+def purge_collection_group(db, group: str, partitions: int = 32, workers: int = 8, ops_per_second: int = 500) -> int:
+    """
+    Apaga todos os docs de um collection group: o scan é dividido em partições
+    (partition queries) e cada worker apaga a sua via BulkWriter.
+    Rodar de novo após uma interrupção só encontra o que ainda não foi apagado.
+    """
+    progress = PurgeProgress(group)
+    parts = list(db.collection_group(group).get_partitions(partitions))
+    print(f"  {group}: {len(parts)} partições, {workers} workers")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = [ex.submit(_purge_partition, db, p.query(), progress, ops_per_second) for p in parts]
+        for fut in as_completed(futs):
+            fut.result()
+    print(f"  {group}: total {progress.deleted} ({progress.rate():.0f} deletes/s)")
+    return progress.deleted
+
+def purge_readings(db, partitions: int = 32, workers: int = 8, ops_per_second: int = 500, state: dict | None = None, state_path: Path | None = None):
+    state = state if state is not None else {"done": [], "deleted": {}}
+    # apaga por collection group "items" (subcoleção de leituras) e "dias" (layout compacto),
+    # depois os documentos "bucket" (AAAA_MM) das subcoleções t_leituras
+    for phase, group, msg in (("items", "items", "Apagando collection group: t_leituras/*/items …"),
+                              ("dias", "dias", "Apagando collection group: t_leituras/*/dias (layout compacto)…"),
+                              ("buckets", "t_leituras", "Apagando documentos de bucket (t_leituras/AAAA_MM)…")):
+        if phase in state["done"]:
+            print(f"{msg} (já concluído, pulando)")
+            continue
+        print(msg)
+        n = purge_collection_group(db, group, partitions, workers, ops_per_second)
+        state["deleted"][phase] = state["deleted"].get(phase, 0) + n
+        state["done"].append(phase)
+        if state_path:
+            save_state(state_path, state)
+
+def purge_roots(db, ops_per_second: int = 500, state: dict | None = None, state_path: Path | None = None):
+    state = state if state is not None else {"done": [], "deleted": {}}
     for name in COLS_ROOT:
+        phase = f"root:{name}"
+        if phase in state["done"]:
+            print(f"Apagando coleção raiz: {name} (já concluído, pulando)")
+            continue
         print(f"Apagando coleção raiz: {name}")
-        total = 0
-        while True:
-            d = delete_collection(db.collection(name))
-            total += d
-            if d == 0:
-                break
-            print(f"  +{d} (acumulado {total})")
+        # recursive_delete também remove subcoleções que tenham sobrado
+        total = db.recursive_delete(db.collection(name), bulk_writer=make_bulk_writer(db, ops_per_second))
         print(f"  total apagado em {name}: {total}")
+        state["deleted"][phase] = state["deleted"].get(phase, 0) + total
+        state["done"].append(phase)
+        if state_path:
+            save_state(state_path, state)
 
-if __name__ == "__main__":
-    db = init_db()
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description="Apaga leituras e coleções raiz do Firestore (deletes em lote, paralelos)")
+    ap.add_argument("--workers", type=int, default=8, help="Workers em paralelo (default 8)")
+    ap.add_argument("--partitions", type=int, default=32, help="Partições do scan por collection group (default 32)")
+    ap.add_argument("--ops-per-second", type=int, default=500, help="Limite de deletes/s por worker no BulkWriter (default 500)")
+    ap.add_argument("--only", choices=["readings", "roots"], help="Apaga só leituras (items, dias e buckets) ou só coleções raiz")
+    ap.add_argument("--resume", action="store_true", help="Continua um purge interrompido (pula fases já concluídas)")
+    ap.add_argument("--state", default=str(STATE_FILE), help=f"Arquivo de estado para --resume (default {STATE_FILE.name})")
+    args = ap.parse_args(argv)
+
+    state_path = Path(args.state).resolve()
+    state = load_state(state_path) if args.resume else {"done": [], "deleted": {}}
+    if args.resume and state["done"]:
+        print(f"→ retomando: fases concluídas {state['done']}")
+    save_state(state_path, state)
+
+    db = get_db()
+    before = sum(state["deleted"].values())
+    t0 = time.perf_counter()
     # ordem: leituras primeiro (subcoleções), depois coleções raiz
-    purge_readings(db)
-    purge_roots(db)
-    print("✅ Purge completo.")
+    if args.only in (None, "readings"):
+        purge_readings(db, args.partitions, args.workers, args.ops_per_second, state, state_path)
+    if args.only in (None, "roots"):
+        purge_roots(db, args.ops_per_second, state, state_path)
+    state_path.unlink(missing_ok=True)
+    total = sum(state["deleted"].values())
+    n = total - before
+    el = time.perf_counter() - t0
+    print(f"✅ Purge completo: {n} docs nesta execução ({total} no total) em {el:.1f}s ({n / el if el > 0 else 0:.0f} deletes/s).")
+
+if __name__ == "__main__":
+    main()
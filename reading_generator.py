@@ -0,0 +1,143 @@
+# Gerador vetorizado (NumPy) de séries de leituras para simulação/carga.
+# Gera a série inteira de um medidor de uma vez e entrega em blocos ("chunks"):
+# - RNG semeável (--seed): mesma semente + mesmo f_medidor_id => mesma série, independente da ordem/threads
+# - curva diária (horário local) e fator por dia da semana
+# - fator de escala por medidor (lognormal)
+# - episódios de vazamento injetados (vazão constante extra + f_flag_vazamento=True)
+# - quedas de sensor (sem envio); o consumo do período é reportado na 1ª leitura após a queda
+# Pulsos são inteiros (1 pulso = 1 litro) e f_valor_m3 = pulsos / 1000, como um medidor real.
+
+from __future__ import annotations
+
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+# peso relativo por hora local (0..23): picos de manhã e à noite, vale de madrugada
+DIURNAL_PROFILE = np.array([
+    0.15, 0.10, 0.08, 0.08, 0.10, 0.30, 1.20, 2.00, 1.80, 1.30, 1.10, 1.20,
+    1.40, 1.20, 0.90, 0.80, 0.90, 1.20, 1.70, 2.00, 1.70, 1.20, 0.70, 0.35,
+])
+DIURNAL_PROFILE = DIURNAL_PROFILE / DIURNAL_PROFILE.mean()
+
+# seg..dom (datetime.weekday())
+WEEKDAY_FACTOR = np.array([0.95, 0.95, 0.95, 0.95, 1.00, 1.10, 1.10])
+WEEKDAY_FACTOR = WEEKDAY_FACTOR / WEEKDAY_FACTOR.mean()
+
+TZ_OFFSET_H = -3            # curvas de uso em horário de Brasília
+DAILY_M3 = 0.24             # consumo médio diário de um medidor "típico" (m³)
+SCALE_SIGMA = 0.4           # dispersão (lognormal) do fator de escala entre medidores
+NOISE_SHAPE = 2.0           # ruído gamma multiplicativo (média 1)
+LEAK_MEDIAN_H = 48.0        # duração mediana de um vazamento
+LEAK_FLOW_M3_H = (0.005, 0.050)  # vazão extra do vazamento (5..50 L/h)
+DROPOUT_H = (1.0, 12.0)     # duração de uma queda de sensor
+
+def meter_rng(seed: Optional[int], f_medidor_id: str) -> np.random.Generator:
+    """RNG por medidor: reprodutível por (seed, f_medidor_id); aleatório se seed=None."""
+    if seed is None:
+        return np.random.default_rng()
+    return np.random.default_rng([seed, zlib.crc32(f_medidor_id.encode("utf-8"))])
+
+def _episodes(rng: np.random.Generator, n_samples: int, step_min: int, per_month: float, draw_dur_h: Callable[[int], np.ndarray]) -> Iterable[Tuple[int, int]]:
+    """Episódios (início, fim) em índices de amostra; quantidade ~ Poisson(per_month × meses)."""
+    months = n_samples * step_min / (60 * 24 * 30)
+    n = int(rng.poisson(per_month * months)) if per_month > 0 else 0
+    starts = rng.integers(0, n_samples, size=n)
+    lens = np.maximum(1, np.round(draw_dur_h(n) * 60 / step_min)).astype(np.int64)
+    return zip(starts.tolist(), np.minimum(starts + lens, n_samples).tolist())
+
+def generate_series(
+    f_medidor_id: str,
+    t0: datetime,
+    t1: datetime,
+    step_min: int,
+    rng: np.random.Generator,
+    scale: Optional[float] = None,
+    leaks_per_month: float = 0.0,
+    dropouts_per_month: float = 0.0,
+) -> Dict[str, np.ndarray]:
+    """
+    Série completa de um medidor em [t0, t1] a cada step_min minutos (UTC).
+    Retorna arrays paralelos: ts (datetime64[s], UTC), valor_m3, pulsos, status, vazamento.
+    Amostras em queda de sensor já vêm removidas.
+    """
+    n = int((t1 - t0) // timedelta(minutes=step_min)) + 1
+    if n <= 0:
+        empty = np.array([], dtype=np.int64)
+        return {"ts": empty.astype("datetime64[s]"), "valor_m3": empty.astype(np.float64),
+                "pulsos": empty.astype(np.int32), "status": empty.astype(np.int8), "vazamento": empty.astype(bool)}
+
+    t0_naive = t0.astimezone(timezone.utc).replace(tzinfo=None)
+    ts = np.datetime64(t0_naive, "s") + np.arange(n, dtype=np.int64) * np.timedelta64(step_min * 60, "s")
+
+    # hora / dia da semana locais, vetorizados
+    local = ts + np.timedelta64(TZ_OFFSET_H * 3600, "s")
+    hour = (local.astype("datetime64[h]").astype(np.int64)) % 24
+    weekday = (local.astype("datetime64[D]").astype(np.int64) + 3) % 7  # 1970-01-01 foi quinta (weekday 3)
+
+    if scale is None:
+        scale = float(rng.lognormal(0.0, SCALE_SIGMA))
+    step_m3 = DAILY_M3 * step_min / 1440.0
+    liters = step_m3 * 1000.0 * scale * DIURNAL_PROFILE[hour] * WEEKDAY_FACTOR[weekday]
+    liters *= rng.gamma(NOISE_SHAPE, 1.0 / NOISE_SHAPE, size=n)
+
+    vazamento = np.zeros(n, dtype=bool)
+    leak_dur = lambda k: rng.lognormal(np.log(LEAK_MEDIAN_H), 0.6, size=k)
+    for a, b in _episodes(rng, n, step_min, leaks_per_month, leak_dur):
+        flow_l_h = rng.uniform(*LEAK_FLOW_M3_H) * 1000.0
+        liters[a:b] += flow_l_h * step_min / 60.0
+        vazamento[a:b] = True
+
+    keep = np.ones(n, dtype=bool)
+    drop_dur = lambda k: rng.uniform(*DROPOUT_H, size=k)
+    for a, b in _episodes(rng, n, step_min, dropouts_per_month, drop_dur):
+        keep[a:b] = False
+
+    # pulsos inteiros a partir do acumulado: o que não foi enviado na queda entra na próxima leitura
+    cum_pulsos = np.floor(np.cumsum(liters)).astype(np.int64)
+    idx = np.flatnonzero(keep)
+    cum_kept = cum_pulsos[idx]
+    pulsos = np.diff(cum_kept, prepend=0).astype(np.int32)
+
+    # leitura com vazamento em qualquer amostra agregada conta como vazamento
+    leak_cum = np.cumsum(vazamento)
+    leak_kept = np.diff(leak_cum[idx], prepend=0) > 0
+
+    return {
+        "ts": ts[idx],
+        "valor_m3": pulsos.astype(np.float64) / 1000.0,
+        "pulsos": pulsos,
+        "status": np.ones(idx.size, dtype=np.int8),
+        "vazamento": leak_kept,
+    }
+
+def iter_chunks(series: Dict[str, np.ndarray], chunk_size: int = 10_000) -> Iterator[Dict[str, np.ndarray]]:
+    """Fatia a série em blocos de até chunk_size leituras."""
+    n = series["ts"].size
+    for a in range(0, n, chunk_size):
+        yield {k: v[a:a + chunk_size] for k, v in series.items()}
+
+def iter_chunk_readings(chunk: Dict[str, np.ndarray]) -> Iterator[Tuple[datetime, float, int, int, bool]]:
+    """Converte um bloco em tuplas Python (ts UTC, valor_m3, pulsos, status, vazamento) para o writer."""
+    ts_list = chunk["ts"].astype("datetime64[us]").tolist()
+    for ts, m3, pul, st, vz in zip(ts_list, chunk["valor_m3"].tolist(), chunk["pulsos"].tolist(),
+                                   chunk["status"].tolist(), chunk["vazamento"].tolist()):
+        yield ts.replace(tzinfo=timezone.utc), m3, pul, st, vz
+
+def iter_medidor_readings(
+    f_medidor_id: str,
+    t0: datetime,
+    t1: datetime,
+    step_min: int,
+    seed: Optional[int] = None,
+    leaks_per_month: float = 0.0,
+    dropouts_per_month: float = 0.0,
+    chunk_size: int = 10_000,
+) -> Iterator[Dict[str, np.ndarray]]:
+    """Atalho: gera a série de um medidor e entrega em blocos."""
+    rng = meter_rng(seed, f_medidor_id)
+    series = generate_series(f_medidor_id, t0, t1, step_min, rng,
+                             leaks_per_month=leaks_per_month, dropouts_per_month=dropouts_per_month)
+    yield from iter_chunks(series, chunk_size)
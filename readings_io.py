@@ -0,0 +1,134 @@
+# Leitura/escrita de leituras simuladas em arquivo local (JSONL ou Parquet), sem Firestore.
+# Usado pelo seed_firestore.py:
+#   --mode simulate --out arquivo.jsonl|arquivo.jsonl.gz|arquivo.parquet  → gera offline
+#   --mode load --input arquivo ...                                       → carrega no Firestore
+# Colunas (mesmos nomes f_* do Firestore):
+#   f_medidor_id, f_cliente_id, f_ts_utc, f_valor_m3, f_pulsos, f_status_sensor, f_flag_vazamento
+# Parquet exige pyarrow (pip install pyarrow); JSONL não tem dependência extra.
+
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from hidro_core import lazy_import
+
+np = lazy_import("numpy")
+
+FILE_FIELDS = ["f_medidor_id", "f_cliente_id", "f_ts_utc", "f_valor_m3", "f_pulsos", "f_status_sensor", "f_flag_vazamento"]
+
+# (f_medidor_id, f_cliente_id, ts, valor_m3, pulsos, status, vazamento)
+ReadingRow = Tuple[str, Optional[str], datetime, float, int, int, bool]
+
+def require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Formato Parquet requer pyarrow: pip install pyarrow") from e
+    return pa, pq
+
+def file_format(path: Path) -> str:
+    name = path.name.lower()
+    if name.endswith(".parquet"):
+        return "parquet"
+    if name.endswith(".jsonl") or name.endswith(".jsonl.gz"):
+        return "jsonl"
+    raise ValueError(f"Extensão não suportada: {path.name} (use .jsonl, .jsonl.gz ou .parquet)")
+
+def _open_text(path: Path, mode: str):
+    if path.name.lower().endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return path.open(mode, encoding="utf-8", newline="" if mode == "w" else None)
+
+class ReadingFileWriter:
+    """Escreve blocos (arrays do reading_generator) de um medidor por vez em JSONL ou Parquet."""
+
+    def __init__(self, path: Path, compression: str = "zstd"):
+        self.path = path
+        self.format = file_format(path)
+        self.rows = 0
+        self._f = None
+        self._pq_writer = None
+        self._compression = compression
+        if self.format == "jsonl":
+            self._f = _open_text(path, "w")
+
+    def write_chunk(self, f_medidor_id: str, f_cliente_id: Optional[str], chunk: Dict[str, np.ndarray]) -> int:
+        n = int(chunk["ts"].size)
+        if n == 0:
+            return 0
+        if self.format == "parquet":
+            pa, pq = require_pyarrow()
+            table = pa.table({
+                "f_medidor_id": pa.array([f_medidor_id] * n, pa.string()),
+                "f_cliente_id": pa.array([f_cliente_id] * n, pa.string()),
+                "f_ts_utc": pa.array(chunk["ts"].astype("datetime64[us]"), pa.timestamp("us", tz="UTC")),
+                "f_valor_m3": pa.array(chunk["valor_m3"], pa.float64()),
+                "f_pulsos": pa.array(chunk["pulsos"], pa.int32()),
+                "f_status_sensor": pa.array(chunk["status"], pa.int8()),
+                "f_flag_vazamento": pa.array(chunk["vazamento"], pa.bool_()),
+            })
+            if self._pq_writer is None:
+                self._pq_writer = pq.ParquetWriter(str(self.path), table.schema, compression=self._compression)
+            self._pq_writer.write_table(table)
+        else:
+            ts_iso = np.datetime_as_string(chunk["ts"], unit="s")
+            lines = []
+            for ts, m3, pul, st, vz in zip(ts_iso.tolist(), chunk["valor_m3"].tolist(), chunk["pulsos"].tolist(),
+                                           chunk["status"].tolist(), chunk["vazamento"].tolist()):
+                lines.append(json.dumps({
+                    "f_medidor_id": f_medidor_id, "f_cliente_id": f_cliente_id, "f_ts_utc": ts + "+00:00",
+                    "f_valor_m3": m3, "f_pulsos": pul, "f_status_sensor": st, "f_flag_vazamento": vz,
+                }, ensure_ascii=False))
+            self._f.write("\n".join(lines) + "\n")
+        self.rows += n
+        return n
+
+    def close(self) -> None:
+        if self._pq_writer is not None:
+            self._pq_writer.close()
+            self._pq_writer = None
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def __enter__(self) -> "ReadingFileWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+def _parse_ts(v: Any) -> datetime:
+    if isinstance(v, datetime):
+        return v if v.tzinfo else v.replace(tzinfo=timezone.utc)
+    dt = datetime.fromisoformat(str(v))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def iter_readings_file(path: Path, batch_rows: int = 50_000) -> Iterator[ReadingRow]:
+    """Lê em streaming (sem carregar o arquivo inteiro) um arquivo gerado pelo ReadingFileWriter."""
+    if not path.exists():
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+    if file_format(path) == "parquet":
+        pa, pq = require_pyarrow()
+        pf = pq.ParquetFile(str(path))
+        for batch in pf.iter_batches(batch_size=batch_rows, columns=FILE_FIELDS):
+            cols = {name: batch.column(name).to_pylist() for name in FILE_FIELDS}
+            for mid, cli, ts, m3, pul, st, vz in zip(*(cols[name] for name in FILE_FIELDS)):
+                yield mid, cli, _parse_ts(ts), float(m3), int(pul), int(st), bool(vz)
+        return
+    with _open_text(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            d = json.loads(line)
+            yield (d["f_medidor_id"], d.get("f_cliente_id"), _parse_ts(d["f_ts_utc"]),
+                   float(d["f_valor_m3"]), int(d["f_pulsos"]),
+                   int(d.get("f_status_sensor", 1)), bool(d.get("f_flag_vazamento", False)))
+
+def iter_readings_files(paths: Iterable[Path]) -> Iterator[ReadingRow]:
+    for p in paths:
+        yield from iter_readings_file(p)
@@ -0,0 +1,190 @@
+# python .\rollup_firestore.py                 # processa só as leituras novas desde a última execução
+# python .\rollup_firestore.py --dry-run       # mostra o que seria agregado, sem gravar
+# python .\rollup_firestore.py --rebuild       # apaga t_agg_* e recalcula tudo do zero
+#
+# Agregados incrementais de consumo, para dashboards/relatórios lerem poucas centenas de docs
+# em vez de milhões de leituras:
+#   t_agg_diario/{nivel}__{id}__{AAAA-MM-DD}
+#   t_agg_mensal/{nivel}__{id}__{AAAA_MM}
+# nivel = medidor | cliente | condominio. Campos: f_total_m3, f_qtd_leituras, f_min_valor_m3,
+# f_max_valor_m3, f_qtd_vazamento (+ f_nivel, f_ref_id, f_dia_ref/f_ano_mes_ref, f_updated_at).
+# Dia/mês em UTC, como f_ano_mes_ref das leituras.
+#
+# Marca d'água: t_agg_meta/rollup guarda (f_ingested_at, caminho do doc) da última leitura agregada;
+# a próxima execução lê só items com f_ingested_at posterior (collection group ordenado por
+# f_ingested_at — o Firestore pode pedir a isenção de índice de collection group para esse campo).
+# Agregados e marca d'água vão no mesmo lote de escrita (atômico): um flush nunca passa de um
+# WriteBatch (antecipado quando os agregados pendentes chegam perto de MAX_BATCH_OPS), então uma
+# queda entre flushes não conta leitura em dobro.
+
+from __future__ import annotations
+
+import time, argparse
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from hidro_core import get_db, lazy_import
+
+firestore = lazy_import("google.cloud.firestore")
+
+COL_DIARIO = "t_agg_diario"
+COL_MENSAL = "t_agg_mensal"
+META_DOC = ("t_agg_meta", "rollup")
+MAX_BATCH_OPS = 500
+FLUSH_EVERY = 20_000  # leituras acumuladas em memória antes de gravar agregados + marca d'água
+ACC_MAX = MAX_BATCH_OPS - 1  # agregados por flush: todos + a marca d'água cabem num único lote
+KEYS_PER_READING = 6         # (diário, mensal) x (medidor, cliente, condomínio)
+
+# ---------- Marca d'água ----------
+def load_watermark(db: firestore.Client) -> Optional[Tuple[datetime, str]]:
+    snap = db.collection(META_DOC[0]).document(META_DOC[1]).get()
+    d = (snap.to_dict() or {}) if snap.exists else {}
+    if not d.get("f_watermark_ingested_at"):
+        return None
+    return d["f_watermark_ingested_at"], d.get("f_watermark_doc", "")
+
+def iter_new_items(db: firestore.Client, watermark: Optional[Tuple[datetime, str]], page_size: int = 1000) -> Iterable[Any]:
+    """Items com f_ingested_at após a marca d'água, em ordem (f_ingested_at, nome do doc), paginados."""
+    q = db.collection_group("items").order_by("f_ingested_at").order_by("__name__")
+    cursor = {"f_ingested_at": watermark[0], "__name__": db.document(watermark[1])} if watermark and watermark[1] else None
+    if watermark and not cursor:
+        q = q.where("f_ingested_at", ">", watermark[0])
+    while True:
+        page_q = q.limit(page_size)
+        if cursor is not None:
+            page_q = page_q.start_after(cursor)
+        n = 0
+        for snap in page_q.stream():
+            n += 1
+            cursor = snap
+            yield snap
+        if n < page_size:
+            return
+
+# ---------- Acumulação ----------
+def medidor_directory(db: firestore.Client) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """f_medidor_id -> (f_cliente_id, f_condominio_id), lendo só esses dois campos."""
+    out = {}
+    for s in db.collection("t_medidor").select(["f_cliente_id", "f_condominio_id"]).stream():
+        d = s.to_dict() or {}
+        out[s.id] = (d.get("f_cliente_id"), d.get("f_condominio_id"))
+    return out
+
+def _new_acc() -> Dict[str, Any]:
+    return {"total": 0.0, "n": 0, "min": None, "max": None, "vaz": 0}
+
+def accumulate(acc: Dict[Tuple[str, str, str, str], Dict[str, Any]], d: Dict[str, Any], directory: Dict[str, Tuple[Optional[str], Optional[str]]]) -> bool:
+    """Soma uma leitura nos acumuladores diário/mensal dos três níveis. False se a leitura é inválida."""
+    mid = d.get("f_medidor_id")
+    ts = d.get("f_ts_utc")
+    if not mid or not isinstance(ts, datetime):
+        return False
+    valor = float(d.get("f_valor_m3") or 0.0)
+    vaz = 1 if d.get("f_flag_vazamento") else 0
+    cli, cond = directory.get(mid, (d.get("f_cliente_id"), None))
+    dia = ts.strftime("%Y-%m-%d")
+    mes = ts.strftime("%Y_%m")
+    for nivel, ref in (("medidor", mid), ("cliente", cli or d.get("f_cliente_id")), ("condominio", cond)):
+        if not ref:
+            continue
+        for periodo, chave in (("d", dia), ("m", mes)):
+            a = acc.get((periodo, nivel, ref, chave))
+            if a is None:
+                a = acc[(periodo, nivel, ref, chave)] = _new_acc()
+            a["total"] += valor
+            a["n"] += 1
+            a["min"] = valor if a["min"] is None else min(a["min"], valor)
+            a["max"] = valor if a["max"] is None else max(a["max"], valor)
+            a["vaz"] += vaz
+    return True
+
+def flush_aggregates(db: firestore.Client, acc: Dict[Tuple[str, str, str, str], Dict[str, Any]], watermark_snap: Any) -> int:
+    """Grava os acumuladores com Increment/Minimum/Maximum (merge) e a marca d'água num único lote."""
+    if len(acc) > ACC_MAX:
+        raise ValueError(f"flush com {len(acc)} agregados não cabe num lote (máx. {ACC_MAX})")
+    now = datetime.now(timezone.utc)
+    batch = db.batch()
+    writes = 0
+    for (periodo, nivel, ref, chave), a in acc.items():
+        col = COL_DIARIO if periodo == "d" else COL_MENSAL
+        doc = {
+            "f_nivel": nivel,
+            "f_ref_id": ref,
+            "f_total_m3": firestore.Increment(a["total"]),
+            "f_qtd_leituras": firestore.Increment(a["n"]),
+            "f_min_valor_m3": firestore.Minimum(a["min"]),
+            "f_max_valor_m3": firestore.Maximum(a["max"]),
+            "f_qtd_vazamento": firestore.Increment(a["vaz"]),
+            "f_updated_at": now,
+        }
+        if periodo == "d":
+            doc["f_dia_ref"] = chave
+            doc["f_ano_mes_ref"] = chave[:7]
+        else:
+            doc["f_ano_mes_ref"] = chave.replace("_", "-")
+        batch.set(db.collection(col).document(f"{nivel}__{ref}__{chave}"), doc, merge=True)
+        writes += 1
+    if watermark_snap is not None:
+        d = watermark_snap.to_dict() or {}
+        batch.set(db.collection(META_DOC[0]).document(META_DOC[1]), {
+            "f_watermark_ingested_at": d.get("f_ingested_at"),
+            "f_watermark_doc": watermark_snap.reference.path,
+            "f_updated_at": now,
+        }, merge=True)
+    batch.commit()
+    return writes
+
+# ---------- Comandos ----------
+def cmd_rollup(db: firestore.Client, page_size: int = 1000, flush_every: int = FLUSH_EVERY, dry_run: bool = False) -> None:
+    wm = load_watermark(db)
+    print(f"→ Rollup incremental (marca d'água: {wm[0].isoformat() if wm else 'nenhuma — processando tudo'})")
+    directory = medidor_directory(db)
+    acc: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}
+    t0 = time.perf_counter()
+    lidas = invalidas = writes = pendentes = 0
+    last = None
+    for snap in iter_new_items(db, wm, page_size):
+        if len(acc) > ACC_MAX - KEYS_PER_READING:
+            # a próxima leitura pode não caber no lote: grava até a anterior (marca d'água = `last`)
+            if not dry_run:
+                writes += flush_aggregates(db, acc, last)
+            acc = {}
+            pendentes = 0
+        if not accumulate(acc, snap.to_dict() or {}, directory):
+            invalidas += 1
+        lidas += 1
+        pendentes += 1
+        last = snap
+        if pendentes >= flush_every:
+            if not dry_run:
+                writes += flush_aggregates(db, acc, last)
+            print(f"   … {lidas} leituras, {len(acc)} agregados no último flush ({lidas / (time.perf_counter() - t0):.0f} leituras/s)")
+            acc = {}
+            pendentes = 0
+    if acc and not dry_run:
+        writes += flush_aggregates(db, acc, last)
+    el = time.perf_counter() - t0
+    print(f"✅ {lidas} leituras novas ({invalidas} inválidas) → {writes} gravações de agregados em {el:.1f}s" + (" [dry-run]" if dry_run else ""))
+
+def cmd_rebuild(db: firestore.Client) -> None:
+    print("→ Apagando agregados e marca d'água para recalcular do zero…")
+    for col in (COL_DIARIO, COL_MENSAL):
+        n = db.recursive_delete(db.collection(col))
+        print(f"   {col}: {n} docs apagados")
+    db.collection(META_DOC[0]).document(META_DOC[1]).delete()
+
+def main(argv: Optional[list[str]] = None):
+    ap = argparse.ArgumentParser(description="Agregados diários/mensais incrementais (t_agg_diario / t_agg_mensal)")
+    ap.add_argument("--page-size", type=int, default=1000, help="Docs por página na leitura dos items (default 1000)")
+    ap.add_argument("--flush-every", type=int, default=FLUSH_EVERY, help=f"Leituras por flush de agregados + marca d'água (default {FLUSH_EVERY})")
+    ap.add_argument("--dry-run", action="store_true", help="Só lê e agrega em memória, sem gravar")
+    ap.add_argument("--rebuild", action="store_true", help="Apaga t_agg_* e a marca d'água antes de processar")
+    args = ap.parse_args(argv)
+
+    db = get_db()
+    if args.rebuild and not args.dry_run:
+        cmd_rebuild(db)
+    cmd_rollup(db, args.page_size, args.flush_every, args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,31 @@
 from __future__ import annotations
 
-import os
 import sys
+import json
 import math
+import hashlib
+import time
 import argparse
+import threading
+import queue
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, Any, Iterable, Tuple, Optional
 from datetime import datetime, timedelta, timezone
 
-import pandas as pd
-from dotenv import load_dotenv
+from hidro_core import get_db, lazy_import, preload
+from readings_io import ReadingFileWriter, iter_readings_files
+from meter_aggregates import MeterAggregator, add_reading, apply_aggregates, new_pending, ops_per_meter, unmark
+from cadastro_io import ValidationReport, default_report_path, iter_cadastro_batches, iter_sheet_frames, open_workbook
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-from google.cloud.firestore_v1 import Increment
+firestore = lazy_import("google.cloud.firestore")
+reading_generator = lazy_import("reading_generator")  # puxa o NumPy: só carrega quando simula
+packed_days = lazy_import("packed_days")              # layout dias (1 doc por medidor-dia)
 
 
 # =============== util & init ===============
 
-BASE_DIR = Path(__file__).resolve().parent
-
 def now_utc() -> datetime:
     return datetime.now(timezone.utc)
 
@@ -29,43 +35,15 @@ def parse_bool(x) -> bool:
     s = str(x).strip().lower()
     return s in ("true", "1", "sim", "yes", "y", "t")
 
-def init_db() -> firestore.Client:
-    load_dotenv()
-    cred_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "").strip()
-    if not cred_path:
-        raise RuntimeError("Defina GOOGLE_APPLICATION_CREDENTIALS no .env")
-    cred_path = str((BASE_DIR / cred_path).resolve() if not os.path.isabs(cred_path) else Path(cred_path))
-    if not Path(cred_path).exists():
-        raise FileNotFoundError(f"Credencial não encontrada: {cred_path}")
-    if not firebase_admin._apps:
-        firebase_admin.initialize_app(credentials.Certificate(cred_path))
-    return firestore.client()
-
 def month_bucket(ts: datetime) -> str:
     return f"{ts.year:04d}_{ts.month:02d}"
 
-# =============== leitura do excel ===============
-
-REQUIRED_SHEETS = ["t_localizacao", "t_condominio", "t_cliente", "t_medidor"]
-
-def load_xlsx(xlsx_path: Path) -> Dict[str, pd.DataFrame]:
-    if not xlsx_path.exists():
-        raise FileNotFoundError(f"Arquivo Excel não encontrado: {xlsx_path}")
-    xls = pd.ExcelFile(xlsx_path)
-    dfs: Dict[str, pd.DataFrame] = {}
-    for sheet in REQUIRED_SHEETS:
-        if sheet not in xls.sheet_names:
-            raise ValueError(f"Planilha '{sheet}' ausente no Excel.")
-        df = pd.read_excel(xlsx_path, sheet_name=sheet, dtype=str)
-        df = df.fillna("")
-        if "_id" not in df.columns:
-            raise ValueError(f"Planilha '{sheet}' precisa da coluna '_id'.")
-        dfs[sheet] = df
-    return dfs
+# =============== docs por coleção ===============
+# *_doc(row) -> (_id, doc) só com o que vem da planilha (linhas já normalizadas pelo cadastro_io);
+# é sobre isso que o hash de conteúdo é calculado.
+# Campos de estado (f_created_at, f_ativo, agregados do medidor) só entram na criação (CREATE_ONLY).
 
-# =============== writers por coleção ===============
-
-def upsert_localizacao(db: firestore.Client, row: Dict[str, Any]) -> str:
+def localizacao_doc(row: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
     _id = row["_id"].strip()
     if not _id:
         raise ValueError("t_localizacao: _id obrigatório")
@@ -78,8 +56,6 @@ def upsert_localizacao(db: firestore.Client, row: Dict[str, Any]) -> str:
         "f_cep": row.get("f_cep", ""),
         "f_complemento": row.get("f_complemento", "") or None,
         "f_geo": None,
-        "f_created_at": now_utc(),
-        "f_ativo": True,
     }
     # coordenadas opcionais
     lat = row.get("f_geo_lat", "")
@@ -89,33 +65,27 @@ def upsert_localizacao(db: firestore.Client, row: Dict[str, Any]) -> str:
             doc["f_geo"] = {"lat": float(lat), "lon": float(lon)}
     except Exception:
         pass
+    return _id, doc
 
-    db.collection("t_localizacao").document(_id).set(doc, merge=True)
-    return _id
-
-def upsert_condominio(db: firestore.Client, row: Dict[str, Any]) -> str:
+def condominio_doc(row: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
     _id = row["_id"].strip()
     if not _id:
         raise ValueError("t_condominio: _id obrigatório")
-    doc = {
+    return _id, {
         "f_nome_condominio": row.get("f_nome_condominio", ""),
         "f_tipo": row.get("f_tipo", "condominio"),
         "f_localizacao": row.get("f_localizacao", "") or None,
         "f_nome_resp": row.get("f_nome_resp", "") or None,
         "f_fone_resp": row.get("f_fone_resp", "") or None,
         "f_email_resp": row.get("f_email_resp", "") or None,
-        "f_created_at": now_utc(),
-        "f_ativo": True,
     }
-    db.collection("t_condominio").document(_id).set(doc, merge=True)
-    return _id
 
-def upsert_cliente(db: firestore.Client, row: Dict[str, Any]) -> str:
+def cliente_doc(row: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
     _id = row["_id"].strip()
     if not _id:
         raise ValueError("t_cliente: _id obrigatório")
     cpf = str(row.get("f_cpf", "")).replace(".", "").replace("-", "").strip()
-    doc = {
+    return _id, {
         "f_nome_cliente": row.get("f_nome_cliente", ""),
         "f_cpf": cpf,
         "f_condominio_id": row.get("f_condominio_id", "") or None,
@@ -124,17 +94,13 @@ def upsert_cliente(db: firestore.Client, row: Dict[str, Any]) -> str:
         "f_localizacao": row.get("f_localizacao", "") or None,
         "f_email": row.get("f_email", "") or None,
         "f_telefone": row.get("f_telefone", "") or None,
-        "f_created_at": now_utc(),
-        "f_ativo": True,
     }
-    db.collection("t_cliente").document(_id).set(doc, merge=True)
-    return _id
 
-def upsert_medidor(db: firestore.Client, row: Dict[str, Any]) -> str:
+def medidor_doc(row: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
     _id = row["_id"].strip()
     if not _id:
         raise ValueError("t_medidor: _id obrigatório (ex.: MTR-000001)")
-    doc = {
+    return _id, {
         "f_cliente_id": row.get("f_cliente_id", "") or None,
         "f_condominio_id": row.get("f_condominio_id", "") or None,
         "f_tem_valvula": parse_bool(row.get("f_tem_valvula", False)),
@@ -142,71 +108,284 @@ def upsert_medidor(db: firestore.Client, row: Dict[str, Any]) -> str:
         "f_modelo_hw": row.get("f_modelo_hw", "") or None,
         "f_fw_version": row.get("f_fw_version", "") or None,
         "f_nota_instalacao": row.get("f_nota_instalacao", "") or None,
-        "f_created_at": now_utc(),
-        "f_ativo": True,
-        "f_last_ts_utc": None,
-        "f_last_valor_m3": None,
-        "f_monthly_total_m3": {},
     }
-    db.collection("t_medidor").document(_id).set(doc, merge=True)
+
+# ordem de carga = ordem de CADASTRO_SHEETS
+DOC_BUILDERS = {
+    "t_localizacao": localizacao_doc,
+    "t_condominio": condominio_doc,
+    "t_cliente": cliente_doc,
+    "t_medidor": medidor_doc,
+}
+
+# gravados só quando o doc é novo: uma recarga da planilha não zera os agregados do medidor
+CREATE_ONLY = {
+    "t_medidor": {"f_last_ts_utc": None, "f_last_valor_m3": None, "f_monthly_total_m3": {}},
+}
+
+def _upsert(db: firestore.Client, col: str, row: Dict[str, Any]) -> str:
+    """Um doc pelo mesmo caminho do bootstrap (sync_collection): CREATE_ONLY só se for novo, hash idêntico."""
+    _id, _ = DOC_BUILDERS[col](row)
+    sync_collection(db, col, [row])
     return _id
 
-# =============== bootstrap a partir do excel ===============
+def upsert_localizacao(db: firestore.Client, row: Dict[str, Any]) -> str:
+    return _upsert(db, "t_localizacao", row)
 
-def cmd_bootstrap(db: firestore.Client, xlsx: Path) -> None:
-    dfs = load_xlsx(xlsx)
+def upsert_condominio(db: firestore.Client, row: Dict[str, Any]) -> str:
+    return _upsert(db, "t_condominio", row)
 
-    print("→ Carregando t_localizacao …")
-    for _, r in dfs["t_localizacao"].iterrows():
-        upsert_localizacao(db, r.to_dict())
+def upsert_cliente(db: firestore.Client, row: Dict[str, Any]) -> str:
+    return _upsert(db, "t_cliente", row)
 
-    print("→ Carregando t_condominio …")
-    for _, r in dfs["t_condominio"].iterrows():
-        upsert_condominio(db, r.to_dict())
+def upsert_medidor(db: firestore.Client, row: Dict[str, Any]) -> str:
+    return _upsert(db, "t_medidor", row)
 
-    print("→ Carregando t_cliente …")
-    for _, r in dfs["t_cliente"].iterrows():
-        upsert_cliente(db, r.to_dict())
+# =============== bootstrap a partir do excel (incremental) ===============
 
-    print("→ Carregando t_medidor …")
-    for _, r in dfs["t_medidor"].iterrows():
-        upsert_medidor(db, r.to_dict())
+GET_ALL_CHUNK = 300  # refs por get_all
 
-    print("✅ bootstrap concluído (IDs respeitados).")
+def content_hash(doc: Dict[str, Any]) -> str:
+    """Hash estável do conteúdo normalizado (chaves ordenadas)."""
+    raw = json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
 
-# =============== simulação de leituras ===============
+def load_manifest(path: Path) -> Dict[str, Dict[str, str]]:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {}
 
-def write_reading(db: firestore.Client, f_medidor_id: str, f_cliente_id: Optional[str], ts: datetime, m3_delta: float, pulsos: int):
-    month = month_bucket(ts)
-    med_ref = db.collection("t_medidor").document(f_medidor_id)
+def save_manifest(path: Path, manifest: Dict[str, Dict[str, str]]) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
 
-    # garante o "bucket" visível no console
-    month_doc = med_ref.collection("t_leituras").document(month)
-    month_doc.set({"f_bucket": month, "f_created_at": ts}, merge=True)
+def fetch_hashes(db: firestore.Client, col: str, ids: list[str]) -> Dict[str, str]:
+    """f_content_hash atual dos docs existentes ("" se o doc é anterior ao hash); ausentes não aparecem."""
+    out: Dict[str, str] = {}
+    for i in range(0, len(ids), GET_ALL_CHUNK):
+        refs = [db.collection(col).document(x) for x in ids[i:i + GET_ALL_CHUNK]]
+        for snap in db.get_all(refs, field_paths=["f_content_hash"]):
+            if snap.exists:
+                out[snap.id] = (snap.to_dict() or {}).get("f_content_hash") or ""
+    return out
+
+def sync_collection(db: firestore.Client, col: str, rows: Iterable[Dict[str, Any]], manifest: Optional[Dict[str, Dict[str, str]]] = None, force: bool = False) -> Tuple[int, int, int]:
+    """
+    Grava só os docs novos ou alterados de uma coleção, em lotes de até MAX_BATCH_OPS.
+    O hash atual vem do manifesto local (se dado) e, para ids fora dele, de get_all no Firestore.
+    Retorna (novos, alterados, iguais).
+    """
+    docs: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        _id, doc = DOC_BUILDERS[col](row)
+        docs[_id] = doc
+    hashes = {i: content_hash(d) for i, d in docs.items()}
+    known = manifest.setdefault(col, {}) if manifest is not None else {}
+    current = {i: known[i] for i in docs if i in known}
+    current.update(fetch_hashes(db, col, [i for i in docs if i not in known]))
+
+    now = now_utc()
+    batch = db.batch()
+    pending: list[str] = []
+    novos = alterados = 0
+
+    def commit() -> None:
+        batch.commit()
+        for i in pending:
+            known[i] = hashes[i]
+        pending.clear()
+
+    for _id, doc in docs.items():
+        h = hashes[_id]
+        old = current.get(_id)
+        if old == h and not force:
+            known[_id] = h
+            continue
+        payload = {**doc, "f_content_hash": h, "f_updated_at": now}
+        if old is None:
+            payload.update(CREATE_ONLY.get(col, {}))
+            payload.update({"f_created_at": now, "f_ativo": True})
+            novos += 1
+        else:
+            alterados += 1
+        batch.set(db.collection(col).document(_id), payload, merge=True)
+        pending.append(_id)
+        if len(pending) >= MAX_BATCH_OPS:
+            commit()
+            batch = db.batch()
+    if pending:
+        commit()
+    return novos, alterados, len(docs) - novos - alterados
+
+def cmd_bootstrap(db: firestore.Client, xlsx: Path, manifest_path: Optional[Path] = None, force: bool = False,
+                  errors_path: Optional[Path] = None, strict: bool = False) -> None:
+    errors_path = errors_path or default_report_path(xlsx)
+    wb = open_workbook(xlsx)  # aberto uma vez: a passada --strict e a carga reaproveitam
+    try:
+        _bootstrap(db, xlsx, wb, manifest_path, force, errors_path, strict)
+    finally:
+        wb.close()
+
+def _bootstrap(db: firestore.Client, xlsx: Path, wb: Any, manifest_path: Optional[Path], force: bool, errors_path: Path, strict: bool) -> None:
+    if strict:
+        # passada só de validação: nada é gravado se houver qualquer erro
+        report = ValidationReport()
+        for _ in iter_cadastro_batches(xlsx, report, workbook=wb):
+            pass
+        if report:
+            report.write_csv(errors_path)
+            print(f"❌ {len(report)} linhas com erro ({report.summary()}); nada gravado → {errors_path}")
+            sys.exit(1)
+
+    report = ValidationReport()
+    manifest = load_manifest(manifest_path) if manifest_path else None
+    t0 = time.perf_counter()
+    stats: Dict[str, list[int]] = {}
+    try:
+        for col, rows in iter_cadastro_batches(xlsx, report, workbook=wb):
+            if col not in stats:
+                print(f"→ Carregando {col} …")
+                stats[col] = [0, 0, 0]
+            for i, v in enumerate(sync_collection(db, col, rows, manifest, force)):
+                stats[col][i] += v
+    finally:
+        if manifest_path and manifest is not None:
+            save_manifest(manifest_path, manifest)
+    for col, (novos, alterados, iguais) in stats.items():
+        print(f"   {col}: {novos} novos, {alterados} alterados, {iguais} sem mudança")
+    if report:
+        report.write_csv(errors_path)
+        print(f"⚠️  {len(report)} linhas com erro ficaram fora da carga → {errors_path}")
+    total_writes = sum(n + a for n, a, _ in stats.values())
+    print(f"✅ bootstrap concluído (IDs respeitados): {total_writes} gravações em {time.perf_counter() - t0:.1f}s.")
 
-    # grava item
-    items_ref = month_doc.collection("items")
-    doc = {
+# =============== simulação de leituras ===============
+
+def build_reading_doc(f_medidor_id: str, f_cliente_id: Optional[str], ts: datetime, m3_delta: float, pulsos: int, status_sensor: int = 1, flag_vazamento: bool = False) -> Dict[str, Any]:
+    month = month_bucket(ts)
+    return {
         "f_medidor_id": f_medidor_id,
         "f_cliente_id": f_cliente_id,
         "f_ts_utc": ts,
         "f_ano_mes_ref": month.replace("_","-"),
         "f_valor_m3": float(m3_delta),
         "f_pulsos": int(pulsos),
-        "f_status_sensor": 1,
-        "f_flag_vazamento": False,
+        "f_status_sensor": int(status_sensor),
+        "f_flag_vazamento": bool(flag_vazamento),
         "f_ingested_at": firestore.SERVER_TIMESTAMP,
         "f_archived_at": None,
     }
-    items_ref.add(doc)
+
+def write_reading(db: firestore.Client, f_medidor_id: str, f_cliente_id: Optional[str], ts: datetime, m3_delta: float, pulsos: int, status_sensor: int = 1, flag_vazamento: bool = False):
+    month = month_bucket(ts)
+    med_ref = db.collection("t_medidor").document(f_medidor_id)
+
+    # garante o "bucket" visível no console
+    month_doc = med_ref.collection("t_leituras").document(month)
+    month_doc.set({"f_bucket": month, "f_created_at": ts}, merge=True)
+
+    # grava item
+    items_ref = month_doc.collection("items")
+    items_ref.add(build_reading_doc(f_medidor_id, f_cliente_id, ts, m3_delta, pulsos, status_sensor, flag_vazamento))
 
     # agrega no medidor
     med_ref.update({
         "f_last_ts_utc": ts,
         "f_last_valor_m3": float(m3_delta),
-        f"f_monthly_total_m3.{month}": Increment(float(m3_delta)),
+        f"f_monthly_total_m3.{month}": firestore.Increment(float(m3_delta)),
     })
 
+MAX_BATCH_OPS = 500  # limite de operações por commit (WriteBatch)
+
+class BatchedReadingWriter:
+    """
+    Caminho em lote do write_reading: acumula inserts de items num WriteBatch
+    e faz commit a cada `batch_size` operações.
+    - o doc "bucket" (AAAA_MM) é gravado 1x por (medidor, mês) nesta execução;
+    - f_last_* e f_monthly_total_m3 são coalescidos: 1 update por medidor a cada flush,
+      no doc do medidor ou num shard (shards > 0), ou entregues a um MeterAggregator (write-behind);
+      com aggregates=False não são gravados (restauração de leituras já somadas no medidor).
+    Não é thread-safe: use uma instância por thread.
+    """
+
+    def __init__(self, db: firestore.Client, batch_size: int = MAX_BATCH_OPS, shards: int = 0, aggregator: Optional[MeterAggregator] = None,
+                 aggregates: bool = True):
+        if not 3 <= batch_size <= MAX_BATCH_OPS:
+            raise ValueError(f"batch_size deve estar entre 3 e {MAX_BATCH_OPS}")
+        self.db = db
+        self.batch_size = batch_size
+        self.shards = shards
+        self.aggregator = aggregator
+        self.aggregates = aggregates
+        self._med_ops = 0 if aggregator is not None or not aggregates else ops_per_meter(shards)
+        self._batch = db.batch()
+        self._ops = 0
+        self._readings = 0
+        self._buckets_seen: set[Tuple[str, str]] = set()
+        # f_medidor_id -> {"ts", "valor", "months": {AAAA_MM: soma_m3}}
+        self._pending_med: Dict[str, Dict[str, Any]] = {}
+        self.total_readings = 0
+        self.total_commits = 0
+
+    def add(self, f_medidor_id: str, f_cliente_id: Optional[str], ts: datetime, m3_delta: float, pulsos: int, status_sensor: int = 1, flag_vazamento: bool = False) -> int:
+        """Enfileira uma leitura. Retorna nº de leituras commitadas se o lote encheu (senão 0)."""
+        month = month_bucket(ts)
+        flushed = 0
+        # reserva espaço para: bucket novo + item + agregados do medidor (se ainda não pendente)
+        needed = 1 + ((f_medidor_id, month) not in self._buckets_seen) + (f_medidor_id not in self._pending_med) * self._med_ops
+        if self._ops + needed > self.batch_size:
+            flushed = self.flush()
+            needed = 1 + ((f_medidor_id, month) not in self._buckets_seen) + self._med_ops
+
+        med_ref = self.db.collection("t_medidor").document(f_medidor_id)
+        month_doc = med_ref.collection("t_leituras").document(month)
+        if (f_medidor_id, month) not in self._buckets_seen:
+            self._batch.set(month_doc, {"f_bucket": month, "f_created_at": ts}, merge=True)
+            self._buckets_seen.add((f_medidor_id, month))
+
+        self._batch.set(month_doc.collection("items").document(), build_reading_doc(f_medidor_id, f_cliente_id, ts, m3_delta, pulsos, status_sensor, flag_vazamento))
+
+        if self.aggregates:
+            agg = self._pending_med.get(f_medidor_id)
+            if agg is None:
+                agg = self._pending_med[f_medidor_id] = new_pending()
+            add_reading(agg, ts, m3_delta, month)
+
+        self._ops += needed
+        self._readings += 1
+        return flushed
+
+    def flush(self) -> int:
+        """Commita o lote pendente (items + buckets + agregados). Retorna nº de leituras gravadas."""
+        if self._readings == 0 and not self._pending_med:
+            return 0
+        if self.aggregator is None:
+            for mid, agg in self._pending_med.items():
+                apply_aggregates(self._batch, self.db, mid, agg, self.shards)
+        try:
+            self._batch.commit()
+        except Exception:
+            if self.aggregator is None and self.shards:
+                unmark(self.db, self._pending_med)
+            raise
+        if self.aggregator is not None:
+            self.aggregator.merge(self._pending_med)
+        n = self._readings
+        self.total_readings += n
+        self.total_commits += 1
+        self._batch = self.db.batch()
+        self._ops = 0
+        self._readings = 0
+        self._pending_med = {}
+        return n
+
+def new_reading_writer(db: firestore.Client, batch_size: int = MAX_BATCH_OPS, layout: str = "items", **opts):
+    """BatchedReadingWriter (layout items) ou packed_days.PackedDayWriter (layout dias); mesma interface."""
+    if layout == "dias":
+        return packed_days.PackedDayWriter(db, batch_size, **opts)
+    return BatchedReadingWriter(db, batch_size, **opts)
+
 def iter_medidores(db: firestore.Client, only_ids: Optional[Iterable[str]], limit: Optional[int]) -> Iterable[Tuple[str, Optional[str]]]:
     if only_ids:
         for mid in only_ids:
@@ -228,58 +407,274 @@ def minutes_for(freq: str) -> int:
         raise ValueError("freq inválida; use 5m | 15m | 1h | 6h | 1d")
     return m[freq]
 
-def cmd_simulate(db: firestore.Client, start: str, end: str, freq: str, limit_medidores: int | None, medidor_ids: list[str] | None):
+class SimProgress:
+    """Contador agregado (thread-safe) de leituras gravadas, com log periódico de leituras/s."""
+
+    def __init__(self, total_medidores: Optional[int] = None, every_s: float = 5.0):
+        self.total_medidores = total_medidores
+        self.every_s = every_s
+        self.readings = 0
+        self.medidores_ok = 0
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._last_log = self._t0
+
+    def add(self, n: int) -> None:
+        with self._lock:
+            self.readings += n
+            now = time.perf_counter()
+            if now - self._last_log >= self.every_s:
+                self._last_log = now
+                meds = f", {self.medidores_ok}/{self.total_medidores} medidores" if self.total_medidores else ""
+                print(f"   … {self.readings} leituras{meds}, {self.rate():.0f} leituras/s")
+
+    def medidor_ok(self, mid: str, n: int) -> None:
+        with self._lock:
+            self.medidores_ok += 1
+            print(f"   {mid}: ok ({n} leituras) [{self.medidores_ok}/{self.total_medidores}]")
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def rate(self) -> float:
+        el = self.elapsed()
+        return self.readings / el if el > 0 else 0.0
+
+def simulate_medidor(db: firestore.Client, mid: str, cli: Optional[str], t0: datetime, t1: datetime, step_min: int, batch_size: int, progress: SimProgress, gen_opts: Optional[Dict[str, Any]] = None, writer_opts: Optional[Dict[str, Any]] = None) -> int:
+    """Gera (vetorizado, em blocos) e grava a série de um medidor em ordem de f_ts_utc. Retorna nº de leituras."""
+    writer = new_reading_writer(db, batch_size, **(writer_opts or {})) if batch_size > 1 else None
+    n = 0
+    for chunk in reading_generator.iter_medidor_readings(mid, t0, t1, step_min, **(gen_opts or {})):
+        for ts, m3, pulsos, status, vazamento in reading_generator.iter_chunk_readings(chunk):
+            if writer is not None:
+                flushed = writer.add(mid, cli, ts, m3, pulsos, status, vazamento)
+                if flushed:
+                    progress.add(flushed)
+            else:
+                write_reading(db, mid, cli, ts, m3, pulsos, status, vazamento)
+                progress.add(1)
+            n += 1
+    if writer is not None:
+        progress.add(writer.flush())
+    progress.medidor_ok(mid, n)
+    return n
+
+def cmd_simulate(db: firestore.Client, start: str, end: str, freq: str, limit_medidores: int | None, medidor_ids: list[str] | None, batch_size: int = MAX_BATCH_OPS, workers: int = 1, gen_opts: Optional[Dict[str, Any]] = None, writer_opts: Optional[Dict[str, Any]] = None):
     step_min = minutes_for(freq)
     t0 = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
     t1 = datetime.fromisoformat(end).replace(tzinfo=timezone.utc)
-    delta = timedelta(minutes=step_min)
 
     med_list = list(iter_medidores(db, medidor_ids, limit_medidores))
     if not med_list:
         print("Nenhum medidor encontrado para simular.")
         return
 
-    print(f"→ Gerando leituras {start} .. {end} freq={freq} para {len(med_list)} medidor(es)…")
-    total = 0
-    for mid, cli in med_list:
-        ts = t0
-        # consumo base por passo (delta), com pequena variação
-        base = 0.010  # ~10 litros/pass
-        while ts <= t1:
-            noise = (os.urandom(1)[0] / 255.0 - 0.5) * 0.006  # ~±3 litros
-            m3 = max(0.0, base + noise)
-            pulsos = int(round(m3 * 1000))  # 1 pulso = 1 litro (exemplo)
-            write_reading(db, mid, cli, ts, m3, pulsos)
-            total += 1
-            ts += delta
-        print(f"   {mid}: ok")
-
-    print(f"✅ leituras geradas: {total}")
+    workers = max(1, min(workers, len(med_list)))
+    preload(firestore, reading_generator, packed_days)
+    modo = f"lote={batch_size}" if batch_size > 1 else "1 leitura/RPC"
+    print(f"→ Gerando leituras {start} .. {end} freq={freq} para {len(med_list)} medidor(es) ({modo}, workers={workers})…")
+    progress = SimProgress(len(med_list))
+
+    # cada medidor fica inteiro numa thread (mantém a ordem por f_ts_utc dentro do medidor);
+    # o client Firestore é thread-safe, o BatchedReadingWriter é criado por medidor.
+    if workers == 1:
+        for mid, cli in med_list:
+            simulate_medidor(db, mid, cli, t0, t1, step_min, batch_size, progress, gen_opts, writer_opts)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futs = [ex.submit(simulate_medidor, db, mid, cli, t0, t1, step_min, batch_size, progress, gen_opts, writer_opts) for mid, cli in med_list]
+            for fut in as_completed(futs):
+                fut.result()
+
+    print(f"✅ leituras geradas: {progress.readings} em {progress.elapsed():.1f}s ({progress.rate():.0f} leituras/s)")
+
+# =============== simulação offline (arquivo) e carga ===============
+
+def iter_medidores_offline(xlsx: Optional[Path], only_ids: Optional[Iterable[str]], limit: Optional[int]) -> Iterable[Tuple[str, Optional[str]]]:
+    """Lista de medidores sem Firestore: --medidor (sem cliente) ou a aba t_medidor do Excel."""
+    if only_ids:
+        yield from ((mid, None) for mid in only_ids)
+        return
+    if xlsx is None:
+        raise ValueError("simulação offline precisa de --medidor ou --xlsx (aba t_medidor)")
+    n = 0
+    for df in iter_sheet_frames(xlsx, "t_medidor"):
+        clis = df["f_cliente_id"] if "f_cliente_id" in df.columns else [""] * len(df)
+        for mid, cli in zip(df["_id"].str.strip(), clis):
+            if not mid:
+                continue
+            if limit is not None and n >= limit:
+                return
+            n += 1
+            yield (mid, cli.strip() or None)
+
+def cmd_simulate_to_file(out: Path, start: str, end: str, freq: str, med_list: list[Tuple[str, Optional[str]]], gen_opts: Optional[Dict[str, Any]] = None) -> None:
+    step_min = minutes_for(freq)
+    t0 = datetime.fromisoformat(start).replace(tzinfo=timezone.utc)
+    t1 = datetime.fromisoformat(end).replace(tzinfo=timezone.utc)
+    if not med_list:
+        print("Nenhum medidor encontrado para simular.")
+        return
+
+    print(f"→ Gerando leituras {start} .. {end} freq={freq} para {len(med_list)} medidor(es) → {out}")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    progress = SimProgress(len(med_list))
+    with ReadingFileWriter(out) as w:
+        for mid, cli in med_list:
+            n = 0
+            for chunk in reading_generator.iter_medidor_readings(mid, t0, t1, step_min, **(gen_opts or {})):
+                n += w.write_chunk(mid, cli, chunk)
+            progress.add(n)
+            progress.medidor_ok(mid, n)
+    print(f"✅ leituras geradas: {progress.readings} em {progress.elapsed():.1f}s ({progress.rate():.0f} leituras/s) → {out}")
+
+_LOAD_DONE = None  # sentinela da fila de cada worker
+LOAD_PUT_TIMEOUT_S = 0.5  # o produtor confere se o worker ainda está vivo a cada intervalo
+
+def _load_worker(db: firestore.Client, q: "queue.Queue", batch_size: int, progress: SimProgress, writer_opts: Optional[Dict[str, Any]] = None) -> None:
+    writer = new_reading_writer(db, batch_size, **(writer_opts or {}))
+    while True:
+        rows = q.get()
+        if rows is _LOAD_DONE:
+            break
+        for mid, cli, ts, m3, pulsos, status, vazamento in rows:
+            flushed = writer.add(mid, cli, ts, m3, pulsos, status, vazamento)
+            if flushed:
+                progress.add(flushed)
+    progress.add(writer.flush())
+
+def cmd_load(db: firestore.Client, paths: list[Path], batch_size: int = MAX_BATCH_OPS, workers: int = 4, chunk_rows: int = 1000, writer_opts: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Carrega arquivos do simulate offline no layout t_medidor/{id}/t_leituras/{AAAA_MM}/items,
+    com f_monthly_total_m3 agregado (exceto com aggregates=False nos writer_opts). Cada medidor é roteado sempre para o mesmo worker
+    (crc32 do id), então a ordem por f_ts_utc dentro do medidor é preservada.
+    Atenção: carregar o mesmo arquivo duas vezes duplica items e totais.
+    """
+    if not 3 <= batch_size <= MAX_BATCH_OPS:
+        raise ValueError(f"load grava sempre em lote: batch_size deve estar entre 3 e {MAX_BATCH_OPS}")
+    workers = max(1, workers)
+    preload(firestore, packed_days)
+    print(f"→ Carregando {len(paths)} arquivo(s) (lote={batch_size}, workers={workers})…")
+    progress = SimProgress()
+    queues = [queue.Queue(maxsize=8) for _ in range(workers)]  # fila limitada = back-pressure na leitura
+    pending: list[list] = [[] for _ in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = [ex.submit(_load_worker, db, q, batch_size, progress, writer_opts) for q in queues]
+
+        def put(k: int, item) -> None:
+            # worker morto não consome mais a fila: sem o timeout o produtor travaria no put()
+            while True:
+                if futs[k].done():
+                    futs[k].result()  # propaga a exceção do worker
+                    raise RuntimeError(f"worker {k} terminou antes do fim da carga")
+                try:
+                    queues[k].put(item, timeout=LOAD_PUT_TIMEOUT_S)
+                    return
+                except queue.Full:
+                    pass
+
+        try:
+            for row in iter_readings_files(paths):
+                k = zlib.crc32(row[0].encode("utf-8")) % workers
+                pending[k].append(row)
+                if len(pending[k]) >= chunk_rows:
+                    put(k, pending[k])
+                    pending[k] = []
+        finally:
+            for k in range(workers):
+                if futs[k].done():
+                    continue  # morto: nada a entregar (a exceção sai no result() abaixo)
+                try:
+                    if pending[k]:
+                        put(k, pending[k])
+                    put(k, _LOAD_DONE)
+                except Exception:
+                    pass  # o worker morreu no meio do caminho: o result() abaixo mostra o motivo
+        for fut in futs:
+            fut.result()
+    print(f"✅ leituras carregadas: {progress.readings} em {progress.elapsed():.1f}s ({progress.rate():.0f} leituras/s)")
 
 # =============== main cli ===============
 
-def main():
+def batch_size_arg(s: str) -> int:
+    """--batch-size: 1 (uma leitura por RPC) ou 3..MAX_BATCH_OPS (item + 2 agregados por leitura)."""
+    try:
+        n = int(s)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"valor inválido: {s!r}") from None
+    if n != 1 and not 3 <= n <= MAX_BATCH_OPS:
+        raise argparse.ArgumentTypeError(f"deve ser 1 ou estar entre 3 e {MAX_BATCH_OPS} (recebido {n})")
+    return n
+
+def main(argv: Optional[list[str]] = None):
     ap = argparse.ArgumentParser(description="Seed/Simulação Firestore (IDs fixos via Excel)")
-    ap.add_argument("--mode", required=True, choices=["bootstrap", "simulate"], help="bootstrap (carga via Excel) ou simulate (gerar leituras)")
-    ap.add_argument("--xlsx", help="Caminho do Excel (obrigatório no bootstrap)")
+    ap.add_argument("--mode", required=True, choices=["bootstrap", "simulate", "load"], help="bootstrap (carga via Excel), simulate (gerar leituras) ou load (carregar arquivo do simulate --out)")
+    ap.add_argument("--manifest", help="bootstrap: manifesto local (JSON) com o hash de cada doc gravado; evita ler os hashes do Firestore")
+    ap.add_argument("--force", action="store_true", help="bootstrap: regrava todos os docs mesmo sem mudança")
+    ap.add_argument("--errors", help="bootstrap: relatório CSV das linhas inválidas (default <xlsx>_erros.csv)")
+    ap.add_argument("--strict", action="store_true", help="bootstrap: valida a planilha inteira antes e não grava nada se houver erro")
+    ap.add_argument("--xlsx", help="Caminho do Excel (obrigatório no bootstrap; no simulate --out fornece a lista de medidores)")
     # simulate
     ap.add_argument("--start", default="2024-03-11", help="YYYY-MM-DD (default 2024-03-11)")
     ap.add_argument("--end",   default="2025-09-18", help="YYYY-MM-DD (default 2025-09-18)")
     ap.add_argument("--freq",  default="1h", choices=["5m","15m","1h","6h","1d"], help="Frequência entre leituras (default 1h)")
     ap.add_argument("--limit-medidores", type=int, default=5, help="Limita nº de medidores (apenas simulate)")
     ap.add_argument("--medidor", action="append", help="IDs específicos (pode repetir a flag) ex.: --medidor MTR-000001 --medidor MTR-000002")
-    args = ap.parse_args()
-
-    db = init_db()
+    ap.add_argument("--batch-size", type=batch_size_arg, default=MAX_BATCH_OPS, help=f"Operações por commit em lote (3..{MAX_BATCH_OPS}, default {MAX_BATCH_OPS}); 1 = uma leitura por RPC (só simulate)")
+    ap.add_argument("--seed", type=int, help="Semente do gerador (mesma semente => mesmas séries por medidor)")
+    ap.add_argument("--leaks-per-month", type=float, default=0.5, help="Média de episódios de vazamento injetados por medidor/mês (default 0.5)")
+    ap.add_argument("--dropouts-per-month", type=float, default=1.0, help="Média de quedas de sensor por medidor/mês (default 1.0)")
+    ap.add_argument("--workers", type=int, default=1, help="Threads em paralelo (1 medidor por vez em cada thread; default 1)")
+    ap.add_argument("--layout", choices=["items", "dias"], default="items", help="simulate/load: items (1 doc por leitura, default) ou dias (1 doc por medidor-dia, ver packed_days.py)")
+    ap.add_argument("--shards", type=int, default=0, help="simulate/load: grava f_last_*/f_monthly_total_m3 em N shards (t_medidor/{id}/t_shards) em vez do doc do medidor")
+    ap.add_argument("--write-behind", type=float, default=0.0, help="simulate/load: agrega f_last_*/f_monthly_total_m3 em memória e grava a cada N s (0 = junto com os items)")
+    ap.add_argument("--no-aggregates", action="store_true", help="load: não mexe em f_last_*/f_monthly_total_m3 (restaurar leituras do archive_firestore, já somadas no medidor)")
+    ap.add_argument("--out", help="simulate: grava as leituras em arquivo (.jsonl, .jsonl.gz ou .parquet) sem tocar no Firestore")
+    ap.add_argument("--input", action="append", help="load: arquivo(s) gerados pelo simulate --out (pode repetir)")
+    args = ap.parse_args(argv)
+
+    gen_opts = {"seed": args.seed, "leaks_per_month": args.leaks_per_month, "dropouts_per_month": args.dropouts_per_month}
+    if args.mode == "simulate" and args.out:
+        med_list = list(iter_medidores_offline(Path(args.xlsx).resolve() if args.xlsx else None, args.medidor, args.limit_medidores))
+        cmd_simulate_to_file(Path(args.out).resolve(), args.start, args.end, args.freq, med_list, gen_opts)
+        return
+    if args.layout == "dias" and args.batch_size < 3:
+        print("→ --layout dias grava em lote: use --batch-size ≥ 3")
+        sys.exit(2)
+    if args.mode == "load" and args.batch_size == 1:
+        print(f"→ load grava sempre em lote: use --batch-size entre 3 e {MAX_BATCH_OPS}")
+        sys.exit(2)
+    if args.mode == "load" and not args.input:
+        print("→ use --input para apontar o(s) arquivo(s) gerados com simulate --out")
+        sys.exit(2)
+    if args.no_aggregates and (args.mode != "load" or args.shards or args.write_behind > 0):
+        print("→ --no-aggregates é só do load e não combina com --shards/--write-behind")
+        sys.exit(2)
+
+    db = get_db()
 
     if args.mode == "bootstrap":
         if not args.xlsx:
             print("→ use --xlsx para apontar o template (ex.: Template_Carga_Firestore_v2.xlsx)")
             sys.exit(2)
         xlsx = Path(args.xlsx).resolve()
-        cmd_bootstrap(db, xlsx)
-    elif args.mode == "simulate":
-        cmd_simulate(db, args.start, args.end, args.freq, args.limit_medidores, args.medidor)
+        cmd_bootstrap(db, xlsx, Path(args.manifest).resolve() if args.manifest else None, args.force,
+                      Path(args.errors).resolve() if args.errors else None, args.strict)
+        return
+    # agregados do medidor: no mesmo commit dos items (default), em shards e/ou write-behind
+    aggregator = MeterAggregator(db, args.write_behind, args.shards).start() if args.write_behind > 0 else None
+    writer_opts = {"shards": args.shards, "aggregator": aggregator, "layout": args.layout}
+    if args.no_aggregates:
+        writer_opts["aggregates"] = False
+    try:
+        if args.mode == "simulate":
+            cmd_simulate(db, args.start, args.end, args.freq, args.limit_medidores, args.medidor, args.batch_size, args.workers, gen_opts, writer_opts)
+        elif args.mode == "load":
+            cmd_load(db, [Path(p).resolve() for p in args.input], args.batch_size, max(args.workers, 1), writer_opts=writer_opts)
+    finally:
+        if aggregator is not None:
+            aggregator.close()
+            print(f"   agregados do medidor (write-behind): {aggregator.total_meter_updates} updates em {aggregator.total_commits} commits")
 
 if __name__ == "__main__":
     main()
@@ -1,53 +1,30 @@
-# python .\teste_read_all.py
-
-# Exportar JSONL do mês corrente:
-# # python .\teste_read_all.py --dump-json                        #JSONL do mês corrente:
-# → arquivo em: .\exports\leituras_<AAAA_MM>.jsonl
-
-
-# python .\teste_read_all.py --month 2025_09 --dump-json        # mês específico (ex.: setembro/2025):
-
-
-
-# python .\teste_read_all.py --dump-json --medidor MTR-0001     # Exportar apenas de um medidor:
-# → arquivo em: .\exports\leituras_<AAAA_MM>_MTR-0001.jsonl
-
+# python .\teste_read_all.py --summary                          # 1 linha por medidor, só com os docs de t_medidor
+# python .\teste_read_all.py --summary --limit 200 --after MTR-000200   # próxima página
+# python .\teste_read_all.py --medidor MTR-000001 --items 5    # detalhe: buckets + últimas 5 leituras de cada mês
+# python .\teste_read_all.py --months 2 --items 3              # detalhe dos 2 meses mais recentes de cada medidor
+# python .\teste_read_all.py --cadastro                          # também lista t_condominio / t_localizacao / t_cliente
+#
+# Custo por página de medidores:
+#   --summary  → 1 query (ou 1 get_all com --medidor); meses, totais e última leitura vêm de
+#                f_monthly_total_m3 / f_last_* do próprio t_medidor, sem tocar em items
+#                (+ 1 leitura de t_shards por medidor com f_shards > 0, ver meter_aggregates.py)
+#   detalhe    → + 1 listagem de buckets por medidor e 2 queries por bucket mostrado (items e, no layout
+#                compacto, os docs-dia mais recentes — ver packed_days.py), em paralelo (--workers)
+# No fim de cada página o script mostra o --after para continuar.
 
 from __future__ import annotations
 
-import os
-from pathlib import Path
-from datetime import datetime, timezone 
-from typing import Optional
-from dotenv import load_dotenv
-
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-
-# ---------- Config de credenciais ----------
-# Tenta carregar do .env (GOOGLE_APPLICATION_CREDENTIALS); se não houver, usa o arquivo abaixo.
-load_dotenv()
-CRED_ENV = os.getenv("GOOGLE_APPLICATION_CREDENTIALS", "").strip()
-
-# Troque pelo nome exato do seu JSON se não usar .env
-DEFAULT_JSON = "thermosafehidraulico-firebase-adminsdk-fbsvc-1f30ae4b7a.json"
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 
-BASE_DIR = Path(__file__).resolve().parent
-if CRED_ENV:
-    cred_path = Path(CRED_ENV)
-    if not cred_path.is_absolute():
-        cred_path = (BASE_DIR / cred_path).resolve()
-else:
-    cred_path = (BASE_DIR / DEFAULT_JSON).resolve()
+from hidro_core import get_db, lazy_import
+from meter_aggregates import read_meter_aggregates
+from packed_days import DAYS_COL, unpack_day
 
-if not cred_path.exists():
-    raise FileNotFoundError(f"Credencial não encontrada: {cred_path}")
+firestore = lazy_import("google.cloud.firestore")
 
-# ---------- Init Firebase ----------
-cred = credentials.Certificate(str(cred_path))
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+SUMMARY_FIELDS = ["f_cliente_id", "f_condominio_id", "f_last_ts_utc", "f_last_valor_m3", "f_monthly_total_m3", "f_shards"]
 
 
 def hr(title: str) -> None:
@@ -67,72 +44,129 @@ def print_doc(doc_snap, max_field_len: int = 80) -> None:
     print(f"- {doc_id}: {pairs}")
 
 
-# ---------- 1) t_condominio ----------
-hr("Coleção: t_condominio")
-cond_q = db.collection("t_condominio").limit(50).stream()
-count = 0
-for d in cond_q:
-    print_doc(d)
-    count += 1
-if count == 0:
-    print("(vazio)")
-
-# ---------- 2) t_localizacao ----------
-hr("Coleção: t_localizacao")
-loc_q = db.collection("t_localizacao").limit(50).stream()
-count = 0
-for d in loc_q:
-    print_doc(d)
-    count += 1
-if count == 0:
-    print("(vazio)")
-
-# ---------- 3) t_cliente ----------
-hr("Coleção: t_cliente")
-cli_q = db.collection("t_cliente").limit(50).stream()
-count = 0
-for d in cli_q:
-    print_doc(d)
-    count += 1
-if count == 0:
-    print("(vazio)")
-
-# ---------- 4) t_medidor + subcoleções t_leituras ----------
-hr("Coleção: t_medidor (com subcoleções t_leituras/AAAA_MM/items)")
-med_q = db.collection("t_medidor").limit(50).stream()
-med_count = 0
-for med in med_q:
-    med_count += 1
-    print_doc(med)
-    med_ref = db.collection("t_medidor").document(med.id)
-
-    # lista os "buckets" mensais (documentos dentro de t_leituras, ex: 2025_09)
-    print("  Subcoleções de leituras (buckets mensais):")
-    buckets = med_ref.collection("t_leituras").stream()
-    bucket_ids = [b.id for b in buckets]
-    if not bucket_ids:
-        print("   (sem leituras)")
-        continue
-
-    for b_id in sorted(bucket_ids):
-        print(f"   - Bucket {b_id}:")
-        items_ref = med_ref.collection("t_leituras").document(b_id).collection("items")
-        # mostra até 10 leituras ordenadas por timestamp
-        try:
-            items_q = items_ref.order_by("f_ts_utc").limit(10).stream()
-        except Exception:
-            # se ainda não houver índice, tenta sem order_by
-            items_q = items_ref.limit(10).stream()
-
-        item_count = 0
-        for it in items_q:
-            item_count += 1
-            data = it.to_dict() or {}
-            print(f"      • {it.id} | f_ts_utc={data.get('f_ts_utc')} | f_valor_m3={data.get('f_valor_m3')} | f_pulsos={data.get('f_pulsos')}")
-        if item_count == 0:
-            print("      (sem items)")
-
-if med_count == 0:
-    print("(vazio)")
-
-print("\n✅ Leitura concluída.")
+# ---------- Busca em lote ----------
+def fetch_medidores(db, ids: Optional[List[str]], limit: int, after: Optional[str], fields: Optional[List[str]] = None) -> List[Any]:
+    """Uma página de docs de t_medidor: get_all para ids explícitos, senão query por id com cursor."""
+    col = db.collection("t_medidor")
+    if ids:
+        ids = sorted(set(ids))
+        if after:
+            ids = [i for i in ids if i > after]
+        refs = [col.document(i) for i in ids[:limit]]
+        snaps = [s for s in db.get_all(refs, field_paths=fields) if s.exists]
+        return sorted(snaps, key=lambda s: s.id)
+    q = col.order_by("__name__").limit(limit)
+    if fields is not None:
+        q = q.select(fields)
+    if after:
+        q = q.start_after({"__name__": col.document(after)})
+    return list(q.stream())
+
+
+def list_buckets(db, mid: str) -> List[str]:
+    """Ids dos buckets mensais (AAAA_MM) de um medidor, só chaves."""
+    col = db.collection("t_medidor").document(mid).collection("t_leituras")
+    return sorted(s.id for s in col.select([]).stream())
+
+
+def latest_items(db, mid: str, bucket: str, n: int) -> List[Dict[str, Any]]:
+    """Últimas n leituras do bucket (items e docs-dia juntos), mais recente primeiro."""
+    bucket_ref = db.collection("t_medidor").document(mid).collection("t_leituras").document(bucket)
+    rows = []
+    for it in bucket_ref.collection("items").order_by("f_ts_utc", direction=firestore.Query.DESCENDING).limit(n).stream():
+        rows.append({**(it.to_dict() or {}), "_doc_id": it.id})
+    got = 0  # docs-dia do mais recente para trás, até juntar n leituras
+    for day in bucket_ref.collection(DAYS_COL).order_by("f_dia", direction=firestore.Query.DESCENDING).limit(n).stream():
+        day_rows = list(unpack_day(day.to_dict() or {}))
+        for r in day_rows:
+            r["_doc_id"] = f"{DAYS_COL}/{r['_doc_id']}"
+        rows += day_rows
+        got += len(day_rows)
+        if got >= n:
+            break
+    return sorted(rows, key=lambda r: r["f_ts_utc"], reverse=True)[:n]
+
+
+# ---------- Modos ----------
+def show_cadastro(db, limit: int) -> None:
+    for col in ("t_condominio", "t_localizacao", "t_cliente"):
+        hr(f"Coleção: {col}")
+        count = 0
+        for d in db.collection(col).limit(limit).stream():
+            print_doc(d)
+            count += 1
+        if count == 0:
+            print("(vazio)")
+
+
+def show_summary(db, meds: List[Any], workers: int = 8) -> None:
+    hr("t_medidor (resumo: f_last_* e f_monthly_total_m3, sem ler items)")
+    aggs = read_meter_aggregates(db, meds, workers)  # soma t_shards quando f_shards > 0
+    for med in meds:
+        d = aggs[med.id]
+        months = sorted((d.get("f_monthly_total_m3") or {}).items())
+        total = sum(float(v or 0) for _, v in months)
+        span = f"{months[0][0]}..{months[-1][0]}" if months else "-"
+        last_ts = d.get("f_last_ts_utc")
+        last = f"{last_ts.isoformat()} = {d.get('f_last_valor_m3')} m³" if last_ts else "(sem leituras)"
+        print(f"- {med.id} | cliente {d.get('f_cliente_id') or '-'} | {len(months)} meses ({span}) | "
+              f"total {total:.3f} m³ | última {last}")
+
+
+def show_detail(db, meds: List[Any], items: int, months: Optional[int], workers: int) -> None:
+    hr("Coleção: t_medidor (com subcoleções t_leituras/AAAA_MM/items e /dias)")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        buckets = list(ex.map(lambda m: list_buckets(db, m.id), meds))
+        if months:
+            buckets = [bs[-months:] for bs in buckets]
+        tasks = [(m.id, b) for m, bs in zip(meds, buckets) for b in bs] if items > 0 else []
+        fetched: Dict[tuple, List[Dict[str, Any]]] = dict(zip(tasks, ex.map(lambda t: latest_items(db, t[0], t[1], items), tasks)))
+
+    for med, bs in zip(meds, buckets):
+        print_doc(med)
+        print("  Subcoleções de leituras (buckets mensais):")
+        if not bs:
+            print("   (sem leituras)")
+            continue
+        for b_id in bs:
+            if items <= 0:
+                print(f"   - Bucket {b_id}")
+                continue
+            print(f"   - Bucket {b_id} (últimas {items}):")
+            its = fetched.get((med.id, b_id), [])
+            for data in its:
+                print(f"      • {data['_doc_id']} | f_ts_utc={data.get('f_ts_utc')} | f_valor_m3={data.get('f_valor_m3')} | f_pulsos={data.get('f_pulsos')}")
+            if not its:
+                print("      (sem leituras)")
+
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Inspeção rápida do Firestore (medidores e leituras), paginada")
+    ap.add_argument("--limit", type=int, default=50, help="Medidores por página (default 50)")
+    ap.add_argument("--after", help="Continua após este f_medidor_id (paginação)")
+    ap.add_argument("--medidor", action="append", help="IDs específicos (pode repetir); lidos com get_all")
+    ap.add_argument("--summary", action="store_true", help="Só o resumo por medidor a partir de t_medidor (não lê items)")
+    ap.add_argument("--items", type=int, default=10, help="Detalhe: últimas N leituras por bucket (0 = só lista os buckets; default 10)")
+    ap.add_argument("--months", type=int, help="Detalhe: só os N buckets mais recentes de cada medidor")
+    ap.add_argument("--workers", type=int, default=8, help="Queries em paralelo no modo detalhe (default 8)")
+    ap.add_argument("--cadastro", action="store_true", help="Lista também t_condominio, t_localizacao e t_cliente (até --limit cada)")
+    args = ap.parse_args(argv)
+
+    db = get_db()
+    if args.cadastro:
+        show_cadastro(db, args.limit)
+
+    meds = fetch_medidores(db, args.medidor, args.limit, args.after, SUMMARY_FIELDS if args.summary else None)
+    if args.summary:
+        show_summary(db, meds, args.workers)
+    else:
+        show_detail(db, meds, args.items, args.months, args.workers)
+    if not meds:
+        print("(vazio)")
+    elif len(meds) == args.limit:
+        print(f"\n→ próxima página: --after {meds[-1].id}")
+    print("\n✅ Leitura concluída.")
+
+
+if __name__ == "__main__":
+    main()